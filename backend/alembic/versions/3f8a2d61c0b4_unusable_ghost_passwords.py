@@ -0,0 +1,33 @@
+"""Replace ghost user password hashes with an unusable credential
+
+Revision ID: 3f8a2d61c0b4
+Revises: 9c1e4b7d2a6f
+Create Date: 2026-10-18 11:02:17.440913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8a2d61c0b4'
+down_revision: Union[str, Sequence[str], None] = '9c1e4b7d2a6f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Ghost members used to get an argon2 hash of a shared constant password
+    op.execute(
+        "UPDATE users SET password_hash = '!' "
+        "WHERE email LIKE 'ghost\\_%@splitmint.com' ESCAPE '\\'"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Nothing to restore: '!' stays a valid (never matching) credential
+    pass
@@ -0,0 +1,50 @@
+"""Add group_balances ledger
+
+Revision ID: 9c1e4b7d2a6f
+Revises: 5073c537bf37
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c1e4b7d2a6f'
+down_revision: Union[str, Sequence[str], None] = '5073c537bf37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('group_balances',
+    sa.Column('group_id', sa.Uuid(), nullable=False),
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('net', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('group_id', 'user_id')
+    )
+    # Backfill from existing history: paid - owed per (group, user), plus a zero row per member
+    op.execute(
+        """
+        INSERT INTO group_balances (group_id, user_id, net)
+        SELECT group_id, user_id, SUM(delta) FROM (
+            SELECT group_id, payer_id AS user_id, amount AS delta FROM expenses
+            UNION ALL
+            SELECT e.group_id, s.user_id, -s.amount_owed AS delta
+            FROM expense_splits s JOIN expenses e ON e.id = s.expense_id
+            UNION ALL
+            SELECT group_id, user_id, 0 AS delta FROM group_members
+        ) AS deltas
+        GROUP BY group_id, user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('group_balances')
@@ -0,0 +1,34 @@
+"""Add composite indexes for the hot query paths
+
+Revision ID: b71d4e0a9c35
+Revises: 3f8a2d61c0b4
+Create Date: 2026-10-18 13:26:51.502318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71d4e0a9c35'
+down_revision: Union[str, Sequence[str], None] = '3f8a2d61c0b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_group_members_user_id_group_id', 'group_members', ['user_id', 'group_id'], unique=False)
+    op.create_index('ix_expenses_group_id_date', 'expenses', ['group_id', 'date', 'id'], unique=False)
+    op.create_index('ix_expenses_group_id_payer_id', 'expenses', ['group_id', 'payer_id', 'amount'], unique=False)
+    op.create_index('ix_expense_splits_user_id', 'expense_splits', ['user_id', 'expense_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_expense_splits_user_id', table_name='expense_splits')
+    op.drop_index('ix_expenses_group_id_payer_id', table_name='expenses')
+    op.drop_index('ix_expenses_group_id_date', table_name='expenses')
+    op.drop_index('ix_group_members_user_id_group_id', table_name='group_members')
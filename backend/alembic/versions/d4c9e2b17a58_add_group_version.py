@@ -0,0 +1,28 @@
+"""Add groups.version for settlement cache invalidation
+
+Revision ID: d4c9e2b17a58
+Revises: b71d4e0a9c35
+Create Date: 2026-10-18 16:40:12.081377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4c9e2b17a58'
+down_revision: Union[str, Sequence[str], None] = 'b71d4e0a9c35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('groups', sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('groups', 'version')
@@ -0,0 +1,41 @@
+"""Add balance_checkpoints for point-in-time balances
+
+Revision ID: e8b3f5a2c7d1
+Revises: d4c9e2b17a58
+Create Date: 2026-10-18 21:05:37.412960
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b3f5a2c7d1'
+down_revision: Union[str, Sequence[str], None] = 'd4c9e2b17a58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('balance_checkpoints',
+    sa.Column('group_id', sa.Uuid(), nullable=False),
+    sa.Column('date', sa.DateTime(), nullable=False),
+    sa.Column('expense_id', sa.Uuid(), nullable=False),
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('net', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['expense_id'], ['expenses.id'], ),
+    sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('group_id', 'date', 'expense_id', 'user_id')
+    )
+    # Existing histories start without checkpoints; `scripts/ledger.py checkpoints` backfills them
+    op.add_column('groups', sa.Column('expenses_since_checkpoint', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('groups', 'expenses_since_checkpoint')
+    op.drop_table('balance_checkpoints')
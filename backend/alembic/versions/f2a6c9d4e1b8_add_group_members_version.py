@@ -0,0 +1,28 @@
+"""Add groups.members_version for group body caching
+
+Revision ID: f2a6c9d4e1b8
+Revises: e8b3f5a2c7d1
+Create Date: 2026-10-18 23:14:52.630118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a6c9d4e1b8'
+down_revision: Union[str, Sequence[str], None] = 'e8b3f5a2c7d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('groups', sa.Column('members_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('groups', 'members_version')
@@ -1,8 +1,14 @@
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
 from jose import JWTError, jwt
+import asyncio
 import os
+import threading
+import time
+import uuid
+from .cache import TTLCache
 
 # Secret key and algorithm for JWT (Should be in env vars for prod)
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-super-secret")
@@ -11,12 +17,97 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
+# Decoded token -> principal, so repeat requests skip jwt.decode and the user SELECT.
+# Entries never outlive the token's own exp claim.
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+
+def invalidate_user_tokens(user_id: uuid.UUID):
+    # By id, not email: after an email change the cached principals still carry the old one
+    token_cache.invalidate(lambda _, principal: principal.id == user_id)
+
+# Stored instead of a hash for users who must never log in (ghost members). Matches no password.
+UNUSABLE_PASSWORD = "!"
+
 def verify_password(plain_password, hashed_password):
+    if hashed_password == UNUSABLE_PASSWORD:
+        return False
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+class PasswordHashBusy(Exception):
+    """Raised when the hashing queue is full; callers should answer 503."""
+
+class PasswordHashPool:
+    """
+    Runs argon2 hashing/verification on a small dedicated thread pool (argon2-cffi
+    releases the GIL), so a login storm is capped at `workers` cores and never
+    blocks the event loop. At most `max_queue` calls may wait for a worker.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _run(self, submitted_at: float, fn, args):
+        waited = time.monotonic() - submitted_at
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise PasswordHashBusy()
+            self.queued += 1
+        future = self._executor.submit(self._run, time.monotonic(), fn, args)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+password_hash_pool = PasswordHashPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
+
+async def verify_password_async(plain_password, hashed_password):
+    if hashed_password == UNUSABLE_PASSWORD:
+        return False
+    return await password_hash_pool.run(pwd_context.verify, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await password_hash_pool.run(pwd_context.hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -0,0 +1,166 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    import redis
+except ImportError: # Only needed for the "redis" cache backend
+    redis = None
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Small thread-safe, per-process LRU cache whose entries expire after `ttl` seconds.
+    Keeps hit/miss counters so callers can size it.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value. `ttl` overrides the cache-wide TTL for this entry (e.g. shorter for expiring tokens)."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    async def aget(self, key: Hashable, default: Any = None) -> Any:
+        """get() for async callers that may be handed a RedisCache instead; in memory it never blocks."""
+        return self.get(key, default)
+
+    async def aset(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        self.set(key, value, ttl)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate(self, predicate: Callable[[Hashable, Any], bool]):
+        """Drop every entry for which predicate(key, value) is true."""
+        with self._lock:
+            for key in [k for k, (_, v) in self._data.items() if predicate(k, v)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+
+class RedisCache:
+    """
+    TTLCache's get/set interface over a Redis-compatible server, shared by every worker
+    process. Values round-trip through JSON; tuple keys are joined with ":" under `prefix`.
+    Server errors count as misses (and are counted) so a cache outage never fails a request.
+    """
+
+    def __init__(self, client, ttl: float = 60.0, prefix: str = ""):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, key: Hashable) -> str:
+        parts = key if isinstance(key, tuple) else (key,)
+        return self.prefix + ":".join(map(str, parts))
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            raw = self.client.get(self._key(key))
+        except redis.RedisError:
+            self.errors += 1
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        try:
+            self.client.set(self._key(key), json.dumps(value), px=max(1, int((self.ttl if ttl is None else ttl) * 1000)))
+        except redis.RedisError:
+            self.errors += 1
+
+    async def aget(self, key: Hashable, default: Any = None) -> Any:
+        """get() on the threadpool: a round trip, or socket_timeout when Redis is slow, must not stall the event loop."""
+        return await run_in_threadpool(self.get, key, default)
+
+    async def aset(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        await run_in_threadpool(self.set, key, value, ttl)
+
+    def pop(self, key: Hashable):
+        try:
+            self.client.delete(self._key(key))
+        except redis.RedisError:
+            self.errors += 1
+
+    def clear(self):
+        try:
+            for key in self.client.scan_iter(match=self.prefix + "*"):
+                self.client.delete(key)
+        except redis.RedisError:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "errors": self.errors, "backend": "redis"}
+
+
+def make_cache(backend: str, maxsize: int, ttl: float, url: Optional[str] = None, prefix: str = ""):
+    """
+    Build a cache by name: "memory" (TTLCache, per process) or "redis" (RedisCache at `url`).
+    A "fakeredis://" url selects the in-process fakeredis server, for local runs without Redis.
+    """
+    if backend == "memory":
+        return TTLCache(maxsize=maxsize, ttl=ttl)
+    if backend != "redis":
+        raise ValueError(f"Unknown cache backend {backend!r}")
+    if redis is None:
+        raise RuntimeError("The redis cache backend needs the redis package (pip install redis)")
+    if url and url.startswith("fakeredis://"):
+        try:
+            import fakeredis
+        except ImportError:
+            raise RuntimeError("fakeredis:// urls need the fakeredis package (pip install fakeredis)") from None
+        client = fakeredis.FakeRedis()
+    else:
+        client = redis.Redis.from_url(url or "redis://localhost:6379/0", socket_timeout=0.5)
+    return RedisCache(client, ttl=ttl, prefix=prefix)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check for conditional GETs (RFC 9110 weak comparison: W/"x" matches "x")."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in candidates)
@@ -1,8 +1,40 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import event, select, insert, update, bindparam, exists, func, literal, union_all, Numeric, and_, or_
+from sqlalchemy import BigInteger, String, cast, type_coerce
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from decimal import Decimal, ROUND_HALF_UP
+from datetime import datetime
+from itertools import groupby
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from . import models, schemas
-from .auth_utils import get_password_hash
+from .auth_utils import UNUSABLE_PASSWORD, invalidate_user_tokens
+from .cache import TTLCache
+from .database import SessionLocal
+from .services.name_index import name_index_cache
+import logging
+import threading
 import uuid
+import os
+
+try:
+    import numpy as np
+except ImportError: # Optional: only BALANCE_BACKEND=numpy needs it
+    np = None
+
+# Positive membership lookups only; a non-member is always re-checked against the DB
+MEMBERSHIP_CACHE_TTL = float(os.getenv("MEMBERSHIP_CACHE_TTL", "30"))
+membership_cache = TTLCache(maxsize=4096, ttl=MEMBERSHIP_CACHE_TTL)
+
+# How full recomputes (ledger verify/rebuild) aggregate history: "sql" GROUP BY in the
+# database, "numpy" integer-cent arrays in-process, or "python" (the ORM replay loop)
+BALANCE_BACKEND = os.getenv("BALANCE_BACKEND", "sql")
+
+# Expenses between a group's balance checkpoints: a historical balance replays at most
+# about this many on top of the nearest checkpoint
+BALANCE_CHECKPOINT_INTERVAL = int(os.getenv("BALANCE_CHECKPOINT_INTERVAL", "500"))
+
+logger = logging.getLogger(__name__)
 
 # --- USER ---
 def get_user(db: Session, user_id: uuid.UUID):
@@ -11,8 +43,8 @@ def get_user(db: Session, user_id: uuid.UUID):
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = get_password_hash(user.password)
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str):
+    # Hashing is the caller's job (see auth_utils.get_password_hash_async) so it stays off the DB path
     db_user = models.User(
         email=user.email,
         password_hash=hashed_password,
@@ -24,13 +56,71 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.refresh(db_user)
     return db_user
 
+def create_ghost_user(db: Session, name: str):
+    """Placeholder member who can be assigned expenses but never log in. Costs no hashing."""
+    db_user = models.User(
+        id=uuid.uuid4(),
+        # We need a unique email, so we generate one.
+        email=f"ghost_{uuid.uuid4()}@splitmint.com",
+        password_hash=UNUSABLE_PASSWORD,
+        name=name
+    )
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _drop_cached_tokens(mapper, connection, user):
+    # Cached principals must not outlive a change to the user they describe
+    invalidate_user_tokens(user.id)
+
 # --- GROUP ---
-def get_group(db: Session, group_id: uuid.UUID):
-    return db.query(models.Group).filter(models.Group.id == group_id).first()
+# Loader profiles: each endpoint passes the relationships it is going to touch so they
+# arrive in a fixed number of SELECTs instead of one lazy load per member/expense.
+GROUP_DETAIL = (selectinload(models.Group.members).joinedload(models.GroupMember.user),)
 
-def get_groups_for_user(db: Session, user_id: uuid.UUID):
+def get_group(db: Session, group_id: uuid.UUID, options=()):
+    return db.query(models.Group).options(*options).filter(models.Group.id == group_id).first()
+
+def get_groups(db: Session, group_ids: Iterable[uuid.UUID], options=GROUP_DETAIL):
+    return db.query(models.Group).filter(models.Group.id.in_(list(group_ids))).options(*options).all()
+
+def get_group_members_versions_for_user(db: Session, user_id: uuid.UUID) -> List[Tuple[uuid.UUID, int]]:
+    """
+    (group id, members version) of every group the user belongs to, in id order: enough
+    to validate cached group bodies, and the same list every time for the same data.
+    """
+    return [
+        (group_id, version) for group_id, version in db.execute(
+            select(models.Group.id, models.Group.members_version)
+            .join(models.GroupMember)
+            .where(models.GroupMember.user_id == user_id)
+            .order_by(models.Group.id)
+        )
+    ]
+
+def get_groups_for_user(db: Session, user_id: uuid.UUID, options=GROUP_DETAIL):
     # This query joins GroupMember to find groups a user belongs to
-    return db.query(models.Group).join(models.GroupMember).filter(models.GroupMember.user_id == user_id).all()
+    return (
+        db.query(models.Group)
+        .join(models.GroupMember)
+        .filter(models.GroupMember.user_id == user_id)
+        .options(*options)
+        .all()
+    )
+
+# Members (for names) plus every member's ledger row: a user's whole balance sheet in three SELECTs
+GROUP_BALANCES = GROUP_DETAIL + (selectinload(models.Group.balances),)
+
+def get_user_group_balances(db: Session, user_id: uuid.UUID) -> List[Tuple[models.Group, Dict[str, Decimal]]]:
+    """
+    Every group the user belongs to, with each member's net from the ledger. The cost
+    depends on the size of those groups, never on how many expenses they hold.
+    """
+    groups = get_groups_for_user(db, user_id, options=GROUP_BALANCES)
+    return [(group, {str(row.user_id): row.net for row in group.balances}) for group in groups]
 
 def create_group(db: Session, group: schemas.GroupCreate, user_id: uuid.UUID):
     db_group = models.Group(name=group.name, created_by_user_id=user_id)
@@ -41,10 +131,720 @@ def create_group(db: Session, group: schemas.GroupCreate, user_id: uuid.UUID):
     # Add creator as a member automatically
     add_user_to_group(db, group_id=db_group.id, user_id=user_id)
     
-    return db_group
+    return get_group(db, group_id=db_group.id, options=GROUP_DETAIL)
 
 def add_user_to_group(db: Session, group_id: uuid.UUID, user_id: uuid.UUID):
     db_member = models.GroupMember(group_id=group_id, user_id=user_id)
     db.add(db_member)
+    # Every member gets a ledger row so the balances endpoint can read members straight from it
+    apply_balance_deltas(db, group_id, {user_id: Decimal(0)})
+    # Both the balances (a new zero row) and the group body change: bump_group_versions plus members_version
+    db.execute(
+        update(models.Group).where(models.Group.id == group_id)
+        .values(version=models.Group.version + 1, members_version=models.Group.members_version + 1)
+    )
     db.commit()
+    membership_cache.invalidate(lambda key, _: key[0] == group_id)
+    name_index_cache.pop(group_id)
     return db_member
+
+def bump_group_versions(db: Session, group_ids: Iterable[uuid.UUID], new_expenses: Optional[Dict[uuid.UUID, int]] = None):
+    """
+    Mark the groups' balances as changed, in the caller's transaction. Anything cached
+    under an older version (settlement plans, ETags) stops matching once it commits.
+    `new_expenses` (group id -> count) also advances each group's checkpoint counter.
+    """
+    if not new_expenses:
+        db.execute(
+            update(models.Group).where(models.Group.id.in_(list(group_ids))).values(version=models.Group.version + 1)
+        )
+        return
+    groups = models.Group.__table__
+    db.execute(
+        update(groups)
+        .where(groups.c.id == bindparam("g_id"))
+        .values(
+            version=groups.c.version + 1,
+            expenses_since_checkpoint=groups.c.expenses_since_checkpoint + bindparam("g_count"),
+        ),
+        [{"g_id": group_id, "g_count": new_expenses.get(group_id, 0)} for group_id in group_ids],
+    )
+
+def get_group_version(db: Session, group_id: uuid.UUID) -> Optional[int]:
+    return db.scalar(select(models.Group.version).where(models.Group.id == group_id))
+
+def get_group_members_version(db: Session, group_id: uuid.UUID) -> Optional[int]:
+    return db.scalar(select(models.Group.members_version).where(models.Group.id == group_id))
+
+def is_cached_group_member(group_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+    """Recent positive result of is_group_member, checked without touching the database."""
+    return bool(membership_cache.get((group_id, user_id)))
+
+def is_group_member(db: Session, group_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+    """Single EXISTS probe on the group_members primary key. Positive results are cached briefly."""
+    is_member = db.scalar(
+        select(exists().where(models.GroupMember.group_id == group_id, models.GroupMember.user_id == user_id))
+    )
+    if is_member:
+        membership_cache.set((group_id, user_id), True)
+    return bool(is_member)
+
+# --- EXPENSE ---
+# Keyset position in a group's history: the (date, id) of the last expense already seen
+ExpenseCursor = Tuple[datetime, uuid.UUID]
+
+def get_group_expenses(
+    db: Session,
+    group_id: uuid.UUID,
+    limit: int,
+    after: Optional[ExpenseCursor] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    payer_id: Optional[uuid.UUID] = None,
+) -> Tuple[List[models.Expense], Optional[ExpenseCursor]]:
+    """
+    One page of a group's expenses, newest first, ordered by (date, id) descending.
+    Seeks past `after` on ix_expenses_group_id_date instead of using OFFSET, so every
+    page costs the same however deep it is. `start` is inclusive, `end` exclusive.
+    Returns the page and the cursor of the next one (None on the last page).
+    """
+    query = (
+        db.query(models.Expense)
+        .filter(models.Expense.group_id == group_id)
+        .options(selectinload(models.Expense.splits)) # One IN query for the whole page
+        .order_by(models.Expense.date.desc(), models.Expense.id.desc())
+    )
+    if after is not None:
+        after_date, after_id = after
+        query = query.filter(
+            models.Expense.date <= after_date,
+            or_(models.Expense.date < after_date, and_(models.Expense.date == after_date, models.Expense.id < after_id)),
+        )
+    if start is not None:
+        query = query.filter(models.Expense.date >= start)
+    if end is not None:
+        query = query.filter(models.Expense.date < end)
+    if payer_id is not None:
+        query = query.filter(models.Expense.payer_id == payer_id)
+
+    # One extra row tells us whether there is a next page
+    expenses = query.limit(limit + 1).all()
+    if len(expenses) <= limit:
+        return expenses, None
+    expenses = expenses[:limit]
+    return expenses, (expenses[-1].date, expenses[-1].id)
+
+def _after_cursor(after: ExpenseCursor):
+    after_date, after_id = after
+    return and_(
+        models.Expense.date >= after_date,
+        or_(models.Expense.date > after_date, and_(models.Expense.date == after_date, models.Expense.id > after_id)),
+    )
+
+def iter_group_expense_rows(db: Session, group_id: uuid.UUID, batch_size: int) -> Iterator:
+    """
+    A group's whole history, oldest first, as flat (expense, split) rows: one row per
+    split, with the rows of an expense adjacent. Fetched `batch_size` rows at a time
+    (a server-side cursor on Postgres), so memory does not grow with the group.
+    """
+    stmt = (
+        select(
+            models.Expense.id, models.Expense.group_id, models.Expense.payer_id, models.Expense.amount,
+            models.Expense.description, models.Expense.split_type, models.Expense.date,
+            models.ExpenseSplit.user_id, models.ExpenseSplit.amount_owed,
+        )
+        .outerjoin(models.ExpenseSplit, models.ExpenseSplit.expense_id == models.Expense.id)
+        .where(models.Expense.group_id == group_id)
+        .order_by(models.Expense.date, models.Expense.id)
+        .execution_options(yield_per=batch_size)
+    )
+    yield from db.execute(stmt)
+
+def _cents(value: Decimal) -> Decimal:
+    # Round the way Numeric(10, 2) columns do on Postgres, so the ledger matches stored rows
+    return Decimal(value).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+def create_expenses(db: Session, expenses: List[schemas.ExpenseCreate]) -> List[schemas.Expense]:
+    """
+    Insert already-validated expenses with their splits and ledger updates in one
+    transaction: one multi-row INSERT for expenses, one for splits, then the
+    batched ledger update. Ids (and dates, unless given) are generated here, so
+    nothing needs to be read back after the commit.
+    """
+    now = datetime.utcnow()
+    expense_rows, split_rows, created = [], [], []
+    deltas_by_group: Dict[uuid.UUID, Dict[uuid.UUID, Decimal]] = {}
+    counts: Dict[uuid.UUID, int] = {}
+    earliest: Dict[uuid.UUID, ExpenseCursor] = {}
+    for expense in expenses:
+        expense_id = uuid.uuid4()
+        amount = _cents(expense.amount)
+        splits = [(split.user_id, _cents(split.amount_owed)) for split in expense.splits]
+        expense_rows.append({
+            "id": expense_id,
+            "group_id": expense.group_id,
+            "payer_id": expense.payer_id,
+            "amount": amount,
+            "description": expense.description,
+            "split_type": expense.split_type.value,
+            "date": expense.date or now,
+        })
+        split_rows.extend({"expense_id": expense_id, "user_id": user_id, "amount_owed": owed} for user_id, owed in splits)
+        counts[expense.group_id] = counts.get(expense.group_id, 0) + 1
+        cursor = (expense.date or now, expense_id)
+        earliest[expense.group_id] = min(earliest.get(expense.group_id, cursor), cursor)
+
+        group_deltas = deltas_by_group.setdefault(expense.group_id, {})
+        for user_id, delta in expense_balance_deltas(expense.payer_id, amount, splits).items():
+            group_deltas[user_id] = group_deltas.get(user_id, Decimal(0)) + delta
+
+        created.append(schemas.Expense(
+            id=expense_id,
+            group_id=expense.group_id,
+            payer_id=expense.payer_id,
+            amount=amount,
+            description=expense.description,
+            split_type=expense.split_type,
+            date=expense.date or now,
+            splits=[schemas.ExpenseSplit(expense_id=expense_id, user_id=user_id, amount_owed=owed) for user_id, owed in splits],
+        ))
+
+    if not expense_rows:
+        return created
+    db.execute(insert(models.Expense), expense_rows)
+    db.execute(insert(models.ExpenseSplit), split_rows)
+    for group_id, deltas in deltas_by_group.items():
+        apply_balance_deltas(db, group_id, deltas)
+    bump_group_versions(db, deltas_by_group, new_expenses=counts)
+    checkpoint_group_balances(db, earliest)
+    db.commit()
+    return created
+
+def create_expense(db: Session, expense: schemas.ExpenseCreate) -> schemas.Expense:
+    return create_expenses(db, [expense])[0]
+
+# --- BALANCE LEDGER ---
+def expense_balance_deltas(payer_id: uuid.UUID, amount: Decimal, splits: Iterable[Tuple[uuid.UUID, Decimal]], sign: int = 1) -> Dict[uuid.UUID, Decimal]:
+    """
+    Net balance change caused by one expense: the payer is credited the amount,
+    every splitter is debited their share. Use sign=-1 to reverse an expense
+    (delete, or the "before" half of an edit).
+    """
+    deltas: Dict[uuid.UUID, Decimal] = {payer_id: sign * Decimal(amount)}
+    for user_id, amount_owed in splits:
+        deltas[user_id] = deltas.get(user_id, Decimal(0)) - sign * Decimal(amount_owed)
+    return deltas
+
+def apply_balance_deltas(db: Session, group_id: uuid.UUID, deltas: Dict[uuid.UUID, Decimal]):
+    """
+    Add deltas to the group's ledger rows inside the caller's transaction, in a
+    constant number of statements: one lookup, one batched insert for users
+    without a row yet, one executemany increment for the rest. Does not commit.
+    """
+    if not deltas:
+        return
+    balances = models.GroupBalance.__table__
+    existing = set(db.scalars(
+        select(balances.c.user_id).where(balances.c.group_id == group_id, balances.c.user_id.in_(list(deltas)))
+    ))
+    missing = [
+        {"group_id": group_id, "user_id": user_id, "net": delta}
+        for user_id, delta in deltas.items() if user_id not in existing
+    ]
+    changed = [
+        {"b_user_id": user_id, "b_delta": delta}
+        for user_id, delta in deltas.items() if user_id in existing and delta != 0
+    ]
+    if missing:
+        db.execute(insert(balances), missing)
+    if changed:
+        db.execute(
+            update(balances)
+            .where(balances.c.group_id == group_id, balances.c.user_id == bindparam("b_user_id"))
+            .values(net=balances.c.net + bindparam("b_delta", type_=balances.c.net.type)),
+            changed,
+        )
+
+def get_group_balances(db: Session, group_id: uuid.UUID) -> Dict[str, Decimal]:
+    rows = db.execute(
+        select(models.GroupBalance.user_id, models.GroupBalance.net)
+        .where(models.GroupBalance.group_id == group_id)
+    )
+    return {str(user_id): net for user_id, net in rows}
+
+def replay_group_balances(db: Session, group_id: uuid.UUID) -> Dict[str, Decimal]:
+    """
+    Recompute a group's balances by loading its full Expense/ExpenseSplit history
+    into the ORM. Kept as the reference implementation; prefer compute_group_balances.
+    """
+    group = get_group(db, group_id=group_id)
+    net_balances: Dict[str, Decimal] = {str(m.user_id): Decimal(0) for m in group.members}
+    for expense in group.expenses:
+        splits = [(split.user_id, split.amount_owed) for split in expense.splits]
+        for user_id, delta in expense_balance_deltas(expense.payer_id, expense.amount, splits).items():
+            net_balances[str(user_id)] = net_balances.get(str(user_id), Decimal(0)) + delta
+    return net_balances
+
+def compute_group_balances(db: Session, group_id: uuid.UUID) -> Dict[str, Decimal]:
+    """
+    Recompute a group's balances inside the database: one GROUP BY over
+    expenses.payer_id (paid) and one over expense_splits.user_id (owed),
+    sent as a single UNION ALL round trip. Members with no activity get 0.
+    """
+    paid = (
+        select(models.Expense.payer_id.label("user_id"), func.sum(models.Expense.amount).label("delta"))
+        .where(models.Expense.group_id == group_id)
+        .group_by(models.Expense.payer_id)
+    )
+    owed = (
+        select(models.ExpenseSplit.user_id.label("user_id"), -func.sum(models.ExpenseSplit.amount_owed).label("delta"))
+        .join(models.Expense, models.Expense.id == models.ExpenseSplit.expense_id)
+        .where(models.Expense.group_id == group_id)
+        .group_by(models.ExpenseSplit.user_id)
+    )
+    members = (
+        select(models.GroupMember.user_id.label("user_id"), literal(0, Numeric(12, 2)).label("delta"))
+        .where(models.GroupMember.group_id == group_id)
+    )
+    net_balances: Dict[str, Decimal] = {}
+    for user_id, delta in db.execute(union_all(paid, owed, members)):
+        net_balances[str(user_id)] = net_balances.get(str(user_id), Decimal(0)) + delta
+    return net_balances
+
+def _raw_id(column):
+    # Ids as the driver returns them (32-char hex on SQLite, dashed on Postgres), without building UUIDs
+    return type_coerce(column, String)
+
+def _int_cents(column):
+    return cast(func.round(column * 100), BigInteger)
+
+def _from_cents(cents: int) -> Decimal:
+    return (Decimal(cents) / 100).quantize(Decimal("0.01"))
+
+def compute_group_balances_numpy(db: Session, group_id: uuid.UUID) -> Dict[str, Decimal]:
+    """
+    Recompute a group's balances with NumPy. The database converts amounts to integer
+    cents (ROUND(amount * 100)) and ids come back as raw strings, so no per-row Decimal
+    or UUID objects are built. Ids map to dense member indices and np.add.at sums int64
+    cents, which is exact: the result equals the Decimal paths to the cent.
+    """
+    if np is None:
+        raise RuntimeError("BALANCE_BACKEND=numpy requires numpy (pip install numpy)")
+
+    paid = (
+        select(_raw_id(models.Expense.payer_id), _int_cents(models.Expense.amount))
+        .where(models.Expense.group_id == group_id)
+    )
+    owed = (
+        select(_raw_id(models.ExpenseSplit.user_id), -_int_cents(models.ExpenseSplit.amount_owed))
+        .join(models.Expense, models.Expense.id == models.ExpenseSplit.expense_id)
+        .where(models.Expense.group_id == group_id)
+    )
+    conn = db.connection() # Plain Core rows, without the ORM's per-row result handling
+    members = conn.execute(
+        select(_raw_id(models.GroupMember.user_id)).where(models.GroupMember.group_id == group_id)
+    ).scalars().all()
+
+    # Dense index per id: members first, then anyone else who appears in the history
+    index = {user_id: i for i, user_id in enumerate(members)}
+    positions, amounts = [], []
+    for stmt in (paid, owed):
+        rows = conn.execute(stmt).all()
+        positions.append(np.fromiter((index.setdefault(row[0], len(index)) for row in rows), dtype=np.intp, count=len(rows)))
+        amounts.append(np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows)))
+    totals = np.zeros(len(index), dtype=np.int64)
+    np.add.at(totals, np.concatenate(positions), np.concatenate(amounts))
+
+    # Ids are 32-char hex on SQLite and dashed on Postgres; normalize like the other paths
+    return {str(uuid.UUID(user_id)): _from_cents(int(totals[i])) for user_id, i in index.items()}
+
+BALANCE_BACKENDS = {
+    "sql": compute_group_balances,
+    "numpy": compute_group_balances_numpy,
+    "python": replay_group_balances,
+}
+
+def recompute_group_balances(db: Session, group_id: uuid.UUID, backend: Optional[str] = None) -> Dict[str, Decimal]:
+    """Full recompute from history with the configured BALANCE_BACKEND (or `backend`)."""
+    name = backend or BALANCE_BACKEND
+    if name not in BALANCE_BACKENDS:
+        raise ValueError(f"Unknown balance backend {name!r}; expected one of {', '.join(BALANCE_BACKENDS)}")
+    return BALANCE_BACKENDS[name](db, group_id)
+
+def _balance_drift(stored: Dict[str, Decimal], expected: Dict[str, Decimal]) -> List[Dict]:
+    drift = []
+    for user_id in sorted(set(stored) | set(expected)):
+        have = stored.get(user_id)
+        want = expected.get(user_id, Decimal(0))
+        if have is None or have.quantize(Decimal("0.01")) != want.quantize(Decimal("0.01")):
+            drift.append({"user_id": user_id, "stored": have, "expected": want})
+    return drift
+
+def verify_group_balances(db: Session, group_id: uuid.UUID) -> List[Dict]:
+    """
+    Compare the materialized ledger against a full recompute.
+    Returns one entry per user whose stored net differs from the recomputed one.
+    """
+    return _balance_drift(get_group_balances(db, group_id), recompute_group_balances(db, group_id))
+
+def rebuild_group_balances(db: Session, group_id: uuid.UUID) -> List[Dict]:
+    """Replace a group's ledger rows with a full recompute. Returns the drift that was corrected."""
+    expected = recompute_group_balances(db, group_id)
+    drift = _balance_drift(get_group_balances(db, group_id), expected)
+    db.query(models.GroupBalance).filter(models.GroupBalance.group_id == group_id).delete(synchronize_session=False)
+    db.add_all(
+        models.GroupBalance(group_id=group_id, user_id=uuid.UUID(user_id), net=net)
+        for user_id, net in expected.items()
+    )
+    if drift:
+        bump_group_versions(db, [group_id])
+        # Checkpoints copied from a drifted ledger are as wrong as it was
+        rebuild_balance_checkpoints(db, group_id)
+    db.commit()
+    return drift
+
+# --- BALANCE HISTORY ---
+def _iter_balance_deltas(
+    db: Session,
+    group_id: uuid.UUID,
+    batch_size: int,
+    after: Optional[ExpenseCursor] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Iterator[Tuple[datetime, str, Dict[str, int]]]:
+    """
+    A stretch of a group's history, oldest first, as (date, raw expense id, deltas in
+    cents by user id) per expense: everything after the `after` position, dated from
+    `start` (inclusive) to `end` (exclusive). Streamed like iter_group_expense_rows,
+    but with raw ids and integer cents as in compute_group_balances_numpy, so no UUID
+    or Decimal is built per row.
+    """
+    stmt = (
+        select(
+            models.Expense.date, _raw_id(models.Expense.id), _raw_id(models.Expense.payer_id),
+            _int_cents(models.Expense.amount), _raw_id(models.ExpenseSplit.user_id), _int_cents(models.ExpenseSplit.amount_owed),
+        )
+        .outerjoin(models.ExpenseSplit, models.ExpenseSplit.expense_id == models.Expense.id)
+        .where(models.Expense.group_id == group_id)
+        .order_by(models.Expense.date, models.Expense.id)
+        .execution_options(yield_per=batch_size)
+    )
+    if after is not None:
+        stmt = stmt.where(_after_cursor(after))
+    if start is not None:
+        stmt = stmt.where(models.Expense.date >= start)
+    if end is not None:
+        stmt = stmt.where(models.Expense.date < end)
+
+    user_ids: Dict[str, str] = {}
+    def user(raw: str) -> str:
+        if raw not in user_ids:
+            user_ids[raw] = str(uuid.UUID(raw))
+        return user_ids[raw]
+
+    for expense_id, rows in groupby(db.execute(stmt), key=lambda row: row[1]):
+        rows = list(rows)
+        date, _, payer_id, amount = rows[0][:4]
+        deltas = {user(payer_id): amount}
+        for row in rows:
+            if row[4] is not None:
+                deltas[user(row[4])] = deltas.get(user(row[4]), 0) - row[5]
+        yield date, expense_id, deltas
+
+def _latest_checkpoint(db: Session, group_id: uuid.UUID, condition) -> Tuple[Optional[ExpenseCursor], Dict[str, Decimal]]:
+    """The group's newest checkpoint matching `condition`, as (cursor, balances); (None, {}) if there is none."""
+    checkpoints = models.BalanceCheckpoint.__table__
+    latest = (
+        select(checkpoints.c.date, checkpoints.c.expense_id)
+        .where(checkpoints.c.group_id == group_id, condition)
+        .order_by(checkpoints.c.date.desc(), checkpoints.c.expense_id.desc())
+        .limit(1)
+        .subquery()
+    )
+    rows = db.execute(
+        select(checkpoints.c.date, checkpoints.c.expense_id, checkpoints.c.user_id, checkpoints.c.net)
+        .join(latest, and_(checkpoints.c.date == latest.c.date, checkpoints.c.expense_id == latest.c.expense_id))
+        .where(checkpoints.c.group_id == group_id)
+    ).all()
+    if not rows:
+        return None, {}
+    return (rows[0].date, rows[0].expense_id), {str(row.user_id): row.net for row in rows}
+
+def _checkpoint_ledger(db: Session, group_id: uuid.UUID):
+    """Checkpoint the group at its newest expense by copying its ledger rows, which include everything up to it."""
+    head = db.execute(
+        select(models.Expense.date, models.Expense.id)
+        .where(models.Expense.group_id == group_id)
+        .order_by(models.Expense.date.desc(), models.Expense.id.desc())
+        .limit(1)
+    ).one()
+    balances = models.GroupBalance.__table__
+    db.execute(
+        insert(models.BalanceCheckpoint.__table__).from_select(
+            ["group_id", "date", "expense_id", "user_id", "net"],
+            select(
+                balances.c.group_id, literal(head.date, models.Expense.date.type),
+                literal(head.id, models.Expense.id.type), balances.c.user_id, balances.c.net,
+            ).where(balances.c.group_id == group_id),
+        )
+    )
+    db.execute(update(models.Group).where(models.Group.id == group_id).values(expenses_since_checkpoint=0))
+
+def checkpoint_group_balances(db: Session, earliest: Dict[uuid.UUID, ExpenseCursor]):
+    """
+    Keep balance checkpoints in step with expenses just written, in the caller's
+    transaction; `earliest` is the oldest new (date, id) per group. Runs after
+    bump_group_versions, whose row lock orders concurrent writers of a group.
+
+    One lookup in the common case. A group with BALANCE_CHECKPOINT_INTERVAL expenses
+    since its last checkpoint gets a new one, copied from the ledger. A backdated
+    expense invalidates the checkpoints after it: they are deleted here, which is one
+    indexed DELETE, and retaken from history in the background once the write commits
+    (see schedule_checkpoint_retake). Until then historical balances start from an
+    older checkpoint, so they stay exact and only replay further.
+    """
+    if not earliest:
+        return
+    checkpoints = models.BalanceCheckpoint.__table__
+
+    def latest(column):
+        return (
+            select(column)
+            .where(checkpoints.c.group_id == models.Group.id)
+            .order_by(checkpoints.c.date.desc(), checkpoints.c.expense_id.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+
+    rows = db.execute(
+        select(models.Group.id, models.Group.expenses_since_checkpoint, latest(checkpoints.c.date),
+               latest(checkpoints.c.expense_id))
+        .where(models.Group.id.in_(list(earliest)))
+    ).all()
+    for group_id, pending, checkpoint_date, checkpoint_id in rows:
+        if checkpoint_date is not None and earliest[group_id] < (checkpoint_date, checkpoint_id):
+            _drop_checkpoints_after(db, group_id, earliest[group_id])
+            stale = db.info.setdefault("stale_checkpoints", {})
+            stale[group_id] = min(stale.get(group_id, earliest[group_id]), earliest[group_id])
+        elif pending >= BALANCE_CHECKPOINT_INTERVAL:
+            _checkpoint_ledger(db, group_id)
+
+def _drop_checkpoints_after(db: Session, group_id: uuid.UUID, position: Optional[ExpenseCursor]):
+    """Delete the group's checkpoints after `position`; all of them for None."""
+    checkpoints = models.BalanceCheckpoint.__table__
+    stale = checkpoints.delete().where(checkpoints.c.group_id == group_id)
+    if position is not None:
+        date, expense_id = position
+        stale = stale.where(
+            checkpoints.c.date >= date,
+            or_(checkpoints.c.date > date, checkpoints.c.expense_id > expense_id),
+        )
+    db.execute(stale)
+
+def _checkpoint_before(db: Session, group_id: uuid.UUID, before: Optional[ExpenseCursor]) -> Tuple[Optional[ExpenseCursor], Dict[str, Decimal]]:
+    """The newest checkpoint older than the `before` position, as _latest_checkpoint; none for None."""
+    if before is None:
+        return None, {}
+    checkpoints = models.BalanceCheckpoint.__table__
+    before_date, before_id = before
+    return _latest_checkpoint(db, group_id, or_(
+        checkpoints.c.date < before_date,
+        and_(checkpoints.c.date == before_date, checkpoints.c.expense_id < before_id),
+    ))
+
+def _replay_checkpoints(db: Session, group_id: uuid.UUID, start: Optional[ExpenseCursor], base: Dict[str, Decimal], batch_size: int) -> Tuple[List[dict], int, int]:
+    """
+    Stream the group's history after `start` (whose balances are `base`) once, as the
+    checkpoint rows to take every BALANCE_CHECKPOINT_INTERVAL expenses, how many
+    checkpoints they make and how many expenses follow the last of them.
+    """
+    balances = {user_id: int(net * 100) for user_id, net in base.items()}
+    rows, taken, pending = [], 0, 0
+    for date, expense_id, deltas in _iter_balance_deltas(db, group_id, batch_size, after=start):
+        for user_id, delta in deltas.items():
+            balances[user_id] = balances.get(user_id, 0) + delta
+        pending += 1
+        if pending == BALANCE_CHECKPOINT_INTERVAL:
+            rows.extend(
+                {"group_id": group_id, "date": date, "expense_id": uuid.UUID(expense_id),
+                 "user_id": uuid.UUID(user_id), "net": _from_cents(cents)}
+                for user_id, cents in balances.items()
+            )
+            taken, pending = taken + 1, 0
+    return rows, taken, pending
+
+def rebuild_balance_checkpoints(db: Session, group_id: uuid.UUID, before: Optional[ExpenseCursor] = None, batch_size: int = 5000) -> int:
+    """
+    Retake a group's checkpoints every BALANCE_CHECKPOINT_INTERVAL expenses, streaming
+    its history once. With `before`, checkpoints older than that position are kept and
+    only the rest of the history is replayed. Does not commit; returns how many were taken.
+    """
+    start, base = _checkpoint_before(db, group_id, before)
+    _drop_checkpoints_after(db, group_id, start)
+    rows, taken, pending = _replay_checkpoints(db, group_id, start, base, batch_size)
+    if rows:
+        db.execute(insert(models.BalanceCheckpoint.__table__), rows)
+    db.execute(update(models.Group).where(models.Group.id == group_id).values(expenses_since_checkpoint=pending))
+    return taken
+
+def retake_balance_checkpoints(db: Session, group_id: uuid.UUID, before: ExpenseCursor, batch_size: int = 5000) -> Optional[int]:
+    """
+    rebuild_balance_checkpoints for the background: the history is replayed before any
+    lock is taken, so writers of the group (and on SQLite, every writer) only wait for a
+    short transaction that checks the replay is still current and swaps the checkpoints
+    in. Commits. Returns how many were taken, or None (nothing changed) when an expense
+    was written into the replayed stretch meanwhile.
+    """
+    start, base = _checkpoint_before(db, group_id, before)
+    rows, taken, _ = _replay_checkpoints(db, group_id, start, base, batch_size)
+    if not taken:
+        return 0
+    last = (rows[-1]["date"], rows[-1]["expense_id"])
+    checkpoints = models.BalanceCheckpoint.__table__
+    group_expenses = select(func.count()).select_from(models.Expense).where(models.Expense.group_id == group_id)
+
+    # Writers take the group's row lock first too (bump_group_versions), so nothing lands in the
+    # history between these checks and the commit. Expenses are never deleted: the same count
+    # means the same stretch, as long as the checkpoint it starts from is still there
+    db.execute(update(models.Group).where(models.Group.id == group_id)
+               .values(expenses_since_checkpoint=models.Group.expenses_since_checkpoint))
+    stretch = group_expenses.where(~_after_cursor(last))
+    if start is not None:
+        stretch = stretch.where(_after_cursor(start))
+        start_kept = db.execute(select(exists().where(
+            checkpoints.c.group_id == group_id, checkpoints.c.date == start[0], checkpoints.c.expense_id == start[1],
+        ))).scalar()
+    if (start is not None and not start_kept) or db.execute(stretch).scalar_one() != taken * BALANCE_CHECKPOINT_INTERVAL:
+        db.rollback()
+        return None
+    pending = db.execute(group_expenses.where(_after_cursor(last))).scalar_one()
+    _drop_checkpoints_after(db, group_id, start)
+    db.execute(insert(checkpoints), rows)
+    db.execute(update(models.Group).where(models.Group.id == group_id).values(expenses_since_checkpoint=pending))
+    db.commit()
+    return taken
+
+# Retakes run one at a time on this worker, after the write that invalidated the checkpoints
+# commits. Requests for a group still queued merge into one (from the oldest position), so an
+# import that backdates every chunk replays the group's history about once, not once per chunk
+_checkpoint_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="balance-checkpoints")
+_checkpoint_queue: Dict[uuid.UUID, ExpenseCursor] = {}
+_checkpoint_queue_lock = threading.Lock()
+
+def schedule_checkpoint_retake(group_id: uuid.UUID, before: ExpenseCursor):
+    """Retake the group's checkpoints from `before` on in the background (retake_balance_checkpoints)."""
+    with _checkpoint_queue_lock:
+        queued = _checkpoint_queue.get(group_id)
+        _checkpoint_queue[group_id] = before if queued is None else min(queued, before)
+    if queued is None:
+        _checkpoint_worker.submit(_retake_queued_checkpoints, group_id)
+
+def _retake_queued_checkpoints(group_id: uuid.UUID):
+    with _checkpoint_queue_lock:
+        before = _checkpoint_queue.pop(group_id)
+    db = SessionLocal()
+    try:
+        if retake_balance_checkpoints(db, group_id, before) is None:
+            schedule_checkpoint_retake(group_id, before) # Lost a race with a writer: replay again
+    except Exception:
+        # Historical balances stay exact without the checkpoints; `ledger.py checkpoints` retakes them
+        logger.exception("Retaking balance checkpoints of group %s failed", group_id)
+    finally:
+        db.close()
+
+def wait_for_checkpoint_retakes():
+    """Block until no retake is queued or running (for scripts and checks)."""
+    while True:
+        _checkpoint_worker.submit(lambda: None).result()
+        with _checkpoint_queue_lock:
+            if not _checkpoint_queue:
+                return
+
+@contextmanager
+def deferred_checkpoint_retakes(db: Session):
+    """
+    Hold back the retakes that commits in `db` schedule until the block exits, then
+    schedule one per group. For jobs that commit many chunks (imports), which would
+    otherwise keep invalidating a replay still in progress.
+    """
+    deferred = db.info["deferred_checkpoints"] = {}
+    try:
+        yield
+    finally:
+        del db.info["deferred_checkpoints"]
+        for group_id, before in deferred.items():
+            schedule_checkpoint_retake(group_id, before)
+
+@event.listens_for(Session, "after_commit")
+def _retake_stale_checkpoints(session):
+    deferred = session.info.get("deferred_checkpoints")
+    for group_id, before in session.info.pop("stale_checkpoints", {}).items():
+        if deferred is None:
+            schedule_checkpoint_retake(group_id, before)
+        else:
+            deferred[group_id] = min(deferred.get(group_id, before), before)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_stale_checkpoints(session):
+    session.info.pop("stale_checkpoints", None) # The DELETE that made them stale was rolled back too
+
+def get_group_balances_at(db: Session, group_id: uuid.UUID, at: datetime) -> Tuple[Dict[str, Decimal], Optional[ExpenseCursor], int]:
+    """
+    Net balances as of `at`: every expense dated before it. Starts from the newest
+    checkpoint before `at` and adds only the expenses since, with the same UNION ALL
+    GROUP BY as compute_group_balances over a date range of ix_expenses_group_id_date,
+    so the cost follows the distance to the checkpoint rather than the whole history.
+    Two queries. Returns the balances, the checkpoint used (None: the beginning) and
+    how many expenses were added on top of it.
+    """
+    start, net_balances = _latest_checkpoint(db, group_id, models.BalanceCheckpoint.date < at)
+    window = [models.Expense.group_id == group_id, models.Expense.date < at]
+    if start is not None:
+        window.append(_after_cursor(start))
+
+    paid = (
+        select(models.Expense.payer_id.label("user_id"), func.sum(models.Expense.amount).label("delta"),
+               func.count().label("expenses"))
+        .where(*window)
+        .group_by(models.Expense.payer_id)
+    )
+    owed = (
+        select(models.ExpenseSplit.user_id.label("user_id"), -func.sum(models.ExpenseSplit.amount_owed).label("delta"),
+               literal(0).label("expenses"))
+        .join(models.Expense, models.Expense.id == models.ExpenseSplit.expense_id)
+        .where(*window)
+        .group_by(models.ExpenseSplit.user_id)
+    )
+    members = (
+        select(models.GroupMember.user_id.label("user_id"), literal(0, Numeric(12, 2)).label("delta"),
+               literal(0).label("expenses"))
+        .where(models.GroupMember.group_id == group_id)
+    )
+    replayed = 0
+    for user_id, delta, expenses in db.execute(union_all(paid, owed, members)):
+        net_balances[str(user_id)] = net_balances.get(str(user_id), Decimal(0)) + delta
+        replayed += expenses
+    return net_balances, start, replayed
+
+def get_group_balance_series(db: Session, group_id: uuid.UUID, edges: List[datetime], batch_size: int = 5000) -> List[Dict[str, Decimal]]:
+    """
+    Net balances as of each of the ascending `edges`, as get_group_balances_at would
+    return them. The first comes from the nearest checkpoint; the expenses between the
+    first and last edge are then streamed once, oldest first. Three queries, and work
+    proportional to the expenses in the range plus the distance to that checkpoint.
+    """
+    opening, _, _ = get_group_balances_at(db, group_id, edges[0])
+    balances = {user_id: int(net * 100) for user_id, net in opening.items()}
+    points, i = [opening], 1
+
+    def point():
+        return {user_id: _from_cents(cents) for user_id, cents in balances.items()}
+
+    for date, _, deltas in _iter_balance_deltas(db, group_id, batch_size, start=edges[0], end=edges[-1]):
+        while date >= edges[i]:
+            points.append(point())
+            i += 1
+        for user_id, delta in deltas.items():
+            balances[user_id] = balances.get(user_id, 0) + delta
+    points.extend(point() for _ in edges[i:])
+    return points
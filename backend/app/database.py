@@ -1,23 +1,297 @@
-from sqlalchemy import create_engine
+from abc import ABC, abstractmethod
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from fastapi.concurrency import run_in_threadpool
+import asyncio
 import os
+import threading
+import time
+import weakref
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./splitmint.db")
 
+# "sync": blocking Session, every DB call runs on the threadpool.
+# "async": AsyncSession on aiosqlite/asyncpg, DB calls run on the event loop.
+DB_MODE = os.getenv("DB_MODE", "sync")
+
+def to_async_url(url: str) -> str:
+    driver, sep, rest = url.partition("://")
+    if driver.startswith("sqlite"):
+        return f"sqlite+aiosqlite://{rest}"
+    if driver.startswith("postgres"):
+        return f"postgresql+asyncpg://{rest}"
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
+
+# Connection pool (ignored for in-memory SQLite, which keeps its single shared connection)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _env_flag("DB_POOL_PRE_PING", "true")
+
+# Applied to every new SQLite connection unless SQLITE_TUNING=off
+SQLITE_TUNING = _env_flag("SQLITE_TUNING", "on")
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"), # Readers no longer block the writer
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"), # With WAL, fsync only at checkpoints
+    "mmap_size": os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+    "cache_size": os.getenv("SQLITE_CACHE_SIZE", "-65536"), # Negative means KiB: 64 MiB
+    "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"), # Wait for the write lock instead of failing
+}
+
+is_sqlite = DATABASE_URL.startswith("sqlite")
+is_memory_sqlite = is_sqlite and DATABASE_URL.rstrip("/") in ("sqlite:", "sqlite:///:memory:")
+
+
+class PoolMetrics:
+    """
+    Connection checkouts and new connections for one engine's pool (from pool events), plus
+    how long sessions waited for their connection (timed by Database, see acquire()).
+    """
+
+    def __init__(self, engine):
+        self._lock = threading.Lock()
+        self.engine = engine
+        self.checkouts = 0
+        self.connects = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "connect", self._on_connect)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def record(self, waited: float, timed_out: bool):
+        with self._lock:
+            self.waits += 1
+            self.timeouts += timed_out
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def stats(self) -> dict:
+        pool = self.engine.pool # Read each time: dispose() swaps in a new pool
+        with self._lock:
+            stats = {
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
+        if isinstance(pool, QueuePool):
+            stats.update(size=pool.size(), checked_out=pool.checkedout(), checked_in=pool.checkedin(), overflow=pool.overflow())
+        return stats
+
+
+def _engine_kwargs(pool_class) -> dict:
+    if is_memory_sqlite:
+        return {}
+    return {
+        "poolclass": pool_class,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
 connect_args = {"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+engine = create_engine(DATABASE_URL, connect_args=connect_args, **_engine_kwargs(QueuePool))
+pool_metrics = {"sync": PoolMetrics(engine)}
+if is_sqlite and SQLITE_TUNING:
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = None
+AsyncSessionLocal = None
+if DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_kwargs(AsyncAdaptedQueuePool))
+    pool_metrics["async"] = PoolMetrics(async_engine.sync_engine)
+    if is_sqlite and SQLITE_TUNING:
+        event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    # Objects are serialized after the session work is done, outside any greenlet,
+    # so they must not expire (and lazy-load) on commit
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+elif DB_MODE != "sync":
+    raise RuntimeError(f"DB_MODE must be 'sync' or 'async', not {DB_MODE!r}")
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+
+def pool_stats() -> dict:
+    """Checkout wait and in-use connection counts for each engine in use."""
+    return {name: metrics.stats() for name, metrics in pool_metrics.items()}
+
+
+def acquire(session):
+    """
+    Check out the session's connection now, timing the wait for a free one. A session that
+    already holds one (it is inside a transaction) returns at once.
+    """
+    if session.in_transaction():
+        return
+    started = time.perf_counter()
+    timed_out = False
     try:
-        yield db
+        session.connection()
+    except PoolTimeoutError:
+        timed_out = True
+        raise
     finally:
-        db.close()
+        pool_metrics["sync"].record(time.perf_counter() - started, timed_out)
+
+
+async def acquire_async(session):
+    """acquire() for an AsyncSession."""
+    if session.in_transaction():
+        return
+    started = time.perf_counter()
+    timed_out = False
+    try:
+        await session.connection()
+    except PoolTimeoutError:
+        timed_out = True
+        raise
+    finally:
+        pool_metrics["async"].record(time.perf_counter() - started, timed_out)
+
+
+async def dispose_engines():
+    """
+    Close every pooled connection. Call on shutdown: aiosqlite runs each connection on a
+    non-daemon thread, so a process in async mode cannot exit until they are closed.
+    """
+    if async_engine is not None:
+        await async_engine.dispose()
+    engine.dispose()
+
+
+class Database(ABC):
+    """
+    Per-request database handle. `run(fn, *args)` calls `fn(session, *args)`, where fn is
+    ordinary sync SQLAlchemy code (all of crud.py), without blocking the event loop:
+    on the threadpool in sync mode, through AsyncSession.run_sync in async mode. Every
+    entry point checks the connection out through acquire(), which times the pool wait.
+    """
+
+    @abstractmethod
+    async def run(self, fn, *args, **kwargs):
+        """Call fn(session, *args, **kwargs) off the event loop and return its result."""
+
+    async def write(self, fn, *args, **kwargs):
+        """run() for fn that commit; on async SQLite their transactions take turns (see AsyncDatabase)."""
+        return await self.run(fn, *args, **kwargs)
+
+    async def run_in_worker(self, fn, *args, **kwargs):
+        """For long, CPU-heavy jobs (e.g. imports): always a worker thread with a blocking Session."""
+        def job():
+            db = SessionLocal()
+            try:
+                acquire(db)
+                return fn(db, *args, **kwargs)
+            finally:
+                db.close()
+        return await run_in_threadpool(job)
+
+    def stream(self, fn, *args, **kwargs):
+        """
+        For StreamingResponse bodies, which outlive the request handler: a sync generator over
+        fn(session, *args) with its own blocking Session, closed when the stream ends.
+        Starlette advances it on the threadpool, so it never blocks the event loop.
+        """
+        db = SessionLocal()
+        try:
+            acquire(db)
+            yield from fn(db, *args, **kwargs)
+        finally:
+            db.close()
+
+
+class SyncDatabase(Database):
+    def __init__(self, session):
+        self.session = session
+
+    async def run(self, fn, *args, **kwargs):
+        def job():
+            acquire(self.session)
+            return fn(self.session, *args, **kwargs)
+        return await run_in_threadpool(job)
+
+    async def run_in_worker(self, fn, *args, **kwargs):
+        return await self.run(fn, *args, **kwargs)
+
+
+class AsyncDatabase(Database):
+    def __init__(self, session):
+        self.session = session
+
+    async def run(self, fn, *args, **kwargs):
+        await acquire_async(self.session)
+        return await self.session.run_sync(fn, *args, **kwargs)
+
+    async def write(self, fn, *args, **kwargs):
+        if not is_sqlite:
+            return await self.run(fn, *args, **kwargs)
+        # Concurrent aiosqlite writers would each hold a pooled connection while sleeping in SQLite's
+        # busy handler, and fail with "database is locked" once it gives up; queue them here instead.
+        # The connection is checked out first, so the lock is never held while waiting on the pool
+        await acquire_async(self.session)
+        async with _sqlite_write_lock():
+            return await self.run(fn, *args, **kwargs)
+
+
+_sqlite_write_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+
+def _sqlite_write_lock() -> asyncio.Lock:
+    # asyncio primitives belong to one event loop; the server has one, test clients may start several
+    loop = asyncio.get_running_loop()
+    lock = _sqlite_write_locks.get(loop)
+    if lock is None:
+        lock = _sqlite_write_locks[loop] = asyncio.Lock()
+    return lock
+
+
+async def get_db():
+    if DB_MODE == "async":
+        async with AsyncSessionLocal() as session:
+            yield AsyncDatabase(session)
+    else:
+        db = SessionLocal()
+        try:
+            yield SyncDatabase(db)
+        finally:
+            db.close()
@@ -1,13 +1,23 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from .routers import auth, groups, expenses, ai
-from .database import engine, Base
-from . import models
+from .database import engine, Base, dispose_engines, pool_stats
+from . import auth_utils, crud, metrics, models
+from .services import ai_parser
+from .services.name_index import name_index_cache
 
 # Create tables if not using Alembic (useful for dev, though we used Alembic)
 models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="SplitMint API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await dispose_engines()
+
+# orjson renders every router's JSON responses; groups and balances also cache their serialized bodies
+app = FastAPI(title="SplitMint API", default_response_class=metrics.ORJSONResponse, lifespan=lifespan)
 
 import os
 
@@ -20,7 +30,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+# Outermost, so its wall time covers CORS and the full response body
+app.add_middleware(metrics.MetricsMiddleware)
 
 app.include_router(auth.router)
 app.include_router(groups.router)
@@ -30,3 +43,18 @@ app.include_router(ai.router)
 @app.get("/")
 def read_root():
     return {"message": "Welcome to SplitMint API"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    return metrics.render({
+        "splitmint_cache": ("cache", {
+            "token": auth_utils.token_cache.stats(),
+            "membership": crud.membership_cache.stats(),
+            "settlement": expenses.settlement_cache.stats(),
+            "group_body": groups.group_body_cache.stats(),
+            "name_index": name_index_cache.stats(),
+        }),
+        "splitmint_db_pool": ("engine", pool_stats()),
+        "splitmint_password_hash_pool": ("pool", {"argon2": auth_utils.password_hash_pool.stats()}),
+        "splitmint_ai_parser": ("backend", {ai_parser.AI_MODEL_BACKEND: ai_parser.stats()}),
+    })
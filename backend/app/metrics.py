@@ -0,0 +1,329 @@
+"""
+Per-route request metrics: wall time, DB time, query count, rows and serialization time.
+
+- MetricsMiddleware (pure ASGI) opens a RequestStats for every HTTP request and files it
+  under the matched route template once the response has been sent.
+- SQLAlchemy hooks on every Engine (including the async engine's sync core) add each
+  statement's time to the current request. The stats object travels in a ContextVar,
+  which threadpool workers and async-engine greenlets inherit.
+- Endpoints return model_response()/json_response(), which validate, encode and render
+  their bodies as serialization time (FastAPI's own response_model pass offers no hook to
+  time); ORJSONResponse times rendering, and code that renders bodies itself wraps that in
+  `serializing()`.
+
+render() produces Prometheus text format for GET /metrics. With SLOW_REQUEST_MS set,
+requests at least that slow are logged with the SQL they issued.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import responses
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+# Requests at least this slow are logged with their statements; 0 disables the log
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+# Statements kept per request for the slow log
+SLOW_REQUEST_MAX_STATEMENTS = int(os.getenv("SLOW_REQUEST_MAX_STATEMENTS", "50"))
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Query counts per request: a route drifting into the upper buckets is an N+1 suspect
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+logger = logging.getLogger(__name__)
+
+
+class RequestStats:
+    __slots__ = ("db_seconds", "queries", "rows", "count_loaded", "serialize_seconds", "statements")
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.rows = 0
+        self.count_loaded = False # Set once a SELECT came back without a row count
+        self.serialize_seconds = 0.0
+        self.statements: List[Tuple[float, str]] = []
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+@contextmanager
+def serializing():
+    """Count the enclosed block as serialization time of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _current.get()
+        if stats is not None:
+            stats.serialize_seconds += time.perf_counter() - started
+
+
+# --- SQLAlchemy hooks ---
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append((context, time.perf_counter()))
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["metrics_started"].pop()[1]
+    stats = _current.get()
+    if stats is None:
+        return
+    _count_statement(stats, statement, elapsed)
+    if cursor.rowcount >= 0:
+        # Writes everywhere, and SELECTs on drivers that report their size (psycopg2, asyncpg)
+        stats.rows += cursor.rowcount
+    elif cursor.description is not None:
+        # SQLite cannot size a SELECT before it is fetched: count the ORM objects loaded instead
+        stats.count_loaded = True
+
+
+@event.listens_for(Session, "loaded_as_persistent")
+def _loaded_as_persistent(session, instance):
+    stats = _current.get()
+    if stats is not None and stats.count_loaded:
+        stats.rows += 1
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # A statement that raised never reaches after_cursor_execute: drop its start time here
+    conn = exception_context.connection
+    started = conn.info.get("metrics_started") if conn is not None else None
+    if not started or started[-1][0] is not exception_context.execution_context:
+        return
+    elapsed = time.perf_counter() - started.pop()[1]
+    stats = _current.get()
+    if stats is not None:
+        _count_statement(stats, exception_context.statement or "", elapsed)
+
+
+def _count_statement(stats: RequestStats, statement: str, elapsed: float):
+    stats.db_seconds += elapsed
+    stats.queries += 1
+    if SLOW_REQUEST_MS and len(stats.statements) < SLOW_REQUEST_MAX_STATEMENTS:
+        stats.statements.append((elapsed, statement))
+
+
+class ORJSONResponse(responses.ORJSONResponse):
+    def render(self, content) -> bytes:
+        with serializing():
+            return super().render(content)
+
+
+@lru_cache(maxsize=None)
+def _adapter(response_type) -> TypeAdapter:
+    return TypeAdapter(response_type)
+
+
+def model_response(response_type, content: Any, **kwargs) -> responses.Response:
+    """
+    The body FastAPI would send for `response_model=response_type` (ORM objects read by
+    attribute, aliases applied), validated and rendered as serialization time. The route keeps
+    its response_model for the OpenAPI schema; a returned Response skips FastAPI's own pass.
+    """
+    adapter = _adapter(response_type)
+    with serializing():
+        body = adapter.dump_json(adapter.validate_python(content, from_attributes=True), by_alias=True)
+    return responses.Response(body, media_type="application/json", **kwargs)
+
+
+def json_response(content: Any, **kwargs) -> ORJSONResponse:
+    """A plain dict/list body (Decimals, UUIDs, datetimes...) encoded as serialization time."""
+    with serializing():
+        content = jsonable_encoder(content)
+    return ORJSONResponse(content, **kwargs)
+
+
+# --- Aggregation ---
+class _RouteStats:
+    __slots__ = ("count", "seconds", "db_seconds", "queries", "rows", "serialize_seconds", "duration_buckets", "query_buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.rows = 0
+        self.serialize_seconds = 0.0
+        self.duration_buckets = [0] * len(DURATION_BUCKETS)
+        self.query_buckets = [0] * len(QUERY_BUCKETS)
+
+
+class Registry:
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], _RouteStats] = {}
+        self._statuses: Dict[Tuple[str, str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        with self._lock:
+            entry = self._routes.get((method, route))
+            if entry is None:
+                entry = self._routes[(method, route)] = _RouteStats()
+            entry.count += 1
+            entry.seconds += seconds
+            entry.db_seconds += stats.db_seconds
+            entry.queries += stats.queries
+            entry.rows += stats.rows
+            entry.serialize_seconds += stats.serialize_seconds
+            _bucket(entry.duration_buckets, DURATION_BUCKETS, seconds)
+            _bucket(entry.query_buckets, QUERY_BUCKETS, stats.queries)
+            self._statuses[(method, route, status)] = self._statuses.get((method, route, status), 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            routes = {key: _copy(entry) for key, entry in self._routes.items()}
+            return routes, dict(self._statuses)
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+            self._statuses.clear()
+
+
+def _bucket(counts: List[int], bounds: Tuple, value: float):
+    for i, bound in enumerate(bounds):
+        if value <= bound:
+            counts[i] += 1
+            return
+
+
+def _copy(entry: _RouteStats) -> _RouteStats:
+    copy = _RouteStats()
+    for name in _RouteStats.__slots__:
+        value = getattr(entry, name)
+        setattr(copy, name, list(value) if isinstance(value, list) else value)
+    return copy
+
+
+registry = Registry()
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500 # Unless a response starts, the request failed
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            # The route template, not the raw path: one series per endpoint, not per group id
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            registry.observe(scope["method"], route, status, elapsed, stats)
+            if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+                _log_slow_request(scope["method"], scope["path"], route, status, elapsed, stats)
+
+
+def _log_slow_request(method, path, route, status, elapsed, stats: RequestStats):
+    lines = [
+        f"slow request {method} {path} ({route}) -> {status}: {elapsed * 1000:.1f}ms, "
+        f"db {stats.db_seconds * 1000:.1f}ms in {stats.queries} queries, {stats.rows} rows, "
+        f"serialize {stats.serialize_seconds * 1000:.1f}ms"
+    ]
+    lines.extend(f"  {seconds * 1000:8.2f}ms  {' '.join(statement.split())}" for seconds, statement in stats.statements)
+    if stats.queries > len(stats.statements):
+        lines.append(f"  ... {stats.queries - len(stats.statements)} more")
+    logger.warning("\n".join(lines))
+
+
+# --- Prometheus text format ---
+def _labels(**labels) -> str:
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+def _histogram(lines: List[str], name: str, labels: Dict, bounds: Tuple, counts: List[int], total: float, count: int):
+    cumulative = 0
+    for bound, n in zip(bounds, counts):
+        cumulative += n
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {total}")
+    lines.append(f"{name}_count{_labels(**labels)} {count}")
+
+
+def render(gauges: Dict[str, Tuple[str, Dict[str, dict]]] = None) -> str:
+    """
+    Everything in the registry as Prometheus text, plus `gauges`: {metric prefix: (label name,
+    {label value: stats() dict})}, e.g. {"splitmint_cache": ("cache", {"token": token_cache.stats()})}.
+    """
+    routes, statuses = registry.snapshot()
+    lines = [
+        "# HELP splitmint_requests_total HTTP requests by route and status.",
+        "# TYPE splitmint_requests_total counter",
+    ]
+    for (method, route, status), count in sorted(statuses.items()):
+        lines.append(f"splitmint_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+    lines += [
+        "# HELP splitmint_request_duration_seconds Wall time from request start to the last body byte.",
+        "# TYPE splitmint_request_duration_seconds histogram",
+    ]
+    for (method, route), entry in sorted(routes.items()):
+        _histogram(lines, "splitmint_request_duration_seconds", {"method": method, "route": route},
+                   DURATION_BUCKETS, entry.duration_buckets, entry.seconds, entry.count)
+
+    lines += [
+        "# HELP splitmint_request_queries SQL statements issued per request.",
+        "# TYPE splitmint_request_queries histogram",
+    ]
+    for (method, route), entry in sorted(routes.items()):
+        _histogram(lines, "splitmint_request_queries", {"method": method, "route": route},
+                   QUERY_BUCKETS, entry.query_buckets, entry.queries, entry.count)
+
+    counters = (
+        ("splitmint_request_db_seconds_total", "Time spent executing SQL.", "db_seconds"),
+        ("splitmint_request_rows_total", "Rows returned and written: driver row counts, or ORM objects loaded where SELECTs are not counted (SQLite).", "rows"),
+        ("splitmint_request_serialize_seconds_total", "Time spent rendering response bodies.", "serialize_seconds"),
+    )
+    for name, help_text, attribute in counters:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for (method, route), entry in sorted(routes.items()):
+            lines.append(f"{name}{_labels(method=method, route=route)} {getattr(entry, attribute)}")
+
+    for prefix, (label, sources) in (gauges or {}).items():
+        lines += _stats_lines(prefix, label, sources)
+    return "\n".join(lines) + "\n"
+
+
+def _stats_lines(prefix: str, label: str, sources: Dict[str, dict]) -> Iterable[str]:
+    """One gauge per numeric stats() field, e.g. splitmint_cache_hits{cache="token"}."""
+    by_field: Dict[str, List[str]] = {}
+    for source, stats in sorted(sources.items()):
+        for field, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                by_field.setdefault(field, []).append(f"{prefix}_{field}{_labels(**{label: source})} {value}")
+    lines = []
+    for field, samples in sorted(by_field.items()):
+        lines += [f"# TYPE {prefix}_{field} gauge"] + samples
+    return lines
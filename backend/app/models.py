@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, ForeignKey, Float, DateTime, Enum, Numeric, Table
+from sqlalchemy import Column, String, ForeignKey, Float, DateTime, Enum, Numeric, Table, Index, Integer
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -33,13 +33,26 @@ class Group(Base):
     id = Column(SQLAlchemyUUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
     created_by_user_id = Column(SQLAlchemyUUID(as_uuid=True), ForeignKey("users.id"))
+    # Bumped by every write that changes the group's balances (expenses, members, ledger rebuilds);
+    # cached settlement plans and ETags are keyed on it
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Bumped only when what a group body shows (its members) changes; expense writes leave it alone,
+    # so cached group bodies and their ETags survive them
+    members_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Expenses written since the group's last balance checkpoint; see crud.checkpoint_group_balances
+    expenses_since_checkpoint = Column(Integer, nullable=False, default=0, server_default="0")
 
     creator = relationship("User", back_populates="groups_created")
     members = relationship("GroupMember", back_populates="group", cascade="all, delete-orphan")
     expenses = relationship("Expense", back_populates="group", cascade="all, delete-orphan")
+    balances = relationship("GroupBalance", cascade="all, delete-orphan")
 
 class GroupMember(Base):
     __tablename__ = "group_members"
+    __table_args__ = (
+        # "Groups of a user" (get_groups_for_user); the primary key already serves group -> members
+        Index("ix_group_members_user_id_group_id", "user_id", "group_id"),
+    )
 
     group_id = Column(SQLAlchemyUUID(as_uuid=True), ForeignKey("groups.id"), primary_key=True)
     user_id = Column(SQLAlchemyUUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
@@ -50,6 +63,12 @@ class GroupMember(Base):
 
 class Expense(Base):
     __tablename__ = "expenses"
+    __table_args__ = (
+        # A group's expenses in date order
+        Index("ix_expenses_group_id_date", "group_id", "date", "id"),
+        # Covers the per-payer SUM in balance recomputes without touching the table
+        Index("ix_expenses_group_id_payer_id", "group_id", "payer_id", "amount"),
+    )
 
     id = Column(SQLAlchemyUUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     group_id = Column(SQLAlchemyUUID(as_uuid=True), ForeignKey("groups.id"), nullable=False)
@@ -66,6 +85,10 @@ class Expense(Base):
 
 class ExpenseSplit(Base):
     __tablename__ = "expense_splits"
+    __table_args__ = (
+        # A user's splits across expenses; the primary key only serves expense -> splits
+        Index("ix_expense_splits_user_id", "user_id", "expense_id"),
+    )
 
     expense_id = Column(SQLAlchemyUUID(as_uuid=True), ForeignKey("expenses.id"), primary_key=True)
     user_id = Column(SQLAlchemyUUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
@@ -73,3 +96,29 @@ class ExpenseSplit(Base):
 
     expense = relationship("Expense", back_populates="splits")
     user = relationship("User", back_populates="expense_splits")
+
+class GroupBalance(Base):
+    """Materialized net position (paid - owed) of a user within a group.
+
+    Maintained incrementally by every expense write; see crud.apply_balance_deltas.
+    """
+    __tablename__ = "group_balances"
+
+    group_id = Column(SQLAlchemyUUID(as_uuid=True), ForeignKey("groups.id"), primary_key=True)
+    user_id = Column(SQLAlchemyUUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    net = Column(Numeric(12, 2), nullable=False, default=0)
+
+class BalanceCheckpoint(Base):
+    """A user's net position within a group as of a point in its history: every expense
+    up to and including (date, expense_id), in the order of ix_expenses_group_id_date.
+
+    Taken every BALANCE_CHECKPOINT_INTERVAL expenses; see crud.get_group_balances_at.
+    The primary key serves "the latest checkpoint before a date".
+    """
+    __tablename__ = "balance_checkpoints"
+
+    group_id = Column(SQLAlchemyUUID(as_uuid=True), ForeignKey("groups.id"), primary_key=True)
+    date = Column(DateTime, primary_key=True)
+    expense_id = Column(SQLAlchemyUUID(as_uuid=True), ForeignKey("expenses.id"), primary_key=True)
+    user_id = Column(SQLAlchemyUUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    net = Column(Numeric(12, 2), nullable=False)
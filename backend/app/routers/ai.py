@@ -1,82 +1,58 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-import google.generativeai as genai
-import os
-import json
-from .. import crud, schemas, database, models
-from .auth import get_current_user
+from pydantic import ValidationError
+from .. import crud, schemas
+from ..database import Database, get_db
+from ..metrics import model_response
+from ..services import ai_parser
+from ..services.name_index import NameIndex, name_index_cache, resolve_parsed
+from .auth import get_current_user, ensure_group_member
 
 router = APIRouter(prefix="/api", tags=["ai"])
+logger = logging.getLogger(__name__)
 
-# Configure Gemini
-# In a real app, ensure GEMINI_API_KEY is set in environment
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+async def get_name_index(db: Database, group_id) -> NameIndex:
+    """The group's member-name index, built on first use and dropped when its membership changes."""
+    index = name_index_cache.get(group_id)
+    if index is None:
+        group = await db.run(crud.get_group, group_id=group_id, options=crud.GROUP_DETAIL)
+        index = NameIndex((m.user_id, m.user.name) for m in group.members)
+        name_index_cache.set(group_id, index)
+    return index
 
-# Use a model that supports JSON mode if available, or just standard prompt engineering
-# Gemini 1.5 Flash is good for speed/cost.
-model = genai.GenerativeModel('gemini-flash-latest')
-
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-@router.post("/parse-expense", response_model=schemas.ParsedExpense)
+@router.post("/parse-expense", response_model=schemas.ResolvedExpense)
 async def parse_expense(
     request: schemas.ParseExpenseRequest, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: Database = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user)
 ):
-    # 1. Fetch group to get member names
-    group = crud.get_group(db, group_id=request.group_id)
-    if not group:
-         raise HTTPException(status_code=404, detail="Group not found")
-    
     # Verify membership
-    is_member = any(m.user_id == current_user.id for m in group.members)
-    if not is_member:
-        raise HTTPException(status_code=403, detail="Not authorized")
+    await ensure_group_member(db, request.group_id, current_user)
 
-    member_names = [m.user.name for m in group.members]
-    
-    # 2. Construct Prompt
-    prompt = f"""
-    You are an expense parser. 
-    Analyze the following text: "{request.text}"
-    
-    Context: The group members are: {", ".join(member_names)}.
-    
-    Task: Extract the following fields:
-    - amount: (number)
-    - description: (short text summary)
-    - payer_name: (one of the group members, inferred from text. If 'me' or 'I', map to the current user's name: {current_user.name})
-    - involved_users: (list of names from the group members list who should split this. If 'everyone', include all members. If specific names, match them to the closest group member name.)
-    
-    Return ONLY valid JSON with this structure:
-    {{
-      "amount": 0.0,
-      "description": "string",
-      "payer_name": "string",
-      "involved_users": ["string", "string"],
-      "split_type": "EQUAL"
-    }}
-    """
-    
+    # 1. Member names, from the per-group index (no queries once built)
+    index = await get_name_index(db, request.group_id)
+
+    # 2. Rules first, then the model (cached, coalesced and bounded; see services/ai_parser.py)
     try:
-        response = model.generate_content(prompt)
-        text_response = response.text
-        
-        # Clean up markdown code blocks if present
-        if "```json" in text_response:
-            text_response = text_response.split("```json")[1].split("```")[0].strip()
-        elif "```" in text_response:
-            text_response = text_response.split("```")[1].split("```")[0].strip()
-            
-        parsed_data = json.loads(text_response)
-        
-        return parsed_data
+        parsed = await ai_parser.get_parser().parse(request.text, index.names, current_user.name)
+    except ai_parser.ParseTimeout as e:
+        logger.warning("AI parse timeout: %s", e)
+        raise HTTPException(status_code=504, detail="MintSense took too long to answer, try again")
     except Exception as e:
-        print(f"AI Parse Error: {e}")
+        logger.exception("AI parse error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to parse expense with AI")
+
+    # 3. Names to user ids, and the expense to submit once they all resolved
+    payer_id, involved, unresolved = resolve_parsed(index, parsed, current_user.id, current_user.name)
+    expense = None
+    if payer_id and involved and not unresolved and parsed["split_type"] == schemas.SplitType.EQUAL.value:
+        try:
+            expense = schemas.ExpenseCreate(
+                amount=parsed["amount"], description=parsed["description"], split_type=schemas.SplitType.EQUAL,
+                group_id=request.group_id, payer_id=payer_id, splits=[{"user_id": user_id} for user_id in involved],
+            )
+        except ValidationError: # e.g. no amount in the text; the client fills the form in by hand
+            expense = None
+    return model_response(schemas.ResolvedExpense, schemas.ResolvedExpense(
+        **parsed, payer_id=payer_id, involved_user_ids=involved, unresolved=unresolved, expense=expense,
+    ))
@@ -1,31 +1,42 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from datetime import timedelta
-from .. import crud, schemas, auth_utils, database
+import time
+import uuid
+from .. import crud, schemas, auth_utils
+from ..database import Database, get_db
+from ..metrics import model_response
 from jose import JWTError, jwt
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def password_pool_busy():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many login attempts in progress, try again shortly",
+        headers={"Retry-After": "1"},
+    )
 
 @router.post("/register", response_model=schemas.User)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, email=user.email)
+async def register(user: schemas.UserCreate, db: Database = Depends(get_db)):
+    db_user = await db.run(crud.get_user_by_email, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db=db, user=user)
+    try:
+        hashed_password = await auth_utils.get_password_hash_async(user.password)
+    except auth_utils.PasswordHashBusy:
+        raise password_pool_busy()
+    return model_response(schemas.User, await db.write(crud.create_user, user=user, hashed_password=hashed_password))
 
 @router.post("/token", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = crud.get_user_by_email(db, email=form_data.username) # OAuth2 form uses 'username' field
-    if not user or not auth_utils.verify_password(form_data.password, user.password_hash):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Database = Depends(get_db)):
+    user = await db.run(crud.get_user_by_email, email=form_data.username) # OAuth2 form uses 'username' field
+    try:
+        password_ok = user is not None and await auth_utils.verify_password_async(form_data.password, user.password_hash)
+    except auth_utils.PasswordHashBusy:
+        raise password_pool_busy()
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -35,9 +46,13 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
     access_token = auth_utils.create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return model_response(schemas.Token, {"access_token": access_token, "token_type": "bearer"})
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Database = Depends(get_db)):
+    principal = auth_utils.token_cache.get(token)
+    if principal is not None:
+        return principal
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -51,7 +66,28 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         token_data = schemas.TokenData(email=email)
     except JWTError:
         raise credentials_exception
-    user = crud.get_user_by_email(db, email=token_data.email)
+    user = await db.run(crud.get_user_by_email, email=token_data.email)
     if user is None:
         raise credentials_exception
-    return user
+
+    principal = schemas.CurrentUser.model_validate(user)
+    expires_in = payload["exp"] - time.time()
+    if expires_in > 0:
+        auth_utils.token_cache.set(token, principal, ttl=min(auth_utils.TOKEN_CACHE_TTL, expires_in))
+    return principal
+
+async def ensure_group_member(db: Database, group_id: uuid.UUID, user: schemas.CurrentUser):
+    """Raise 404/403 unless `user` belongs to the group. Costs one indexed EXISTS, or nothing when cached."""
+    if crud.is_cached_group_member(group_id, user.id):
+        return
+    if await db.run(crud.is_group_member, group_id=group_id, user_id=user.id):
+        return
+    # Only the failure path pays for telling a missing group apart from a forbidden one
+    if await db.run(crud.get_group, group_id=group_id) is None:
+        raise HTTPException(status_code=404, detail="Group not found")
+    raise HTTPException(status_code=403, detail="Not authorized")
+
+async def require_group_member(group_id: uuid.UUID, db: Database = Depends(get_db), current_user: schemas.CurrentUser = Depends(get_current_user)):
+    """Dependency for routes with a {group_id} path parameter. Returns the current user."""
+    await ensure_group_member(db, group_id, current_user)
+    return current_user
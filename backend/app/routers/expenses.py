@@ -1,111 +1,265 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Dict
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Literal, Optional
+from datetime import datetime, timedelta
+import base64
+import binascii
+import json
+import os
 import uuid
+import io
 from decimal import Decimal
-from .. import crud, schemas, database, models
-from .auth import get_current_user
-from ..services.balance_engine import BalanceEngine
+from .. import crud, schemas
+from ..cache import etag_matches, make_cache
+from ..database import Database, get_db
+from ..metrics import ORJSONResponse, json_response, model_response, serializing
+from .auth import get_current_user, ensure_group_member, require_group_member
+from ..services.balance_engine import BalanceEngine, SETTLEMENT_MODE
+from ..services import exporter, importer
 
 router = APIRouter(prefix="/expenses", tags=["expenses"])
 
-def get_db():
-    db = database.SessionLocal()
+# Upper bound on expenses accepted by one bulk request
+MAX_BULK_EXPENSES = 1000
+
+# Expense listing page size: default and upper bound of ?limit=
+EXPENSE_PAGE_SIZE = int(os.getenv("EXPENSE_PAGE_SIZE", "50"))
+MAX_EXPENSE_PAGE_SIZE = 500
+
+# Settlement plans keyed by (group id, group version, mode). Expense writes bump the version,
+# so entries never need invalidating; superseded ones age out. "redis" shares them across workers.
+SETTLEMENT_CACHE_BACKEND = os.getenv("SETTLEMENT_CACHE_BACKEND", "memory")
+SETTLEMENT_CACHE_URL = os.getenv("SETTLEMENT_CACHE_URL", "redis://localhost:6379/0")
+SETTLEMENT_CACHE_SIZE = int(os.getenv("SETTLEMENT_CACHE_SIZE", "1024"))
+SETTLEMENT_CACHE_TTL = float(os.getenv("SETTLEMENT_CACHE_TTL", "3600"))
+settlement_cache = make_cache(
+    SETTLEMENT_CACHE_BACKEND, SETTLEMENT_CACHE_SIZE, SETTLEMENT_CACHE_TTL,
+    url=SETTLEMENT_CACHE_URL, prefix="splitmint:settlements:",
+)
+
+# Upper bound on the points of one balance series (?bucket=day over years adds up)
+MAX_SERIES_POINTS = 1000
+
+def encode_expense_cursor(cursor: crud.ExpenseCursor) -> str:
+    date, expense_id = cursor
+    raw = json.dumps([date.isoformat(), expense_id.hex]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_expense_cursor(token: str) -> crud.ExpenseCursor:
     try:
-        yield db
-    finally:
-        db.close()
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        date, expense_id = json.loads(raw)
+        return datetime.fromisoformat(date), uuid.UUID(expense_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def bucket_edges(start: datetime, end: datetime, bucket: str) -> List[datetime]:
+    """Bucket boundaries covering [start, end): the bucket holding `start`, then each following one."""
+    edge = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == "week":
+        edge -= timedelta(days=edge.weekday())
+    elif bucket == "month":
+        edge = edge.replace(day=1)
+    edges = [edge]
+    while edges[-1] < end:
+        if len(edges) > MAX_SERIES_POINTS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_SERIES_POINTS} points per series; use a larger bucket")
+        edge = edges[-1]
+        if bucket == "month":
+            edges.append(edge.replace(year=edge.year + 1, month=1) if edge.month == 12 else edge.replace(month=edge.month + 1))
+        else:
+            edges.append(edge + timedelta(days=7 if bucket == "week" else 1))
+    return edges
 
 @router.post("/", response_model=schemas.Expense)
-def create_expense(expense_data: schemas.ExpenseCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def create_expense(expense_data: schemas.ExpenseCreate, db: Database = Depends(get_db), current_user: schemas.CurrentUser = Depends(get_current_user)):
     # Verify group membership
-    group = crud.get_group(db, group_id=expense_data.group_id)
-    if not group:
-        raise HTTPException(status_code=404, detail="Group not found")
-    
-    is_member = any(m.user_id == current_user.id for m in group.members)
-    if not is_member:
-        raise HTTPException(status_code=403, detail="Not authorized")
-
-    # Create expense record
-    db_expense = models.Expense(
-        group_id=expense_data.group_id,
-        payer_id=expense_data.payer_id,
-        amount=expense_data.amount,
-        description=expense_data.description,
-        split_type=expense_data.split_type.value
-    )
-    db.add(db_expense)
-    db.commit()
-    db.refresh(db_expense)
-
-    # Create splits
-    total_split = Decimal(0)
-    for split in expense_data.splits:
-        db_split = models.ExpenseSplit(
-            expense_id=db_expense.id,
-            user_id=split.user_id,
-            amount_owed=split.amount_owed
+    await ensure_group_member(db, expense_data.group_id, current_user)
+
+    # Splits were validated against the total by ExpenseCreate; write everything in one transaction
+    return model_response(schemas.Expense, await db.write(crud.create_expense, expense_data))
+
+@router.post("/bulk", response_model=List[schemas.Expense])
+async def create_expenses_bulk(expenses: List[schemas.ExpenseCreate], db: Database = Depends(get_db), current_user: schemas.CurrentUser = Depends(get_current_user)):
+    if len(expenses) > MAX_BULK_EXPENSES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_EXPENSES} expenses per request")
+    for group_id in {expense.group_id for expense in expenses}:
+        await ensure_group_member(db, group_id, current_user)
+    return model_response(List[schemas.Expense], await db.write(crud.create_expenses, expenses))
+
+@router.post("/splits", response_model=List[schemas.SplitResult])
+async def compute_splits_bulk(requests: List[schemas.SplitRequest], current_user: schemas.CurrentUser = Depends(get_current_user)):
+    """Preview server-side splits for many expenses at once. Bad items get an error, not a failed request."""
+    if len(requests) > MAX_BULK_EXPENSES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_EXPENSES} expenses per request")
+    results = []
+    for request in requests:
+        try:
+            splits = schemas.compute_splits(request.amount, request.split_type, request.splits)
+        except ValueError as exc:
+            results.append(schemas.SplitResult(error=str(exc)))
+            continue
+        results.append(schemas.SplitResult(splits=[{"user_id": user_id, "amount_owed": owed} for user_id, owed in splits]))
+    return model_response(List[schemas.SplitResult], results)
+
+@router.post("/group/{group_id}/import", response_model=schemas.ImportReport)
+async def import_group_expenses(
+    group_id: uuid.UUID,
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "jsonl"]] = None,
+    chunk_size: int = Query(importer.IMPORT_CHUNK_SIZE, ge=1, le=MAX_BULK_EXPENSES),
+    db: Database = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(require_group_member),
+):
+    # The upload is already spooled to disk; read it line by line rather than all at once
+    stream = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    try:
+        # Parsing and validating a large file is CPU work: keep it off the event loop in both DB modes
+        report = await db.run_in_worker(
+            importer.import_expenses, stream, format or importer.detect_format(file.filename),
+            group_id=group_id, chunk_size=chunk_size,
         )
-        db.add(db_split)
-        total_split += split.amount_owed
-    
-    # Validate total matches (approximate)
-    if abs(total_split - expense_data.amount) > Decimal("0.05"):
-         # Rollback? Ideally. For MVP we proceed but could log warning.
-         # Ideally we should validate BEFORE commit.
-         pass
-
-    db.commit()
-    db.refresh(db_expense)
-    return db_expense
+    finally:
+        stream.detach()
+    return model_response(schemas.ImportReport, report)
 
 @router.get("/group/{group_id}", response_model=List[schemas.Expense])
-def get_group_expenses(group_id: uuid.UUID, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    # Check auth
-    group = crud.get_group(db, group_id=group_id)
-    if not group:
-        raise HTTPException(status_code=404, detail="Group not found")
-    is_member = any(m.user_id == current_user.id for m in group.members)
-    if not is_member:
-        raise HTTPException(status_code=403, detail="Not authorized")
-        
-    return group.expenses
+async def get_group_expenses(
+    group_id: uuid.UUID,
+    limit: int = Query(EXPENSE_PAGE_SIZE, ge=1, le=MAX_EXPENSE_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    payer_id: Optional[uuid.UUID] = None,
+    db: Database = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(require_group_member),
+):
+    # Newest first. When more remain, X-Next-Cursor holds the value to pass as ?cursor= for the next page
+    after = decode_expense_cursor(cursor) if cursor else None
+    start, end = (schemas.as_utc(value) if value else None for value in (start, end))
+    expenses, next_cursor = await db.run(
+        crud.get_group_expenses, group_id, limit, after=after, start=start, end=end, payer_id=payer_id,
+    )
+    headers = {}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = encode_expense_cursor(next_cursor)
+    return model_response(List[schemas.Expense], expenses, headers=headers)
+
+@router.get("/group/{group_id}/export")
+async def export_group_expenses(
+    group_id: uuid.UUID,
+    format: Literal["ndjson", "json"] = "ndjson",
+    db: Database = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(require_group_member),
+):
+    # The whole history, oldest first, streamed from a DB cursor: never held in memory at once
+    return StreamingResponse(
+        db.stream(exporter.export_expenses, group_id, format),
+        media_type=exporter.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="expenses-{group_id}.{format}"'},
+    )
+
+@router.get("/me/balances")
+async def get_my_balances(
+    settle: bool = False,
+    db: Database = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
+):
+    """
+    The caller's net position in every group, from the ledger in a fixed number of queries.
+    With ?settle=true, also each group's transfers involving the caller and one netted
+    transfer per counterparty across all groups.
+    """
+    me = str(current_user.id)
+    sheets = await db.run(crud.get_user_group_balances, current_user.id)
+
+    total, groups, mine, names = Decimal(0), [], [], {}
+    for group, balances in sorted(sheets, key=lambda sheet: (sheet[0].name, str(sheet[0].id))):
+        names.update((str(member.user.id), member.user.name) for member in group.members)
+        net = balances.get(me, Decimal(0))
+        total += net
+        entry = {"group_id": group.id, "name": group.name, "net": net}
+        if settle:
+            # Greedy keeps the cost near-linear in group size; optimal's time budget would add up per group
+            transfers, _ = BalanceEngine.settle(balances, "greedy")
+            entry["settlements"] = [t for t in transfers if me in (t["from"], t["to"])]
+            mine.extend(entry["settlements"])
+        groups.append(entry)
+
+    summary = {"net": total, "groups": groups, "users": names}
+    if settle:
+        summary["settlements"] = BalanceEngine.net_transfers(me, mine)
+    return json_response(summary)
 
 @router.get("/group/{group_id}/balances")
-def get_group_balances(group_id: uuid.UUID, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    # Check auth
-    group = crud.get_group(db, group_id=group_id)
-    if not group:
-        raise HTTPException(status_code=404, detail="Group not found")
-    
-    # Calculate Net Balances
-    # Balance = Paid - Owed
-    
-    net_balances: Dict[str, Decimal] = {}
-    
-    # Initialize members
-    for member in group.members:
-        net_balances[str(member.user_id)] = Decimal(0)
-        
-    # Process all expenses in group
-    for expense in group.expenses:
-        payer_id = str(expense.payer_id)
-        if payer_id not in net_balances: net_balances[payer_id] = Decimal(0)
-        
-        # Add to payer
-        net_balances[payer_id] += expense.amount
-        
-        # Subtract from splitters
-        for split in expense.splits:
-            user_id = str(split.user_id)
-            if user_id not in net_balances: net_balances[user_id] = Decimal(0)
-            net_balances[user_id] -= split.amount_owed
-
-    # Run Minimize Cash Flow
-    optimized_debts = BalanceEngine.minimize_cash_flow(net_balances)
-    
-    return {
-        "balances": net_balances,
-        "settlements": optimized_debts
-    }
+async def get_group_balances(
+    group_id: uuid.UUID,
+    request: Request,
+    mode: Optional[Literal["greedy", "optimal"]] = None,
+    db: Database = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(require_group_member),
+):
+    # The group's version changes with every write that moves a balance: it identifies the plan
+    mode = mode or SETTLEMENT_MODE
+    version = await db.run(crud.get_group_version, group_id)
+    headers = {"ETag": f'W/"{version}-{mode}"', "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    key = (group_id, version, mode)
+    body = await settlement_cache.aget(key)
+    if body is None:
+        # Net balances (Paid - Owed) come from the materialized ledger, one row per member
+        net_balances: Dict[str, Decimal] = await db.run(crud.get_group_balances, group_id)
+
+        # Run Minimize Cash Flow; "optimal" may fall back to greedy, "mode" says which one ran
+        optimized_debts, used_mode = BalanceEngine.settle(net_balances, mode)
+        with serializing():
+            body = jsonable_encoder({
+                "balances": net_balances,
+                "settlements": optimized_debts,
+                "mode": used_mode,
+            })
+        await settlement_cache.aset(key, body)
+    return ORJSONResponse(body, headers=headers)
+
+@router.get("/group/{group_id}/balances/at")
+async def get_group_balances_at(
+    group_id: uuid.UUID,
+    at: datetime,
+    db: Database = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(require_group_member),
+):
+    """
+    Net balances as of `at`: every expense dated before it. Read from the nearest balance
+    checkpoint plus the expenses since; "replayed" says how many that was.
+    """
+    at = schemas.as_utc(at)
+    balances, checkpoint, replayed = await db.run(crud.get_group_balances_at, group_id, at)
+    return json_response({
+        "at": at,
+        "balances": balances,
+        "checkpoint": checkpoint and {"date": checkpoint[0], "expense_id": checkpoint[1]},
+        "replayed": replayed,
+    })
+
+@router.get("/group/{group_id}/balances/series")
+async def get_group_balance_series(
+    group_id: uuid.UUID,
+    start: datetime,
+    end: Optional[datetime] = None,
+    bucket: Literal["day", "week", "month"] = "day",
+    db: Database = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(require_group_member),
+):
+    """
+    Net balances at the start of every day, week or month from `start` until `end`
+    (default: now), for balance-over-time charts. The last point is the closing balance.
+    """
+    start, end = schemas.as_utc(start), schemas.as_utc(end) if end else datetime.utcnow()
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    edges = bucket_edges(start, end, bucket)
+    points = await db.run(crud.get_group_balance_series, group_id, edges)
+    return json_response({"bucket": bucket, "points": [{"at": edge, "balances": balances} for edge, balances in zip(edges, points)]})
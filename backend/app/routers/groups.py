@@ -1,74 +1,81 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from typing import List
+import hashlib
+import os
 import uuid
-from .. import crud, schemas, database, models
-from .auth import get_current_user
+from .. import crud, schemas
+from ..cache import TTLCache, etag_matches
+from ..database import Database, get_db
+from ..metrics import model_response, serializing
+from .auth import get_current_user, require_group_member
 
 router = APIRouter(prefix="/groups", tags=["groups"])
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Serialized schemas.Group bodies keyed by (group id, members version). Membership changes bump
+# it (expense writes don't), so a cached body is never stale, only unreachable; old ones fall out of the LRU.
+GROUP_CACHE_SIZE = int(os.getenv("GROUP_CACHE_SIZE", "4096"))
+GROUP_CACHE_TTL = float(os.getenv("GROUP_CACHE_TTL", "3600"))
+group_body_cache = TTLCache(maxsize=GROUP_CACHE_SIZE, ttl=GROUP_CACHE_TTL)
+
+def render_group(group) -> bytes:
+    with serializing():
+        return schemas.Group.model_validate(group).model_dump_json().encode()
+
+def json_body(body: bytes, etag: str) -> Response:
+    return Response(body, media_type="application/json", headers={"ETag": etag, "Cache-Control": "private, no-cache"})
 
 @router.post("/", response_model=schemas.Group)
-def create_group(group: schemas.GroupCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    return crud.create_group(db=db, group=group, user_id=current_user.id)
+async def create_group(group: schemas.GroupCreate, db: Database = Depends(get_db), current_user: schemas.CurrentUser = Depends(get_current_user)):
+    return model_response(schemas.Group, await db.write(crud.create_group, group=group, user_id=current_user.id))
 
 @router.get("/", response_model=List[schemas.Group])
-def read_groups(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    return crud.get_groups_for_user(db, user_id=current_user.id)
+async def read_groups(request: Request, db: Database = Depends(get_db), current_user: schemas.CurrentUser = Depends(get_current_user)):
+    # One narrow query says which groups and versions the list is made of; only changed groups are loaded
+    versions = await db.run(crud.get_group_members_versions_for_user, user_id=current_user.id)
+    digest = hashlib.blake2b(repr(versions).encode(), digest_size=12).hexdigest()
+    etag = f'W/"{digest}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+    bodies = {group_id: group_body_cache.get((group_id, version)) for group_id, version in versions}
+    missing = [group_id for group_id, body in bodies.items() if body is None]
+    if missing:
+        current = dict(versions)
+        for group in await db.run(crud.get_groups, group_ids=missing):
+            bodies[group.id] = render_group(group)
+            group_body_cache.set((group.id, current[group.id]), bodies[group.id])
+    return json_body(b"[" + b",".join(bodies[group_id] for group_id, _ in versions) + b"]", etag)
 
 @router.get("/{group_id}", response_model=schemas.Group)
-def read_group(group_id: uuid.UUID, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    group = crud.get_group(db, group_id=group_id)
-    if not group:
-        raise HTTPException(status_code=404, detail="Group not found")
-    # Verify membership
-    is_member = any(m.user_id == current_user.id for m in group.members)
-    if not is_member:
-        raise HTTPException(status_code=403, detail="Not authorized to view this group")
-    return group
+async def read_group(group_id: uuid.UUID, request: Request, db: Database = Depends(get_db), current_user: schemas.CurrentUser = Depends(require_group_member)):
+    version = await db.run(crud.get_group_members_version, group_id)
+    etag = f'W/"m{version}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+    body = group_body_cache.get((group_id, version))
+    if body is None:
+        body = render_group(await db.run(crud.get_group, group_id=group_id, options=crud.GROUP_DETAIL))
+        group_body_cache.set((group_id, version), body)
+    return json_body(body, etag)
 
 @router.post("/{group_id}/members", response_model=schemas.Group)
-def add_member(group_id: uuid.UUID, member_data: schemas.AddMemberRequest, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    # Check if group exists and user is member
-    group = crud.get_group(db, group_id=group_id)
-    if not group:
-         raise HTTPException(status_code=404, detail="Group not found")
-    
-    is_member = any(m.user_id == current_user.id for m in group.members)
-    if not is_member:
-        raise HTTPException(status_code=403, detail="Not authorized to edit this group")
-    
+async def add_member(group_id: uuid.UUID, member_data: schemas.AddMemberRequest, db: Database = Depends(get_db), current_user: schemas.CurrentUser = Depends(require_group_member)):
     user_to_add = None
 
     if member_data.email:
         # Try to find existing user by email
-        user_to_add = crud.get_user_by_email(db, email=member_data.email)
+        user_to_add = await db.run(crud.get_user_by_email, email=member_data.email)
         if not user_to_add:
              raise HTTPException(status_code=404, detail="User with this email not found")
+        # Check if already member (a freshly created ghost never is)
+        if await db.run(crud.is_group_member, group_id=group_id, user_id=user_to_add.id):
+            raise HTTPException(status_code=400, detail="User already in group")
     elif member_data.name:
-        # Create a "ghost" user (placeholder)
-        # We need a unique email, so we generate one.
-        ghost_email = f"ghost_{uuid.uuid4()}@splitmint.com"
-        user_in = schemas.UserCreate(
-            email=ghost_email,
-            password="ghost_user_password", # Dummy password
-            name=member_data.name
-        )
-        user_to_add = crud.create_user(db=db, user=user_in)
+        # Create a "ghost" user (placeholder) with an unusable credential
+        user_to_add = await db.write(crud.create_ghost_user, name=member_data.name)
     else:
         raise HTTPException(status_code=400, detail="Must provide either email or name")
 
-    
-    # Check if already member
-    if any(m.user_id == user_to_add.id for m in group.members):
-        raise HTTPException(status_code=400, detail="User already in group")
-
-    crud.add_user_to_group(db, group_id=group.id, user_id=user_to_add.id)
-    db.refresh(group)
-    return group
+    await db.write(crud.add_user_to_group, group_id=group_id, user_id=user_to_add.id)
+    return model_response(schemas.Group, await db.run(crud.get_group, group_id=group_id, options=crud.GROUP_DETAIL))
@@ -1,14 +1,20 @@
-from pydantic import BaseModel, EmailStr, UUID4, Field
+from pydantic import BaseModel, EmailStr, UUID4, Field, field_validator, model_validator
 from typing import List, Optional, Literal
-from datetime import datetime
+from datetime import datetime, timezone
 from decimal import Decimal
 from enum import Enum
 
+from .services.split_calculator import SplitCalculator
+
 class SplitType(str, Enum):
     EQUAL = "EQUAL"
     EXACT = "EXACT"
     PERCENT = "PERCENT"
 
+def as_utc(value: datetime) -> datetime:
+    """Expense dates are stored as naive UTC: convert aware values, keep naive ones as they are."""
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
 # --- User Schemas ---
 class UserBase(BaseModel):
     email: EmailStr
@@ -28,6 +34,16 @@ class User(UserBase):
     class Config:
         from_attributes = True
 
+class CurrentUser(BaseModel):
+    """Lightweight principal resolved from an access token."""
+    id: UUID4
+    email: EmailStr
+    name: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+        frozen = True
+
 # --- Token Schemas ---
 class Token(BaseModel):
     access_token: str
@@ -41,8 +57,10 @@ class ExpenseSplitBase(BaseModel):
     user_id: UUID4
     amount_owed: Decimal
 
-class ExpenseSplitCreate(ExpenseSplitBase):
-    pass
+class ExpenseSplitCreate(BaseModel):
+    user_id: UUID4
+    amount_owed: Optional[Decimal] = None # Required for EXACT; computed server-side for EQUAL and PERCENT
+    percent: Optional[Decimal] = None # Required for PERCENT
 
 class ExpenseSplit(ExpenseSplitBase):
     expense_id: UUID4
@@ -60,9 +78,36 @@ class ExpenseBase(BaseModel):
 class ExpenseCreate(ExpenseBase):
     payer_id: UUID4
     splits: List[ExpenseSplitCreate]
+    date: Optional[datetime] = None # Defaults to now; set when importing history
+
+    @field_validator("date")
+    @classmethod
+    def check_date(cls, value: Optional[datetime]) -> Optional[datetime]:
+        return as_utc(value) if value is not None else None
+
+    @model_validator(mode="after")
+    def check_splits(self):
+        # Every split leaves here with amount_owed in exact cents, adding up to the amount
+        for split, (_, owed) in zip(self.splits, compute_splits(self.amount, self.split_type, self.splits)):
+            split.amount_owed = owed
+        return self
+
+def compute_splits(amount: Decimal, split_type: SplitType, splits: List[ExpenseSplitCreate]):
+    user_ids = [split.user_id for split in splits]
+    if len(set(user_ids)) != len(user_ids):
+        raise ValueError("Each user may appear only once in splits")
+    return SplitCalculator.compute(
+        amount, split_type.value, [(split.user_id, split.amount_owed, split.percent) for split in splits]
+    )
+
+class SplitRequest(BaseModel):
+    amount: Decimal
+    split_type: SplitType
+    splits: List[ExpenseSplitCreate]
 
-    # Validation to ensure splits match total amount could go here
-    # but might be complex for 'EQUAL' type on instantiation
+class SplitResult(BaseModel):
+    splits: List[ExpenseSplitBase] = []
+    error: Optional[str] = None
 
 class Expense(ExpenseBase):
     id: UUID4
@@ -73,6 +118,15 @@ class Expense(ExpenseBase):
     class Config:
         from_attributes = True
 
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportReport(BaseModel):
+    imported: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+
 # --- Group Schemas ---
 class GroupBase(BaseModel):
     name: str
@@ -110,8 +164,16 @@ class ParsedExpense(BaseModel):
     description: str
     payer_name: str
     involved_users: List[str]
+    excluded_users: List[str] = []
     split_type: Optional[SplitType] = SplitType.EQUAL
 
+class ResolvedExpense(ParsedExpense):
+    """A parse with its names matched to group members; `expense` is ready to POST to /expenses/ when every name resolved."""
+    payer_id: Optional[UUID4] = None
+    involved_user_ids: List[UUID4] = []
+    unresolved: List[str] = []
+    expense: Optional[ExpenseCreate] = None
+
 
 class AddMemberRequest(BaseModel):
     email: Optional[EmailStr] = None
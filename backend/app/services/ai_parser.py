@@ -0,0 +1,236 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+from typing import Dict, Optional, Sequence
+
+from .. import schemas
+from ..cache import TTLCache
+from .rule_parser import RuleParser
+
+# "gemini" (needs GEMINI_API_KEY) or "fake": a canned, offline parser with configurable latency for benchmarks
+AI_MODEL_BACKEND = os.getenv("AI_MODEL_BACKEND", "gemini")
+AI_MODEL_NAME = os.getenv("AI_MODEL_NAME", "gemini-flash-latest")
+# Per request, including time spent waiting for a free slot
+AI_TIMEOUT = float(os.getenv("AI_TIMEOUT_SECONDS", "15"))
+# Model calls in flight at once per process; further requests queue (and count against their timeout)
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+AI_CACHE_SIZE = int(os.getenv("AI_CACHE_SIZE", "2048"))
+AI_CACHE_TTL = float(os.getenv("AI_CACHE_TTL", "3600"))
+AI_FAKE_LATENCY = float(os.getenv("AI_FAKE_LATENCY_MS", "300")) / 1000
+# Try the rule-based parser first and only ask the model when it is unsure
+AI_FAST_PATH = os.getenv("AI_FAST_PATH", "1") == "1"
+
+logger = logging.getLogger(__name__)
+
+
+class ParseTimeout(Exception):
+    pass
+
+
+def build_prompt(text: str) -> str:
+    # No roster: names come back as written and are matched to members server-side (services/name_index.py),
+    # which keeps the prompt the same size for any group and lets identical texts share a cache entry
+    return f"""
+    You are an expense parser.
+    Analyze the following text: "{text}"
+
+    Task: Extract the following fields:
+    - amount: (number)
+    - description: (short text summary)
+    - payer_name: (who paid, as written in the text. If 'me' or 'I', use "me")
+    - involved_users: (list of the people who should split this, as written in the text; "me" for the writer. If 'everyone', use ["everyone"].)
+    - excluded_users: (people explicitly left out, e.g. "everyone except Charlie" gives ["Charlie"]; otherwise [])
+
+    Return ONLY valid JSON with this structure:
+    {{
+      "amount": 0.0,
+      "description": "string",
+      "payer_name": "string",
+      "involved_users": ["string", "string"],
+      "excluded_users": [],
+      "split_type": "EQUAL"
+    }}
+    """
+
+
+def extract_json(text_response: str) -> Dict:
+    # Clean up markdown code blocks if present
+    if "```json" in text_response:
+        text_response = text_response.split("```json")[1].split("```")[0].strip()
+    elif "```" in text_response:
+        text_response = text_response.split("```")[1].split("```")[0].strip()
+    return json.loads(text_response)
+
+
+class GeminiBackend:
+    def __init__(self, model_name: str = AI_MODEL_NAME):
+        import google.generativeai as genai
+
+        # In a real app, ensure GEMINI_API_KEY is set in environment
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        self.model = genai.GenerativeModel(model_name)
+
+    async def generate(self, text: str) -> str:
+        # The async client: the event loop keeps serving other requests during the round trip
+        response = await self.model.generate_content_async(build_prompt(text))
+        return response.text
+
+
+class FakeBackend:
+    """
+    Offline stand-in for the model: sleeps for `latency` (+/- `jitter`) and answers with the
+    first number in the text, "me" as payer and everyone involved.
+    """
+
+    def __init__(self, latency: float = AI_FAKE_LATENCY, jitter: float = 0.2):
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+
+    async def generate(self, text: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency * random.uniform(1 - self.jitter, 1 + self.jitter))
+        return self.answer(text)
+
+    @staticmethod
+    def answer(text: str) -> str:
+        amount = re.search(r"\d+(?:\.\d+)?", text)
+        return "```json\n" + json.dumps({
+            "amount": float(amount.group()) if amount else 0.0,
+            "description": text.strip()[:60],
+            "payer_name": "me",
+            "involved_users": ["everyone"],
+            "split_type": "EQUAL",
+        }) + "\n```"
+
+
+BACKENDS = {"gemini": GeminiBackend, "fake": FakeBackend}
+
+
+class ExpenseParser:
+    """
+    Parses free-text expenses with a model backend, without ever blocking the event loop.
+
+    Formulaic texts are answered by `rules` (a RuleParser) in microseconds; only what it
+    is not confident about reaches the model.
+    The model never sees the roster, so its results are cached by normalized text alone and
+    shared across groups; names are matched to members afterwards. Identical requests that
+    arrive while the first is still waiting on the model share its call instead of making their own.
+    """
+
+    def __init__(self, backend, timeout: float = AI_TIMEOUT, max_concurrency: int = AI_MAX_CONCURRENCY,
+                 cache: Optional[TTLCache] = None, rules: Optional[RuleParser] = None):
+        self.backend = backend
+        self.rules = rules
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.cache = cache if cache is not None else TTLCache(maxsize=AI_CACHE_SIZE, ttl=AI_CACHE_TTL)
+        self.calls = 0
+        self.fast_path_hits = 0
+        self.fast_path_misses = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.errors = 0
+        self._loop = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def cache_key(text: str) -> str:
+        return " ".join(text.split()).casefold()
+
+    def _bind_loop(self):
+        # asyncio primitives belong to one event loop; the server has one, test clients may start several
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._inflight = {}
+        return loop
+
+    async def parse(self, text: str, member_names: Sequence[str], current_user_name: str) -> Dict:
+        if self.rules is not None:
+            try:
+                parsed, _ = self.rules.parse(text, member_names, current_user_name)
+                if parsed is not None:
+                    parsed = schemas.ParsedExpense.model_validate(parsed).model_dump(mode="json")
+            except Exception: # A rules bug costs a model call, not the request
+                logger.exception("Rule parser failed on %r", text)
+                parsed = None
+            if parsed is not None:
+                self.fast_path_hits += 1
+                return parsed
+            self.fast_path_misses += 1
+
+        key = self.cache_key(text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        loop = self._bind_loop()
+        task = self._inflight.get(key)
+        if task is None:
+            task = loop.create_task(self._call(key, text))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.coalesced += 1
+        # Shielded: a caller that goes away does not cancel the call others are waiting on
+        return await asyncio.shield(task)
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None: # Retrieved here so abandoned failures are not logged
+            if isinstance(task.exception(), ParseTimeout):
+                self.timeouts += 1
+            else:
+                self.errors += 1
+
+    async def _call(self, key: str, text: str) -> Dict:
+        try:
+            raw = await asyncio.wait_for(self._generate(text), self.timeout)
+        except asyncio.TimeoutError:
+            raise ParseTimeout(f"No answer from the model within {self.timeout:g}s")
+        parsed = schemas.ParsedExpense.model_validate(extract_json(raw)).model_dump(mode="json")
+        self.cache.set(key, parsed)
+        return parsed
+
+    async def _generate(self, text: str) -> str:
+        async with self._semaphore:
+            self.calls += 1
+            return await self.backend.generate(text)
+
+    def stats(self) -> dict:
+        attempts = self.fast_path_hits + self.fast_path_misses
+        return {
+            **self.cache.stats(),
+            "fast_path_hits": self.fast_path_hits,
+            "fast_path_misses": self.fast_path_misses,
+            "fast_path_hit_rate": round(self.fast_path_hits / attempts, 4) if attempts else 0.0,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "in_flight": len(self._inflight),
+            "max_concurrency": self.max_concurrency,
+        }
+
+
+_parser: Optional[ExpenseParser] = None
+
+
+def get_parser() -> ExpenseParser:
+    """The process-wide parser, created on first use so the fake backend never loads the Gemini SDK."""
+    global _parser
+    if _parser is None:
+        _parser = ExpenseParser(BACKENDS[AI_MODEL_BACKEND](), rules=RuleParser() if AI_FAST_PATH else None)
+    return _parser
+
+
+def stats() -> dict:
+    """The process-wide parser's stats for /metrics; empty until it exists, so a scrape never creates it."""
+    return _parser.stats() if _parser is not None else {}
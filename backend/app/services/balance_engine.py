@@ -1,68 +1,197 @@
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
 from typing import List, Dict, Tuple
 import heapq
+import os
+import time
+
+# "greedy": largest creditor vs largest debtor, O(n log n), at most n - 1 transfers.
+# "optimal": the minimum number of transfers (exponential; see OPTIMAL_MAX_ACCOUNTS).
+SETTLEMENT_MODE = os.getenv("SETTLEMENT_MODE", "greedy")
+# Optimal mode falls back to greedy beyond this many non-zero accounts, or when it runs out of time
+OPTIMAL_MAX_ACCOUNTS = int(os.getenv("OPTIMAL_MAX_ACCOUNTS", "18"))
+OPTIMAL_TIME_BUDGET = float(os.getenv("OPTIMAL_TIME_BUDGET_MS", "200")) / 1000
+
+SETTLEMENT_MODES = ("greedy", "optimal")
+
+CENT = Decimal("0.01")
+
+
+def to_cents(amount) -> int:
+    return int(Decimal(amount).quantize(CENT, rounding=ROUND_HALF_UP) * 100)
+
+
+def from_cents(cents: int) -> Decimal:
+    return (Decimal(cents) / 100).quantize(CENT)
+
+
+class SettlementBudgetExceeded(Exception):
+    pass
+
 
 class BalanceEngine:
     @staticmethod
-    def minimize_cash_flow(net_balances: Dict[str, Decimal]) -> List[Dict]:
+    def minimize_cash_flow(
+        net_balances: Dict[str, Decimal],
+        mode: str = SETTLEMENT_MODE,
+        time_budget: float = OPTIMAL_TIME_BUDGET,
+        strict: bool = False,
+    ) -> List[Dict]:
         """
         Implements the Minimize Cash Flow algorithm.
         Input: Dict mapping user_id (str) -> net_balance (Decimal)
         Output: List of transactions [{'from': user_id, 'to': user_id, 'amount': Decimal}]
         """
-        
-        # Filter out users with 0 balance
-        creditors = [] # Max heap for positive balances (store as negative for min-heap behavior)
-        debtors = []   # Max heap for negative balances (store as positive magnitude)
-
-        for user, amount in net_balances.items():
-            if amount > 0.01:
-                # Python's heapq is a min-heap. We want max-heap behavior for the greedy approach.
-                # So we store negative values for creditors to pop the "most positive" (closest to -inf? No.)
-                # Wait, standard Python trick for max heap is storing -value.
-                # Here specifically:
-                # Creditor with +100. Store as -100. Pop smallest (-100). Convert back to +100.
-                heapq.heappush(creditors, (-amount, user))
-            elif amount < -0.01:
-                # Debtor with -50. Magnitude is 50. Store as -50? 
-                # We want the 'biggest' debtor (most negative).
-                # -100 vs -50. -100 is "smaller" in number line but "bigger" debt.
-                # If we use min-heap on raw values: -100 comes before -50. Correct.
-                heapq.heappush(debtors, (amount, user))
-
-        transactions = []
-
-        while creditors and debtors:
-            # Get the creditor with max credit and debtor with max debt
-            credit_amount_neg, creditor_id = heapq.heappop(creditors)
-            debt_amount_raw, debtor_id = heapq.heappop(debtors)
-            
-            credit_amount = -credit_amount_neg # Convert back to positive
-            debt_amount = -debt_amount_raw     # Convert neg balance to positive magnitude 
-                                               # Wait, if debtor has -100, debt_amount_raw is -100.
-                                               # We want magnitude 100. So -(-100) = 100.
-
-            # Determine the settlement amount being the minimum of debt or credit
-            amount = min(credit_amount, debt_amount)
-            
-            # Record transaction
-            transactions.append({
-                "from": debtor_id,
-                "to": creditor_id,
-                "amount": amount
-            })
-
-            # Update balances
-            remaining_credit = credit_amount - amount
-            remaining_debt = debt_amount - amount
-
-            # Push back if there's remaining balance
-            if remaining_credit > 0.01:
-                heapq.heappush(creditors, (-remaining_credit, creditor_id))
-            
-            if remaining_debt > 0.01:
-                # Debtor still owes money. We popped -100 (debt), paid 50. Remaining debt -50.
-                # Push back -50.
-                heapq.heappush(debtors, (-remaining_debt, debtor_id))
-
-        return transactions
+        return BalanceEngine.settle(net_balances, mode, time_budget, strict)[0]
+
+    @staticmethod
+    def settle(
+        net_balances: Dict[str, Decimal],
+        mode: str = SETTLEMENT_MODE,
+        time_budget: float = OPTIMAL_TIME_BUDGET,
+        strict: bool = False,
+    ) -> Tuple[List[Dict], str]:
+        """
+        Settle balances exactly, in integer cents. Returns the transactions and the mode that
+        produced them ("optimal" may fall back to "greedy").
+
+        Balances must sum to zero. Expenses written before splits were computed server-side
+        were accepted within a small tolerance, so stored balances can carry a few cents of residue;
+        with strict=False that residue is trimmed from the largest accounts on the
+        surplus side (ties broken by user id), with strict=True it raises ValueError.
+        """
+        if mode not in SETTLEMENT_MODES:
+            raise ValueError(f"Unknown settlement mode {mode!r}")
+        cents = {user: to_cents(amount) for user, amount in net_balances.items()}
+        _balance_to_zero(cents, strict)
+        accounts = sorted((user, amount) for user, amount in cents.items() if amount != 0)
+
+        used = "greedy"
+        if mode == "optimal" and len(accounts) <= OPTIMAL_MAX_ACCOUNTS:
+            try:
+                groups = _zero_sum_partition(accounts, time.perf_counter() + time_budget)
+                used = "optimal"
+            except SettlementBudgetExceeded:
+                groups = [accounts]
+        else:
+            groups = [accounts]
+
+        transfers = [t for group in groups for t in _greedy(group)]
+        return [{"from": debtor, "to": creditor, "amount": from_cents(amount)} for debtor, creditor, amount in transfers], used
+
+    @staticmethod
+    def net_transfers(user_id: str, transfers: List[Dict]) -> List[Dict]:
+        """
+        Collapse one user's transfers from several settlement plans (e.g. one per group)
+        into at most one transfer per counterparty, largest first. Amounts are netted in
+        integer cents, so the result moves exactly the same money.
+        """
+        owed: Dict[str, int] = {} # counterparty -> cents they owe user_id (negative: user_id owes them)
+        for transfer in transfers:
+            if transfer["to"] == user_id:
+                owed[transfer["from"]] = owed.get(transfer["from"], 0) + to_cents(transfer["amount"])
+            elif transfer["from"] == user_id:
+                owed[transfer["to"]] = owed.get(transfer["to"], 0) - to_cents(transfer["amount"])
+        netted = sorted(((-abs(cents), other, cents) for other, cents in owed.items() if cents), key=lambda t: t[:2])
+        return [
+            {"from": other, "to": user_id, "amount": from_cents(cents)} if cents > 0
+            else {"from": user_id, "to": other, "amount": from_cents(-cents)}
+            for _, other, cents in netted
+        ]
+
+
+def _balance_to_zero(cents: Dict[str, int], strict: bool):
+    residue = sum(cents.values())
+    if residue == 0:
+        return
+    if strict:
+        raise ValueError(f"Balances do not sum to zero (off by {from_cents(residue)})")
+    # Positive residue: creditors are owed more than debtors owe, so shave the biggest creditors
+    sign = 1 if residue > 0 else -1
+    for user in sorted((u for u in cents if cents[u] * sign > 0), key=lambda u: (-abs(cents[u]), u)):
+        take = min(abs(residue), abs(cents[user]))
+        cents[user] -= sign * take
+        residue -= sign * take
+        if residue == 0:
+            return
+
+
+def _greedy(accounts: List[Tuple[str, int]]) -> List[Tuple[str, str, int]]:
+    """
+    Repeatedly settle the largest debt against the largest credit. Every transfer zeroes
+    at least one account and the last zeroes two, so a zero-sum set of k accounts takes
+    at most k - 1 transfers. Integer cents: nothing is left over.
+    """
+    creditors = [(-amount, user) for user, amount in accounts if amount > 0] # Max-heaps via negation
+    debtors = [(amount, user) for user, amount in accounts if amount < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append((debtor, creditor, amount))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor))
+    return transfers
+
+
+def _zero_sum_partition(accounts: List[Tuple[str, int]], deadline: float) -> List[List[Tuple[str, int]]]:
+    """
+    Split zero-sum `accounts` into the largest number of zero-sum groups. Settling each group
+    on its own takes (size - 1) transfers, so this minimizes the total: n - number of groups.
+
+    Exact opposites (+x, -x) are paired off first; some optimal partition always contains
+    them. The rest is a DP over subsets (O(2^n * n)): best[mask] is the most zero-sum groups
+    that the accounts in `mask` can be split into when added one at a time.
+    """
+    groups = []
+    by_amount: Dict[int, List[Tuple[str, int]]] = {}
+    for account in accounts:
+        opposite = by_amount.get(-account[1])
+        if opposite:
+            groups.append([opposite.pop(), account])
+        else:
+            by_amount.setdefault(account[1], []).append(account)
+    rest = sorted(a for same in by_amount.values() for a in same)
+    if not rest:
+        return groups
+
+    n = len(rest)
+    amounts = [amount for _, amount in rest]
+    full = (1 << n) - 1
+    sums = [0] * (full + 1)
+    best = [0] * (full + 1)
+    for mask in range(1, full + 1):
+        if not mask & 0xFFF and time.perf_counter() > deadline:
+            raise SettlementBudgetExceeded()
+        low = mask & -mask
+        sums[mask] = sums[mask ^ low] + amounts[low.bit_length() - 1]
+        most = 0
+        bits = mask
+        while bits:
+            bit = bits & -bits
+            if best[mask ^ bit] > most:
+                most = best[mask ^ bit]
+            bits ^= bit
+        best[mask] = most + (sums[mask] == 0)
+
+    # Walk back from the full set; consecutive zero-sum masks on the path delimit the groups
+    mask, group = full, []
+    while mask:
+        target = best[mask] - (sums[mask] == 0)
+        bits = mask
+        while bits:
+            bit = bits & -bits
+            if best[mask ^ bit] == target:
+                break
+            bits ^= bit
+        group.append(rest[bit.bit_length() - 1])
+        mask ^= bit
+        if sums[mask] == 0:
+            groups.append(group)
+            group = []
+    return groups
@@ -0,0 +1,73 @@
+import json
+import os
+import uuid
+from itertools import groupby
+from typing import Dict, Iterator
+
+from sqlalchemy.orm import Session
+
+from .. import crud
+
+# Expenses fetched per round trip, and per chunk written to the response
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "json": "application/json"}
+
+
+def iter_expenses(db: Session, group_id: uuid.UUID, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Dict]:
+    """
+    Yield a group's expenses oldest first, shaped like schemas.Expense as the list
+    endpoint serializes it. Built from plain rows rather than ORM objects or Pydantic
+    models, one expense at a time.
+    """
+    rows = crud.iter_group_expense_rows(db, group_id, batch_size)
+    for expense_id, expense_rows in groupby(rows, key=lambda row: row.id):
+        expense_rows = list(expense_rows)
+        first = expense_rows[0]
+        yield {
+            "amount": str(first.amount),
+            "description": first.description,
+            "split_type": first.split_type,
+            "group_id": str(first.group_id),
+            "id": str(expense_id),
+            "payer_id": str(first.payer_id),
+            "date": first.date.isoformat() if first.date else None,
+            "splits": [
+                {"user_id": str(row.user_id), "amount_owed": str(row.amount_owed), "expense_id": str(expense_id)}
+                for row in expense_rows if row.user_id is not None
+            ],
+        }
+
+
+def export_expenses(
+    db: Session,
+    group_id: uuid.UUID,
+    fmt: str = "ndjson",
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[bytes]:
+    """
+    Encode a group's history as NDJSON (one expense per line, re-importable with
+    importer.import_expenses) or as a single JSON array. Yields chunks of about
+    `batch_size` expenses, so memory use is bounded by the batch size, not the group.
+    """
+    if fmt == "json":
+        yield b"["
+    separator = "\n" if fmt == "ndjson" else ","
+    buffer = []
+    first_chunk = True
+    for expense in iter_expenses(db, group_id, batch_size):
+        buffer.append(json.dumps(expense, separators=(",", ":")))
+        if len(buffer) >= batch_size:
+            yield _chunk(buffer, fmt, separator, first_chunk)
+            buffer, first_chunk = [], False
+    if buffer:
+        yield _chunk(buffer, fmt, separator, first_chunk)
+    if fmt == "json":
+        yield b"]"
+
+
+def _chunk(lines, fmt: str, separator: str, first_chunk: bool) -> bytes:
+    body = separator.join(lines)
+    if fmt == "ndjson":
+        return (body + "\n").encode()
+    return (body if first_chunk else separator + body).encode()
@@ -0,0 +1,156 @@
+import csv
+import json
+import os
+import uuid
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .. import crud, schemas
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+# Rows that fail are always counted, but only this many are reported back in detail
+MAX_REPORTED_ERRORS = 1000
+
+CSV_COLUMNS = ["amount", "description", "split_type", "payer_id", "date", "splits"]
+
+
+def detect_format(filename: Optional[str]) -> str:
+    if filename and filename.lower().endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return "csv"
+
+
+def _parse_csv_splits(value: str, split_type: Optional[str] = None) -> List[Dict]:
+    # "user_id:amount;user_id:amount" for EXACT, "user_id:percent;..." for PERCENT, "user_id;user_id" for EQUAL
+    field = "percent" if (split_type or "").upper() == "PERCENT" else "amount_owed"
+    splits = []
+    for part in filter(None, (p.strip() for p in (value or "").split(";"))):
+        user_id, _, amount = part.partition(":")
+        split = {"user_id": user_id.strip()}
+        if amount.strip():
+            split[field] = amount.strip()
+        splits.append(split)
+    return splits
+
+
+def iter_rows(stream: TextIO, fmt: str) -> Iterator[Tuple[int, Dict]]:
+    """
+    Lazily yield (row_number, raw_dict) from a CSV or JSONL text stream.
+    Parse errors are yielded as (row_number, exception) so the caller can report them; bytes
+    that are not UTF-8 end the file with one, since nothing after them can be read reliably.
+    """
+    row_number = 0 if fmt == "jsonl" else 1 # Row 1 of a CSV is the header
+    try:
+        if fmt == "jsonl":
+            for row_number, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as exc:
+                    yield row_number, exc
+                    continue
+                if not isinstance(record, dict):
+                    yield row_number, ValueError("row must be an object")
+                    continue
+                yield row_number, record
+        else:
+            reader = csv.DictReader(stream)
+            while True:
+                try:
+                    record = next(reader)
+                except StopIteration:
+                    break
+                except csv.Error as exc: # e.g. a field over csv.field_size_limit(); the reader resumes on the next line
+                    row_number += 1
+                    yield row_number, exc
+                    continue
+                row_number += 1
+                record = {k: v for k, v in record.items() if k and v not in (None, "")}
+                record["splits"] = _parse_csv_splits(record.get("splits", ""), record.get("split_type"))
+                yield row_number, record
+    except UnicodeDecodeError as exc:
+        yield row_number + 1, ValueError(f"file is not valid UTF-8 ({exc.reason}); this row and the rest were not read")
+
+
+def _describe(exc: Exception) -> str:
+    if isinstance(exc, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(p) for p in err['loc']) or 'row'}: {err['msg']}" for err in exc.errors()
+        )
+    return str(exc).splitlines()[0] if str(exc) else exc.__class__.__name__
+
+
+class _Importer:
+    def __init__(self, db: Session, report: schemas.ImportReport):
+        self.db = db
+        self.report = report
+
+    def fail(self, row_number: int, error: str):
+        self.report.failed += 1
+        if len(self.report.errors) < MAX_REPORTED_ERRORS:
+            self.report.errors.append(schemas.ImportRowError(row=row_number, error=error))
+
+    def write(self, chunk: List[Tuple[int, schemas.ExpenseCreate]]):
+        try:
+            crud.create_expenses(self.db, [expense for _, expense in chunk])
+            self.report.imported += len(chunk)
+            return
+        except SQLAlchemyError:
+            self.db.rollback()
+        # Something in the chunk was rejected by the database: retry row by row to isolate it
+        for row_number, expense in chunk:
+            try:
+                crud.create_expenses(self.db, [expense])
+                self.report.imported += 1
+            except SQLAlchemyError as exc:
+                self.db.rollback()
+                self.fail(row_number, _describe(exc))
+
+
+def import_expenses(
+    db: Session,
+    stream: TextIO,
+    fmt: str = "csv",
+    group_id: Optional[uuid.UUID] = None,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+) -> schemas.ImportReport:
+    """
+    Stream rows from `stream`, validate each against schemas.ExpenseCreate and write
+    valid rows in transactions of `chunk_size`. Invalid rows are reported, not fatal.
+    Memory use is bounded by the chunk size, not the file size.
+
+    If `group_id` is given, rows default to it and rows naming another group are rejected.
+    """
+    report = schemas.ImportReport()
+    importer = _Importer(db, report)
+    chunk: List[Tuple[int, schemas.ExpenseCreate]] = []
+
+    # Backdated chunks each invalidate balance checkpoints: retake them once, after the last chunk
+    with crud.deferred_checkpoint_retakes(db):
+        for row_number, raw in iter_rows(stream, fmt):
+            if isinstance(raw, Exception):
+                importer.fail(row_number, _describe(raw))
+                continue
+            if group_id is not None:
+                raw.setdefault("group_id", str(group_id))
+            try:
+                expense = schemas.ExpenseCreate.model_validate(raw)
+            except ValidationError as exc:
+                importer.fail(row_number, _describe(exc))
+                continue
+            if group_id is not None and expense.group_id != group_id:
+                importer.fail(row_number, f"group_id: row belongs to group {expense.group_id}, not {group_id}")
+                continue
+
+            chunk.append((row_number, expense))
+            if len(chunk) >= chunk_size:
+                importer.write(chunk)
+                chunk = []
+
+        if chunk:
+            importer.write(chunk)
+    return report
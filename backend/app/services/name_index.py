@@ -0,0 +1,188 @@
+import bisect
+import os
+import re
+import unicodedata
+import uuid
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from ..cache import TTLCache
+
+# Fuzzy matches need this similarity (0-1, edit distance over length) and this lead over the runner-up
+NAME_MATCH_MIN_SCORE = float(os.getenv("NAME_MATCH_MIN_SCORE", "0.75"))
+NAME_MATCH_MIN_MARGIN = float(os.getenv("NAME_MATCH_MIN_MARGIN", "0.1"))
+# Indexes are dropped when the group's membership changes (crud.add_user_to_group); the TTL
+# bounds how long another worker's copy can miss a new member
+NAME_INDEX_CACHE_SIZE = int(os.getenv("NAME_INDEX_CACHE_SIZE", "1024"))
+NAME_INDEX_CACHE_TTL = float(os.getenv("NAME_INDEX_CACHE_TTL", "300"))
+name_index_cache = TTLCache(maxsize=NAME_INDEX_CACHE_SIZE, ttl=NAME_INDEX_CACHE_TTL)
+
+SELF_WORDS = {"me", "i", "myself", "you", "self"}
+EVERYONE_WORDS = {"everyone", "everybody", "all", "all of us", "us", "the group", "whole group", "the whole group"}
+# Fuzzy candidates: the members whose trigrams overlap the query's most (Dice), before any edit distance
+_MIN_SHARED_TRIGRAMS = 2
+_MAX_CANDIDATES = 4
+
+
+def normalize(name: str) -> str:
+    """Casefolded, accents and punctuation stripped, possessive dropped: "Zoë-Ann's" -> "zoe ann"."""
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(ch for ch in name if not unicodedata.combining(ch)).casefold()
+    name = re.sub(r"['’]s\b", "", name)
+    return " ".join(re.sub(r"[^\w]+", " ", name).split())
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _similarity(a: str, b: str, min_score: float = 0.0) -> float:
+    """1 - Levenshtein distance / longer length; 0 as soon as it cannot reach `min_score`."""
+    if a == b:
+        return 1.0
+    longest = max(len(a), len(b))
+    limit = int((1 - min_score) * longest) # Most edits allowed
+    if not a or not b or abs(len(a) - len(b)) > limit:
+        return 0.0
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return 0.0
+        previous = current
+    return 1 - previous[-1] / longest
+
+
+class NameIndex:
+    """
+    Maps names as people write them ("bob", "Priya S", "Carol's", "Jonh") to group members' ids.
+
+    Lookups try, in order: the exact normalized full name; every query token as a prefix of
+    a distinct token of one member's name ("priya s" -> "Priya Sharma"); then an edit-distance
+    match among the members sharing the most trigrams with the query. Anything that matches
+    more than one member equally well is left unresolved rather than guessed.
+    """
+
+    def __init__(self, members: Iterable[Tuple[uuid.UUID, str]]):
+        self.members: List[Tuple[uuid.UUID, str]] = []
+        self._raw: Dict[str, List[uuid.UUID]] = {}
+        self._full: Dict[str, List[uuid.UUID]] = {}
+        self._tokens: Dict[str, Set[uuid.UUID]] = {}
+        self._names: Dict[uuid.UUID, Tuple[str, Tuple[str, ...]]] = {}
+        self._gram_counts: Dict[uuid.UUID, int] = {}
+        self._trigrams: Dict[str, List[uuid.UUID]] = {}
+        for user_id, name in members:
+            self.members.append((user_id, name))
+            self._raw.setdefault(name, []).append(user_id)
+            full = normalize(name or "")
+            tokens = tuple(full.split())
+            self._names[user_id] = (full, tokens)
+            self._full.setdefault(full, []).append(user_id)
+            for token in tokens:
+                self._tokens.setdefault(token, set()).add(user_id)
+            grams = _trigrams(full)
+            self._gram_counts[user_id] = len(grams)
+            for gram in grams:
+                self._trigrams.setdefault(gram, []).append(user_id)
+        self._sorted_tokens = sorted(self._tokens)
+
+    @property
+    def names(self) -> List[str]:
+        return [name for _, name in self.members]
+
+    def resolve(self, name: str) -> Optional[uuid.UUID]:
+        exact = self._raw.get(name) # Names echoed back verbatim (the rule parser's) skip normalizing
+        if exact:
+            return exact[0] if len(exact) == 1 else None
+        query = normalize(name)
+        if not query:
+            return None
+        exact = self._full.get(query)
+        if exact:
+            return exact[0] if len(exact) == 1 else None
+
+        by_tokens = self._match_tokens(query.split())
+        if by_tokens is not None:
+            return by_tokens if by_tokens else None
+        return self._match_fuzzy(query)
+
+    def _match_tokens(self, tokens: Sequence[str]) -> Union[uuid.UUID, bool, None]:
+        """The one member whose name has a token starting with each query token; False if several, None if none."""
+        candidates: Optional[Set[uuid.UUID]] = None
+        for token in tokens:
+            ids: Set[uuid.UUID] = set()
+            start = bisect.bisect_left(self._sorted_tokens, token)
+            for member_token in self._sorted_tokens[start:]:
+                if not member_token.startswith(token):
+                    break
+                ids |= self._tokens[member_token]
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return None
+        if len(candidates) == 1:
+            return next(iter(candidates))
+        # "alex" with an Alex and an Alexandra: the whole-token match wins. Not for initials:
+        # "mary o" is as likely Okafor as O'Brien, whose "o" happens to be a whole token
+        if all(len(token) > 1 for token in tokens):
+            whole = [uid for uid in candidates if set(tokens) <= set(self._names[uid][1])]
+            if len(whole) == 1:
+                return whole[0]
+        return False
+
+    def _match_fuzzy(self, query: str) -> Optional[uuid.UUID]:
+        grams = _trigrams(query)
+        shared: Dict[uuid.UUID, int] = {}
+        for gram in grams:
+            for user_id in self._trigrams.get(gram, ()):
+                shared[user_id] = shared.get(user_id, 0) + 1
+        dice = {uid: 2 * n / (len(grams) + self._gram_counts[uid])
+                for uid, n in shared.items() if n >= _MIN_SHARED_TRIGRAMS}
+        candidates = sorted(dice, key=dice.__getitem__, reverse=True)[:_MAX_CANDIDATES]
+        floor = NAME_MATCH_MIN_SCORE - NAME_MATCH_MIN_MARGIN # Below this a runner-up cannot matter
+        scored = []
+        for user_id in candidates:
+            full, tokens = self._names[user_id]
+            # A one-word query is compared with each part, so a misspelt first name still finds "Jonathan Smith"
+            parts = tokens if " " not in query else (full,)
+            scored.append((max((_similarity(query, part, floor) for part in parts), default=0.0), user_id))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        if not scored or scored[0][0] < NAME_MATCH_MIN_SCORE:
+            return None
+        if len(scored) > 1 and scored[0][0] - scored[1][0] < NAME_MATCH_MIN_MARGIN:
+            return None
+        return scored[0][1]
+
+
+def resolve_parsed(index: NameIndex, parsed: Dict, current_user_id: uuid.UUID, current_user_name: str):
+    """
+    (payer_id, involved_user_ids, unresolved names) for a ParsedExpense-shaped dict. "me"/"I"
+    is the current user; "everyone" is every member, less any `excluded_users`.
+    """
+    unresolved: List[str] = []
+    member_ids = [user_id for user_id, _ in index.members]
+    own_name = normalize(current_user_name or "")
+
+    def resolve(name: str) -> Optional[uuid.UUID]:
+        key = normalize(name)
+        # The current user's own name wins over a namesake in the group
+        if key in SELF_WORDS or (own_name and key == own_name):
+            return current_user_id
+        user_id = index.resolve(name)
+        if user_id is None:
+            unresolved.append(name)
+        return user_id
+
+    payer_id = resolve(parsed["payer_name"]) if parsed.get("payer_name") else None
+    involved: List[uuid.UUID] = []
+    for name in parsed.get("involved_users") or []:
+        if normalize(name) in EVERYONE_WORDS:
+            involved.extend(member_ids)
+        else:
+            user_id = resolve(name)
+            if user_id is not None:
+                involved.append(user_id)
+    excluded = {resolve(name) for name in parsed.get("excluded_users") or []}
+    involved = [user_id for user_id in dict.fromkeys(involved) if user_id not in excluded]
+    return payer_id, involved, unresolved
@@ -0,0 +1,192 @@
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Fast-path answers below this confidence are thrown away and the text goes to the model
+RULE_PARSER_MIN_CONFIDENCE = float(os.getenv("RULE_PARSER_MIN_CONFIDENCE", "0.8"))
+
+_CURRENCY = r"(?:rs\.?|inr|usd|eur|gbp|\$|₹|€|£)"
+_UNIT = r"(?:rs|rupees|bucks|dollars|euros|pounds|inr|usd|/-)"
+AMOUNT = re.compile(
+    rf"(?<![\w.])(?P<cur>{_CURRENCY}\s*)?(?P<num>\d{{1,3}}(?:,\d{{3}})+(?:\.\d+)?|\d+(?:\.\d+)?)(?P<k>k)?"
+    rf"(?:\s*(?P<unit>{_UNIT}))?(?![\w:/])",
+    re.IGNORECASE,
+)
+# Phrasings the rules do not model (uneven shares, exclusions): always the model's job
+UNSUPPORTED = re.compile(r"%|\bper ?cent\b|\b\d+\s*/\s*\d+\b|\bowes?\b|\bexcept\b|\bexcluding\b|\bunequal|\beach\b|\bratio\b", re.IGNORECASE)
+PAYER_VERB = r"(?:\s+(?:just|already|has|had|have))?\s+(?:paid|spent|covered|bought|got|picked up|put in|paid for)\b"
+FIRST_PERSON_PAYER = re.compile(rf"\b(?:i|i've){PAYER_VERB}|\b(?:paid|covered|bought|picked up) by (?:me|myself)\b", re.IGNORECASE)
+PAYER_AFTER = re.compile(PAYER_VERB, re.IGNORECASE)
+PAID_BY_BEFORE = re.compile(r"\b(?:paid|covered|bought|picked up) by\s+$", re.IGNORECASE)
+PRONOUN = re.compile(r"\b(?:i|me|myself)\b", re.IGNORECASE)
+EVERYONE = re.compile(r"\b(?:everyone|everybody|all of us|the whole group|the group|whole group|all)\b", re.IGNORECASE)
+EXACT_LIST = re.compile(r"\b(?:between|among|amongst)\b", re.IGNORECASE)
+WITH_LIST = re.compile(r"\b(?:split|splitting|shared?|sharing|with)\b", re.IGNORECASE)
+FOR_PEOPLE = re.compile(r"\bfor\b", re.IGNORECASE)
+# A participant list: "with Bob, Carol and me" up to the next clause
+PARTICIPANTS = re.compile(r"\b(?:with|between|among|amongst)\s+(?P<list>[^.;]*?)(?=\s+\b(?:for|on|at|to|yesterday|today|tonight|last)\b|[.;]|$)", re.IGNORECASE)
+LIST_FILLER = {"and", "&", "the", "both", "equally", "evenly", "too", "also", "of", "us", "all", "everyone", "everybody", "whole", "group", "split", "it"}
+DESCRIPTION = re.compile(
+    r"\b(?:for|on)\s+(?:the\s+|a\s+|an\s+|our\s+|some\s+|my\s+)?(?P<desc>[^\W\d][\w'&-]*(?:\s+[^\W\d][\w'&-]*){0,4}?)"
+    r"(?=\s*(?:[,.;!]|$|\b(?:split|splitting|shared?|with|between|among|amongst|paid|by|and|yesterday|today|tonight|last|at)\b))",
+    re.IGNORECASE,
+)
+STOPWORDS = {
+    "i", "me", "my", "myself", "we", "us", "our", "paid", "spent", "covered", "bought", "got", "picked", "up", "put", "in",
+    "by", "for", "on", "at", "to", "the", "a", "an", "and", "with", "split", "splitting", "shared", "share", "sharing",
+    "between", "among", "amongst", "everyone", "everybody", "all", "of", "whole", "group", "equally", "evenly", "just",
+    "already", "has", "had", "have", "it", "is", "was", "some", "yesterday", "today", "tonight", "last", "night", "rs",
+    "rupees", "bucks", "dollars", "euros", "pounds", "inr", "usd", "eur", "gbp",
+}
+
+
+@lru_cache(maxsize=1024)
+def _roster_index(member_names: Tuple[str, ...]):
+    """
+    Regex matching any member by full name, or by first name where that is unambiguous,
+    longest alternatives first, plus {lowercased alias: member name}.
+    """
+    aliases: Dict[str, str] = {}
+    first_names: Dict[str, List[str]] = {}
+    for name in member_names:
+        if not name or not name.strip():
+            continue
+        aliases[name.casefold()] = name
+        first_names.setdefault(name.split()[0].casefold(), []).append(name)
+    for first, names in first_names.items():
+        if len(names) == 1:
+            aliases.setdefault(first, names[0])
+    if not aliases:
+        return None, aliases
+    alternation = "|".join(re.escape(alias) for alias in sorted(aliases, key=len, reverse=True))
+    return re.compile(rf"(?<!\w)(?:{alternation})(?:'s)?(?!\w)", re.IGNORECASE), aliases
+
+
+def _overlaps(span: Tuple[int, int], spans: Sequence[Tuple[int, int]]) -> bool:
+    return any(span[0] < end and start < span[1] for start, end in spans)
+
+
+class RuleParser:
+    """
+    Deterministic parser for formulaic expense texts ("I paid 1200 for dinner split with Bob
+    and Carol"): amount, payer, participants and an equal split, in microseconds.
+
+    Every answer carries a confidence in [0, 1]; missing pieces that have to be guessed
+    (no payer named, nobody listed) lower it, and anything the rules cannot model
+    (several amounts, percentages, unknown names) drops it to the point of deferring.
+    """
+
+    def __init__(self, min_confidence: float = RULE_PARSER_MIN_CONFIDENCE):
+        self.min_confidence = min_confidence
+
+    def parse(self, text: str, member_names: Sequence[str], current_user_name: str) -> Tuple[Optional[Dict], float]:
+        """Returns (ParsedExpense-shaped dict, confidence), or (None, confidence) when deferring."""
+        parsed, confidence = self._parse(text, tuple(member_names), current_user_name)
+        if parsed is None or confidence < self.min_confidence:
+            return None, confidence
+        return parsed, confidence
+
+    def _parse(self, text: str, member_names: Tuple[str, ...], current_user_name: str) -> Tuple[Optional[Dict], float]:
+        if UNSUPPORTED.search(text) or not current_user_name or not current_user_name.strip():
+            return None, 0.0
+        confidence = 1.0
+        # A member without a name cannot be written as one: "everyone" is left to the model
+        unnamed = any(not name or not name.strip() for name in member_names)
+        pattern, aliases = _roster_index(member_names)
+        mentions = [(m.span(), aliases[m.group().casefold().removesuffix("'s")]) for m in pattern.finditer(text)] if pattern else []
+
+        # Amount: exactly one number, or exactly one marked as money
+        amounts = list(AMOUNT.finditer(text))
+        marked = [m for m in amounts if m.group("cur") or m.group("unit")]
+        if len(amounts) == 1:
+            amount_match = amounts[0]
+        elif len(marked) == 1:
+            amount_match = marked[0]
+            confidence -= 0.1
+        else:
+            return None, 0.0
+        amount = float(amount_match.group("num").replace(",", "")) * (1000 if amount_match.group("k") else 1)
+        if amount <= 0:
+            return None, 0.0
+        mentions = [(span, name) for span, name in mentions if not _overlaps(span, [amount_match.span()])]
+
+        # Payer: "I paid", "paid by me", "Bob paid", "paid by Bob"
+        payers, payer_spans = set(), []
+        for m in FIRST_PERSON_PAYER.finditer(text):
+            payers.add(current_user_name)
+            payer_spans.append(m.span())
+        for (start, end), name in mentions:
+            if PAYER_AFTER.match(text, end) or PAID_BY_BEFORE.search(text, 0, start):
+                payers.add(name)
+                payer_spans.append((start, end))
+        if len(payers) > 1:
+            return None, 0.0
+        if payers:
+            payer = payers.pop()
+        else:
+            payer = current_user_name # "dinner 1200 split with Bob": the person typing paid
+            confidence -= 0.1
+
+        # Participants
+        listed = {name for span, name in mentions if not _overlaps(span, payer_spans)}
+        if any(not _overlaps(m.span(), payer_spans) for m in PRONOUN.finditer(text)):
+            listed.add(current_user_name)
+        for m in PARTICIPANTS.finditer(text):
+            # Every word in "with ..." must be a member, a pronoun or filler; otherwise it names someone we don't know
+            names = pattern.sub(" ", m.group("list")) if pattern else m.group("list")
+            leftovers = [w for w in re.findall(r"[\w']+|&", PRONOUN.sub(" ", names)) if w.casefold() not in LIST_FILLER]
+            if leftovers:
+                return None, 0.3
+        if EVERYONE.search(text):
+            involved = [] if unnamed else list(member_names)
+        elif EXACT_LIST.search(text) and listed:
+            involved = [name for name in member_names if name in listed]
+        elif WITH_LIST.search(text) and listed:
+            involved = [name for name in member_names if name in listed or name == payer]
+        elif FOR_PEOPLE.search(text) and listed:
+            involved = [name for name in member_names if name in listed] # "I paid 30 for Bob": Bob owes it all
+        else:
+            involved = [] if unnamed else list(member_names) # Nobody named: the whole group, but that is a guess
+            confidence -= 0.15
+        if not involved or payer not in member_names:
+            return None, 0.0
+
+        # Description: "for dinner", "on groceries", else whatever words are left
+        taken = [amount_match.span()] + [span for span, _ in mentions]
+        description = None
+        for m in DESCRIPTION.finditer(text):
+            words = m.group("desc").split()
+            if not _overlaps(m.span("desc"), taken) and words[0].casefold() not in STOPWORDS:
+                description = m.group("desc")
+                break
+        if description is None:
+            # The first phrase between the amount, names and punctuation, minus filler at either end
+            for chunk in re.split(r"[\0,.;!?]+", _blank(text, taken)):
+                words = re.findall(r"[^\W\d][\w'&-]*", chunk)
+                while words and words[0].casefold() in STOPWORDS:
+                    words.pop(0)
+                while words and words[-1].casefold() in STOPWORDS:
+                    words.pop()
+                if words:
+                    description = " ".join(words[:5])
+                    confidence -= 0.05
+                    break
+            else:
+                description = "Expense"
+                confidence -= 0.25
+
+        return {
+            "amount": amount,
+            "description": description[:1].upper() + description[1:],
+            "payer_name": payer,
+            "involved_users": involved,
+            "split_type": "EQUAL",
+        }, round(confidence, 2)
+
+
+def _blank(text: str, spans: Sequence[Tuple[int, int]]) -> str:
+    chars = list(text)
+    for start, end in spans:
+        chars[start:end] = "\0" * (end - start)
+    return "".join(chars)
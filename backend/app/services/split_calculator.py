@@ -0,0 +1,71 @@
+from decimal import Decimal
+from typing import Hashable, List, Optional, Sequence, Tuple
+
+from .balance_engine import to_cents, from_cents
+
+# A member's input: (user_id, amount_owed, percent). Which value is read depends on the split type.
+SplitInput = Tuple[Hashable, Optional[Decimal], Optional[Decimal]]
+
+
+class SplitCalculator:
+    """
+    Derive each member's share of an expense in integer cents, so shares always add up to
+    the amount exactly. Cents that cannot be divided evenly go to the members with the
+    largest remainders, ties broken by user id: the same input always gives the same
+    split, whatever order the members were sent in. O(n log n) in the number of members.
+    """
+
+    @staticmethod
+    def compute(amount: Decimal, split_type: str, splits: Sequence[SplitInput]) -> List[Tuple[Hashable, Decimal]]:
+        """
+        EQUAL ignores any amounts sent; PERCENT reads `percent` (must total 100); EXACT takes
+        `amount_owed` as given and checks it totals the amount to the cent.
+        Returns [(user_id, amount_owed)] in input order. Raises ValueError on bad input.
+        """
+        if not splits:
+            raise ValueError("Expense must have at least one split")
+        total = to_cents(amount)
+        user_ids = [user_id for user_id, _, _ in splits]
+
+        if split_type == "EQUAL":
+            cents = _distribute(total, [1] * len(splits), user_ids)
+        elif split_type == "PERCENT":
+            percents = [percent for _, _, percent in splits]
+            if any(percent is None for percent in percents):
+                raise ValueError("PERCENT splits need a percent for every member")
+            if any(percent < 0 for percent in percents):
+                raise ValueError("Percentages cannot be negative")
+            if sum(percents, Decimal(0)) != 100:
+                raise ValueError(f"Percentages add up to {sum(percents, Decimal(0))}, expected 100")
+            cents = _distribute(total, _integer_weights(percents), user_ids)
+        elif split_type == "EXACT":
+            if any(owed is None for _, owed, _ in splits):
+                raise ValueError("EXACT splits need an amount_owed for every member")
+            cents = [to_cents(owed) for _, owed, _ in splits]
+            if sum(cents) != total:
+                raise ValueError(f"Splits add up to {from_cents(sum(cents))}, expected {from_cents(total)}")
+        else:
+            raise ValueError(f"Unknown split type {split_type!r}")
+        return [(user_id, from_cents(share)) for user_id, share in zip(user_ids, cents)]
+
+
+def _integer_weights(values: Sequence[Decimal]) -> List[int]:
+    """Scale decimals by a common power of ten so they become exact integers (33.3 -> 333)."""
+    places = max(max(0, -value.normalize().as_tuple().exponent) for value in values)
+    return [int(value.scaleb(places)) for value in values]
+
+
+def _distribute(total: int, weights: Sequence[int], keys: Sequence[Hashable]) -> List[int]:
+    """Largest remainder method: floor(total * w / W) each, then one more cent to the biggest remainders."""
+    weight = sum(weights)
+    if weight == 0:
+        raise ValueError("Cannot split an amount across zero shares")
+    shares, remainders = [], []
+    for w in weights:
+        share, remainder = divmod(total * w, weight)
+        shares.append(share)
+        remainders.append(remainder)
+    leftover = total - sum(shares) # 0 <= leftover < len(weights)
+    for i in sorted(range(len(shares)), key=lambda i: (-remainders[i], str(keys[i])))[:leftover]:
+        shares[i] += 1
+    return shares
@@ -17,6 +17,8 @@ export default function GroupDetailsPage() {
     const groupId = params.id as string;
     const [group, setGroup] = useState<Group | null>(null);
     const [expenses, setExpenses] = useState<Expense[]>([]);
+    // Cursor of the next page of expenses, null once the whole history is loaded
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
     const [balances, setBalances] = useState<BalanceResponse | null>(null);
 
     // Maps user ID to Name
@@ -42,6 +44,7 @@ export default function GroupDetailsPage() {
 
             const eResp = await api.get(`/expenses/group/${groupId}`);
             setExpenses(eResp.data);
+            setNextCursor(eResp.headers["x-next-cursor"] ?? null);
 
             const bResp = await api.get(`/expenses/group/${groupId}/balances`);
             setBalances(bResp.data);
@@ -50,6 +53,17 @@ export default function GroupDetailsPage() {
         }
     };
 
+    const loadMoreExpenses = async () => {
+        if (!nextCursor) return;
+        try {
+            const eResp = await api.get(`/expenses/group/${groupId}`, { params: { cursor: nextCursor } });
+            setExpenses((prev) => [...prev, ...eResp.data]);
+            setNextCursor(eResp.headers["x-next-cursor"] ?? null);
+        } catch (err) {
+            console.error(err);
+        }
+    };
+
     // Old addMember function removed
 
 
@@ -159,6 +173,11 @@ export default function GroupDetailsPage() {
                             ))}
                         </TableBody>
                     </Table>
+                    {nextCursor && (
+                        <div className="flex justify-center mt-4">
+                            <Button variant="outline" onClick={loadMoreExpenses}>Load more</Button>
+                        </div>
+                    )}
                 </CardContent>
             </Card>
         </div>
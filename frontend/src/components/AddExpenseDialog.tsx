@@ -23,6 +23,7 @@ export default function AddExpenseDialog({ group, onExpenseAdded, userMap }: Add
     // Ideally get current user ID to set default. 
     // For MVP, user selects.
 
+    const [involvedIds, setInvolvedIds] = useState<string[] | null>(null); // From MintSense; null = everyone
     const [magicText, setMagicText] = useState("");
     const [loadingAI, setLoadingAI] = useState(false);
 
@@ -42,15 +43,9 @@ export default function AddExpenseDialog({ group, onExpenseAdded, userMap }: Add
             setAmount(data.amount.toString());
             setDescription(data.description);
 
-            // Find payer ID by name match
-            const payerEntry = Object.entries(userMap).find(([id, name]) =>
-                name.toLowerCase() === data.payer_name.toLowerCase()
-            );
-            if (payerEntry) setPayerId(payerEntry[0]);
-            else {
-                // Try fuzzy or just prompt?
-                // For now, if no match, leave existing or empty
-            }
+            // Names come back already matched to member ids; anything unmatched is left for the user to pick
+            if (data.payer_id) setPayerId(data.payer_id);
+            setInvolvedIds(data.involved_user_ids?.length ? data.involved_user_ids : null);
 
         } catch (err) {
             console.error("AI Parse failed", err);
@@ -64,12 +59,10 @@ export default function AddExpenseDialog({ group, onExpenseAdded, userMap }: Add
         e.preventDefault();
         if (!amount || !description || !payerId) return;
 
-        // Default to EQUAL split amongst ALL members for MVP Manual Entry
-        // (Or involved users if we had that state)
-        const splitAmount = parseFloat(amount) / group.members.length;
-        const splits = group.members.map(m => ({
-            user_id: m.user.id,
-            amount_owed: splitAmount
+        // EQUAL split amongst the people MintSense found, else ALL members.
+        // The server computes each share in exact cents.
+        const splits = (involvedIds ?? group.members.map(m => m.user.id)).map(user_id => ({
+            user_id
         }));
 
         try {
@@ -85,6 +78,7 @@ export default function AddExpenseDialog({ group, onExpenseAdded, userMap }: Add
             setAmount("");
             setDescription("");
             setMagicText("");
+            setInvolvedIds(null);
             onExpenseAdded();
         } catch (err) {
             console.error(err);
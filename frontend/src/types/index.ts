@@ -40,4 +40,5 @@ export interface BalanceResponse {
         to: string;
         amount: number;
     }[];
+    mode: "greedy" | "optimal";
 }
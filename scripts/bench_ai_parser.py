@@ -0,0 +1,124 @@
+"""
+Benchmark AI expense parsing offline: throughput, latency and event-loop lag under load.
+
+Runs POST /api/parse-expense through the ASGI app against the fake model backend
+(AI_MODEL_BACKEND=fake, --latency-ms per call) in a temporary SQLite database.
+--requests requests are fired --concurrency at a time in four scenarios:
+
+- blocking:   a backend that sleeps synchronously, like the old generate_content call
+- unique:     every text distinct; bounded by AI_MAX_CONCURRENCY model calls at once
+- duplicates: --requests spread over 5 texts; concurrent repeats share one call
+- cached:     the same texts again; answered from the result cache
+
+"loop lag" is the worst delay seen by a 10ms timer running alongside: how long
+other requests would have been stuck behind the parser.
+
+    python scripts/bench_ai_parser.py
+    python scripts/bench_ai_parser.py --requests 400 --concurrency 100 --latency-ms 500
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ["AI_MODEL_BACKEND"] = "fake"
+os.environ["AI_FAST_PATH"] = "0" # Every text here would otherwise be answered by the rules; this measures the model path
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_ai_parser.db"
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import ai_parser
+
+
+class BlockingFakeBackend(ai_parser.FakeBackend):
+    async def generate(self, text):
+        self.calls += 1
+        time.sleep(self.latency) # Holds the event loop, as a synchronous client call inside async def does
+        return self.answer(text)
+
+
+def setup():
+    client = TestClient(app)
+    client.post("/auth/register", json={"email": "ai@splitmint.com", "password": "password123", "name": "Aisha"})
+    token = client.post("/auth/token", data={"username": "ai@splitmint.com", "password": "password123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    group = client.post("/groups/", json={"name": "ai"}, headers=headers).json()
+    for name in ("Ben", "Chen", "Dara"):
+        client.post(f"/groups/{group['id']}/members", json={"name": name}, headers=headers)
+    return headers, group["id"]
+
+
+async def scenario(headers, group_id, texts, concurrency):
+    latencies, lag = [], [0.0]
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lag[0] = max(lag[0], time.perf_counter() - started - 0.01)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        gate = asyncio.Semaphore(concurrency)
+
+        async def one(text):
+            async with gate:
+                started = time.perf_counter()
+                response = await client.post("/api/parse-expense", json={"text": text, "group_id": group_id},
+                                             headers=headers, timeout=None)
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200, response.text
+
+        tick = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        await asyncio.gather(*(one(text) for text in texts))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await tick
+    return elapsed, latencies, lag[0]
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark AI expense parsing against the fake model backend")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    args = parser.parse_args()
+
+    headers, group_id = setup()
+    latency = args.latency_ms / 1000
+    unique = [f"dinner {i} paid by me for everyone" for i in range(args.requests)]
+    repeated = [f"taxi {i % 5} split with everyone" for i in range(args.requests)]
+    blocking = unique[:max(1, min(args.requests, int(2 / latency)))] # A couple of seconds' worth is plenty
+    scenarios = [
+        ("blocking", BlockingFakeBackend(latency, jitter=0), [f"blocking {t}" for t in blocking]),
+        ("unique", ai_parser.FakeBackend(latency), unique),
+        ("duplicates", ai_parser.FakeBackend(latency), repeated),
+        ("cached", None, repeated),
+    ]
+
+    print(f"fake model latency {args.latency_ms:g}ms, concurrency {args.concurrency}, "
+          f"AI_MAX_CONCURRENCY={ai_parser.AI_MAX_CONCURRENCY}")
+    print(f"{'scenario':>10} {'requests':>9} {'calls':>6} {'req/s':>8} {'p50':>8} {'p95':>8} {'loop lag':>9}")
+    parse = ai_parser.get_parser()
+    for name, backend, texts in scenarios:
+        if backend is not None:
+            parse.backend = backend
+        calls = parse.calls
+        elapsed, latencies, lag = asyncio.run(scenario(headers, group_id, texts, args.concurrency))
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+        print(f"{name:>10} {len(texts):>9} {parse.calls - calls:>6} {len(texts) / elapsed:>8.1f} "
+              f"{statistics.median(latencies) * 1000:>6.0f}ms {p95 * 1000:>6.0f}ms {lag * 1000:>7.0f}ms")
+    print(parse.stats())
+
+
+if __name__ == "__main__":
+    run()
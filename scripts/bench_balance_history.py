@@ -0,0 +1,104 @@
+"""
+Benchmark point-in-time balances and balance series with and without checkpoints.
+
+Seeds one group per size (as bench_balances.py does, one expense a minute), takes its
+balance checkpoints with crud.rebuild_balance_checkpoints, then times:
+
+- at:     balances as of --points random moments (get_group_balances_at)
+- series: daily balances over the last --days days of the history
+
+once starting from the nearest checkpoint and once with the checkpoints deleted (an
+uncommitted delete, rolled back afterwards), which replays everything from the first
+expense. Both must agree to the cent. "replayed" is the median number of expenses
+added on top of the starting point; with checkpoints it stays under
+BALANCE_CHECKPOINT_INTERVAL however long the history is.
+
+    python scripts/bench_balance_history.py
+    python scripts/bench_balance_history.py --sizes 10000 100000 --points 50
+    BALANCE_CHECKPOINT_INTERVAL=100 python scripts/bench_balance_history.py
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_balance_history.db"
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from sqlalchemy import func, select
+
+from bench_balances import seed_group
+from app import crud, models
+from app.database import SessionLocal, engine
+
+
+def measure(db, group_id, moments, edges):
+    """Median ms per point-in-time query, median expenses replayed, the series in ms, and every result."""
+    samples, replayed, results = [], [], []
+    for at in moments:
+        started = time.perf_counter()
+        balances, _, n = crud.get_group_balances_at(db, group_id, at)
+        samples.append(time.perf_counter() - started)
+        replayed.append(n)
+        results.append(balances)
+    started = time.perf_counter()
+    series = crud.get_group_balance_series(db, group_id, edges)
+    series_s = time.perf_counter() - started
+    return statistics.median(samples) * 1000, statistics.median(replayed), series_s * 1000, results + series
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Time historical balances with and without checkpoints")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--members", type=int, default=8)
+    parser.add_argument("--points", type=int, default=20, help="point-in-time queries per size")
+    parser.add_argument("--days", type=int, default=7, help="length of the daily series")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    print(f"database: {engine.url.render_as_string(hide_password=True)}, "
+          f"checkpoint every {crud.BALANCE_CHECKPOINT_INTERVAL} expenses")
+    print(f"{'expenses':>9} {'backfill':>9} {'at: full':>9} {'checkpoint':>11} {'replayed':>15} "
+          f"{'series: full':>13} {'checkpoint':>11}")
+
+    for size in args.sizes:
+        db = SessionLocal()
+        try:
+            group_id = seed_group(db, size, args.members)
+            started = time.perf_counter()
+            crud.rebuild_balance_checkpoints(db, group_id)
+            db.commit()
+            backfill_s = time.perf_counter() - started
+
+            first, last = db.execute(
+                select(func.min(models.Expense.date), func.max(models.Expense.date))
+                .where(models.Expense.group_id == group_id)
+            ).one()
+            rng = random.Random(args.seed)
+            moments = [first + (last - first) * rng.random() for _ in range(args.points)]
+            end = last.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+            edges = [end - timedelta(days=d) for d in range(args.days, -1, -1)]
+
+            at_ms, at_replayed, series_ms, with_checkpoints = measure(db, group_id, moments, edges)
+            db.rollback()
+            db.query(models.BalanceCheckpoint).filter(models.BalanceCheckpoint.group_id == group_id).delete()
+            full_ms, full_replayed, full_series_ms, from_scratch = measure(db, group_id, moments, edges)
+            db.rollback()
+        finally:
+            db.close()
+
+        if any(crud._balance_drift(a, b) for a, b in zip(with_checkpoints, from_scratch)):
+            print(f"  WARNING: checkpointed balances disagree with a full replay at {size} expenses")
+        print(f"{size:>9} {backfill_s * 1000:>7.0f}ms {full_ms:>7.2f}ms {at_ms:>9.2f}ms "
+              f"{full_replayed:>7.0f} -> {at_replayed:>5.0f} {full_series_ms:>11.1f}ms {series_ms:>9.1f}ms")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,121 @@
+"""
+Benchmark group balance computation: ORM replay loop vs SQL aggregation vs NumPy vs ledger read.
+
+Seeds one group per size into a scratch database and times each strategy. The NumPy
+backend must match the Decimal replay loop exactly, to the cent, for every member.
+Uses a temporary SQLite file unless DATABASE_URL is set (e.g. to a Postgres
+database you can throw away):
+
+    python scripts/bench_balances.py
+    python scripts/bench_balances.py --sizes 1000 10000 100000 --members 8 --repeat 5
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_balances.db"
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from sqlalchemy import insert
+
+from app import crud, models
+from app.database import SessionLocal, engine
+
+
+def seed_group(db, n_expenses, n_members, batch=5000):
+    user_ids = [uuid.uuid4() for _ in range(n_members)]
+    group_id = uuid.uuid4()
+    db.execute(insert(models.User), [
+        {"id": u, "email": f"bench_{u}@splitmint.com", "password_hash": "!", "name": f"user{i}"}
+        for i, u in enumerate(user_ids)
+    ])
+    db.execute(insert(models.Group), [{"id": group_id, "name": f"bench {n_expenses}", "created_by_user_id": user_ids[0]}])
+    db.execute(insert(models.GroupMember), [{"group_id": group_id, "user_id": u} for u in user_ids])
+
+    rng = random.Random(n_expenses)
+    start = datetime(2024, 1, 1)
+    deltas = {}
+    expenses, splits = [], []
+    for i in range(n_expenses):
+        expense_id = uuid.uuid4()
+        payer = rng.choice(user_ids)
+        share = Decimal(rng.randint(100, 50000)) / 100
+        amount = share * n_members
+        expenses.append({
+            "id": expense_id, "group_id": group_id, "payer_id": payer, "amount": amount,
+            "description": f"expense {i}", "split_type": "EQUAL", "date": start + timedelta(minutes=i),
+        })
+        splits.extend({"expense_id": expense_id, "user_id": u, "amount_owed": share} for u in user_ids)
+        for user_id, delta in crud.expense_balance_deltas(payer, amount, [(u, share) for u in user_ids]).items():
+            deltas[user_id] = deltas.get(user_id, Decimal(0)) + delta
+        if len(expenses) >= batch:
+            db.execute(insert(models.Expense), expenses)
+            db.execute(insert(models.ExpenseSplit), splits)
+            expenses, splits = [], []
+    if expenses:
+        db.execute(insert(models.Expense), expenses)
+        db.execute(insert(models.ExpenseSplit), splits)
+    crud.apply_balance_deltas(db, group_id, deltas)
+    db.commit()
+    return group_id
+
+
+def time_it(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        # Fresh session each run so the ORM identity map can't serve a warm copy
+        db = SessionLocal()
+        try:
+            t0 = time.perf_counter()
+            result = fn(db)
+            elapsed = time.perf_counter() - t0
+        finally:
+            db.close()
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--members", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    print(f"database: {engine.url.render_as_string(hide_password=True)}")
+    print(f"{'expenses':>9} {'replay loop':>13} {'sql aggregate':>14} {'numpy':>10} {'ledger read':>12} {'np/loop':>8}")
+
+    for size in args.sizes:
+        db = SessionLocal()
+        try:
+            group_id = seed_group(db, size, args.members)
+        finally:
+            db.close()
+
+        loop_s, loop_result = time_it(lambda db: crud.replay_group_balances(db, group_id), args.repeat)
+        sql_s, sql_result = time_it(lambda db: crud.compute_group_balances(db, group_id), args.repeat)
+        numpy_s, numpy_result = time_it(lambda db: crud.compute_group_balances_numpy(db, group_id), args.repeat)
+        ledger_s, ledger_result = time_it(lambda db: crud.get_group_balances(db, group_id), args.repeat)
+
+        for name, result in (("sql aggregate", sql_result), ("ledger read", ledger_result)):
+            if crud._balance_drift(result, loop_result):
+                print(f"  WARNING: {name} disagrees with the replay loop at {size} expenses")
+        if numpy_result != loop_result:
+            print(f"  WARNING: numpy is not identical to the replay loop at {size} expenses")
+
+        print(f"{size:>9} {loop_s * 1000:>11.1f}ms {sql_s * 1000:>12.1f}ms {numpy_s * 1000:>8.1f}ms "
+              f"{ledger_s * 1000:>10.2f}ms {loop_s / numpy_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    run()
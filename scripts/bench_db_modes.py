@@ -0,0 +1,134 @@
+"""
+Load-test the API in DB_MODE=sync and DB_MODE=async: requests/sec and latency percentiles.
+
+Each mode runs in its own subprocess (the mode is fixed at import time) against a
+fresh scratch SQLite database, or DATABASE_URL if set. Concurrent clients drive the
+app in-process through httpx's ASGI transport, so the numbers measure the app and
+its event loop, not the network:
+
+    python scripts/bench_db_modes.py
+    python scripts/bench_db_modes.py --clients 50 --requests 4000 --modes async
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def drive(n_clients, n_requests, n_expenses):
+    import httpx
+    from decimal import Decimal
+
+    from app import crud, models, schemas
+    from app.database import SessionLocal, dispose_engines, engine
+    from app.main import app
+
+    models.Base.metadata.create_all(bind=engine)
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await client.post("/auth/register", json={"email": "bench@splitmint.com", "password": "password123", "name": "Bench"})
+            token = (await client.post("/auth/token", data={"username": "bench@splitmint.com", "password": "password123"})).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            group_id = (await client.post("/groups/", json={"name": "bench"}, headers=headers)).json()["id"]
+            group_uuid = uuid.UUID(group_id)
+
+            db = SessionLocal()
+            try:
+                user = crud.get_user_by_email(db, "bench@splitmint.com")
+                others = [crud.create_ghost_user(db, name=f"member {i}") for i in range(5)]
+                for other in others:
+                    crud.add_user_to_group(db, group_id=group_uuid, user_id=other.id)
+                member_ids = [user.id] + [o.id for o in others]
+                expenses = [
+                    schemas.ExpenseCreate(
+                        amount=Decimal(len(member_ids)), description=f"expense {i}", split_type="EXACT",
+                        group_id=group_uuid, payer_id=member_ids[i % len(member_ids)],
+                        splits=[{"user_id": m, "amount_owed": Decimal(1)} for m in member_ids],
+                    )
+                    for i in range(n_expenses)
+                ]
+                crud.create_expenses(db, expenses)
+            finally:
+                db.close()
+
+            paths = ["/groups/", f"/groups/{group_id}", f"/expenses/group/{group_id}/balances", f"/expenses/group/{group_id}"]
+            latencies = {path: [] for path in paths}
+            counter = iter(range(n_requests))
+
+            async def virtual_client():
+                for i in counter:
+                    path = paths[i % len(paths)]
+                    started = time.perf_counter()
+                    response = await client.get(path, headers=headers)
+                    latencies[path].append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        raise RuntimeError(f"{path}: {response.status_code} {response.text}")
+
+            started = time.perf_counter()
+            await asyncio.gather(*(virtual_client() for _ in range(n_clients)))
+            elapsed = time.perf_counter() - started
+
+    finally:
+        # The ASGI transport never runs the app's lifespan, which would otherwise close the
+        # async engine's connections; their threads would keep the process from exiting
+        await dispose_engines()
+
+    everything = sorted(v for values in latencies.values() for v in values)
+    return {
+        "requests": len(everything),
+        "rps": len(everything) / elapsed,
+        "p50_ms": percentile(everything, 50) * 1000,
+        "p99_ms": percentile(everything, 99) * 1000,
+    }
+
+
+def run_child(args):
+    sys.path.insert(0, BACKEND)
+    result = asyncio.run(drive(args.clients, args.requests, args.expenses))
+    print(json.dumps(result))
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Compare DB_MODE=sync and DB_MODE=async under concurrent load")
+    parser.add_argument("--modes", nargs="+", choices=["sync", "async"], default=["sync", "async"])
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--expenses", type=int, default=200, help="Expenses in the benchmark group")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args)
+
+    print(f"{args.clients} clients, {args.requests} requests, {args.expenses} expenses in the group")
+    print(f"{'mode':<6} {'req/s':>8} {'p50':>9} {'p99':>9}")
+    for mode in args.modes:
+        env = dict(os.environ, DB_MODE=mode)
+        if "DATABASE_URL" not in os.environ:
+            env["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_{mode}.db"
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", "--clients", str(args.clients),
+             "--requests", str(args.requests), "--expenses", str(args.expenses)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:<6} {result['rps']:>8.0f} {result['p50_ms']:>7.1f}ms {result['p99_ms']:>7.1f}ms")
+
+
+if __name__ == "__main__":
+    run()
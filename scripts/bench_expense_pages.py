@@ -0,0 +1,128 @@
+"""
+Benchmark expense listing latency by depth: keyset cursor vs the OFFSET equivalent.
+
+Seeds one group with --expenses rows into a temporary SQLite database (or
+DATABASE_URL if set), then fetches a page at increasing depths with a cursor and
+with the equivalent OFFSET query (both through the ORM), plus the cursor page
+through the API. Keyset pages should cost the same at any depth; OFFSET pages grow:
+
+    python scripts/bench_expense_pages.py
+    python scripts/bench_expense_pages.py --expenses 200000 --limit 100
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_pages.db"
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select
+from sqlalchemy.orm import selectinload
+
+from app import crud, models
+from app.database import SessionLocal
+from app.main import app
+from app.routers.expenses import encode_expense_cursor
+
+
+def seed(client, n_expenses, n_members=4):
+    client.post("/auth/register", json={"email": "pages@splitmint.com", "password": "password123", "name": "Pages"})
+    token = client.post("/auth/token", data={"username": "pages@splitmint.com", "password": "password123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    group = client.post("/groups/", json={"name": "pages"}, headers=headers).json()
+    group_id = uuid.UUID(group["id"])
+    member_ids = [uuid.UUID(group["created_by_user_id"])] + [uuid.uuid4() for _ in range(n_members - 1)]
+
+    rng = random.Random(n_expenses)
+    start = datetime(2020, 1, 1)
+    db = SessionLocal()
+    try:
+        db.execute(insert(models.User), [
+            {"id": u, "email": f"pages_{u}@splitmint.com", "password_hash": "!", "name": "member"} for u in member_ids[1:]
+        ])
+        db.execute(insert(models.GroupMember), [{"group_id": group_id, "user_id": u} for u in member_ids[1:]])
+        for offset in range(0, n_expenses, 10000):
+            rows = [
+                {"id": uuid.uuid4(), "group_id": group_id, "payer_id": rng.choice(member_ids), "amount": n_members,
+                 "description": f"expense {i}", "split_type": "EXACT",
+                 "date": start + timedelta(minutes=rng.randint(0, 5 * 365 * 24 * 60))}
+                for i in range(offset, min(offset + 10000, n_expenses))
+            ]
+            db.execute(insert(models.Expense), rows)
+            db.execute(insert(models.ExpenseSplit), [
+                {"expense_id": row["id"], "user_id": u, "amount_owed": 1} for row in rows for u in member_ids
+            ])
+        db.commit()
+    finally:
+        db.close()
+    return headers, group_id
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Compare keyset and OFFSET page latency by depth")
+    parser.add_argument("--expenses", type=int, default=50000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    headers, group_id = seed(client, args.expenses)
+    order = (models.Expense.date.desc(), models.Expense.id.desc())
+
+    print(f"{args.expenses} expenses in the group, {args.limit} per page, median of {args.repeat}")
+    print(f"{'depth':>9} {'keyset':>9} {'OFFSET':>9} {'keyset via API':>15}")
+    db = SessionLocal()
+    try:
+        for fraction in (0, 0.1, 0.5, 0.9, 0.99):
+            depth = int(args.expenses * fraction)
+            params = {"limit": args.limit}
+            after = None
+            if depth:
+                # The cursor a client would hold after scrolling `depth` rows
+                row = db.execute(
+                    select(models.Expense.date, models.Expense.id)
+                    .where(models.Expense.group_id == group_id).order_by(*order).offset(depth - 1).limit(1)
+                ).one()
+                after = (row.date, row.id)
+                params["cursor"] = encode_expense_cursor(after)
+
+            def keyset():
+                crud.get_group_expenses(db, group_id, args.limit, after=after)
+                db.expunge_all()
+
+            def api():
+                response = client.get(f"/expenses/group/{group_id}", params=params, headers=headers)
+                assert response.status_code == 200 and len(response.json()) == args.limit, response.text
+
+            def offset():
+                db.query(models.Expense).filter(models.Expense.group_id == group_id).options(
+                    selectinload(models.Expense.splits)
+                ).order_by(*order).offset(depth).limit(args.limit).all()
+                db.expunge_all()
+
+            print(f"{depth:>9} {timed(keyset, args.repeat):>7.1f}ms {timed(offset, args.repeat):>7.1f}ms "
+                  f"{timed(api, args.repeat):>13.1f}ms")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,171 @@
+"""
+Benchmark the streaming group export: throughput and resident memory per group size.
+
+Grows one group to each --expenses size in a temporary SQLite database (or
+DATABASE_URL if set) and downloads its export through the ASGI app. The response
+body is counted and discarded, as a client writing to disk would. Resident memory is
+sampled while the export runs; a flat growth column from the smallest to the
+largest group means the export never materializes the history:
+
+    python scripts/bench_export.py
+    python scripts/bench_export.py --expenses 10000 100000 1000000 --format json
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_export.db"
+# Memory-mapped pages and SQLite's page cache (64 MiB per connection by default) count as
+# resident and fill up as bigger groups are read; keep them out of the measurement
+os.environ.setdefault("SQLITE_MMAP_SIZE", "0")
+os.environ.setdefault("SQLITE_CACHE_SIZE", "-2048")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from app import models
+from app.database import SessionLocal
+from app.main import app
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        # No procfs (macOS): fall back to the process-wide peak, KiB on Linux, bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+class RSSSampler(threading.Thread):
+    def __init__(self, interval=0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = rss_mb()
+        self._finished = threading.Event()
+
+    def run(self):
+        while not self._finished.wait(self.interval):
+            self.peak = max(self.peak, rss_mb())
+
+    def stop(self):
+        self._finished.set()
+        self.join()
+        return max(self.peak, rss_mb())
+
+
+def setup(n_members):
+    client = TestClient(app)
+    client.post("/auth/register", json={"email": "export@splitmint.com", "password": "password123", "name": "Export"})
+    token = client.post("/auth/token", data={"username": "export@splitmint.com", "password": "password123"}).json()["access_token"]
+    group = client.post("/groups/", json={"name": "export"}, headers={"Authorization": f"Bearer {token}"}).json()
+    group_id = uuid.UUID(group["id"])
+    member_ids = [uuid.UUID(group["created_by_user_id"])] + [uuid.uuid4() for _ in range(n_members - 1)]
+    db = SessionLocal()
+    try:
+        db.execute(insert(models.User), [
+            {"id": u, "email": f"export_{u}@splitmint.com", "password_hash": "!", "name": "member"} for u in member_ids[1:]
+        ])
+        db.execute(insert(models.GroupMember), [{"group_id": group_id, "user_id": u} for u in member_ids[1:]])
+        db.commit()
+    finally:
+        db.close()
+    return token, group_id, member_ids
+
+
+def grow(group_id, member_ids, have, want, rng):
+    start = datetime(2015, 1, 1)
+    db = SessionLocal()
+    try:
+        for offset in range(have, want, 10000):
+            rows = [
+                {"id": uuid.uuid4(), "group_id": group_id, "payer_id": rng.choice(member_ids),
+                 "amount": len(member_ids), "description": f"expense {i}", "split_type": "EXACT",
+                 "date": start + timedelta(minutes=rng.randint(0, 10 * 365 * 24 * 60))}
+                for i in range(offset, min(offset + 10000, want))
+            ]
+            db.execute(insert(models.Expense), rows)
+            db.execute(insert(models.ExpenseSplit), [
+                {"expense_id": row["id"], "user_id": u, "amount_owed": 1} for row in rows for u in member_ids
+            ])
+            db.commit()
+    finally:
+        db.close()
+
+
+async def download(token, group_id, fmt):
+    """Run one export request through the ASGI app, discarding the body. Returns (status, bytes)."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": f"/expenses/group/{group_id}/export", "raw_path": f"/expenses/group/{group_id}/export".encode(),
+        "query_string": f"format={fmt}".encode(), "root_path": "",
+        "headers": [(b"host", b"bench"), (b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 0), "server": ("bench", 80),
+    }
+    result = {"status": None, "bytes": 0}
+    requested, finished = False, asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Like a server: report the client gone only once the response is complete
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            result["bytes"] += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                finished.set()
+
+    await app(scope, receive, send)
+    return result["status"], result["bytes"]
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark the streaming expense export")
+    parser.add_argument("--expenses", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--format", choices=["ndjson", "json"], default="ndjson")
+    parser.add_argument("--members", type=int, default=3)
+    args = parser.parse_args()
+
+    token, group_id, member_ids = setup(args.members)
+    rng = random.Random(0)
+    have = 0
+    print(f"format={args.format}, {args.members} splits per expense")
+    print(f"{'expenses':>9} {'MB out':>8} {'seconds':>8} {'rows/sec':>9} {'RSS before':>11} {'peak RSS':>9} {'growth':>8}")
+    for size in sorted(args.expenses):
+        grow(group_id, member_ids, have, size, rng)
+        have = size
+
+        baseline = rss_mb()
+        sampler = RSSSampler()
+        sampler.start()
+        started = time.perf_counter()
+        status, n_bytes = asyncio.run(download(token, group_id, args.format))
+        elapsed = time.perf_counter() - started
+        peak = sampler.stop()
+        if status != 200:
+            raise SystemExit(f"export failed with {status}")
+        print(f"{size:>9} {n_bytes / (1024 * 1024):>8.1f} {elapsed:>8.2f} {size / elapsed:>9.0f} "
+              f"{baseline:>9.1f}MB {peak:>7.1f}MB {peak - baseline:>6.1f}MB")
+
+
+if __name__ == "__main__":
+    run()
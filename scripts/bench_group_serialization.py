@@ -0,0 +1,79 @@
+"""
+Benchmark group detail serialization per group size.
+
+Builds a group with --members members in memory (no database) and times each way a
+schemas.Group body can be produced:
+
+- validate: schemas.Group.model_validate on the ORM object (from_attributes)
+- json:     validate + jsonable_encoder + JSONResponse rendering (FastAPI's old default)
+- orjson:   validate + jsonable_encoder + ORJSONResponse rendering (the app default now)
+- render:   routers.groups.render_group, pydantic's own serializer (what gets cached)
+- cached:   a group_body_cache hit, which is all a repeat request pays
+
+    python scripts/bench_group_serialization.py
+    python scripts/bench_group_serialization.py --members 5 50 500 --repeat 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app import models, schemas
+from app.cache import TTLCache
+from app.routers.groups import render_group
+
+
+def build_group(n_members):
+    group = models.Group(id=uuid.uuid4(), name=f"group of {n_members}", created_by_user_id=uuid.uuid4(), members_version=1)
+    group.members = [
+        models.GroupMember(
+            user_id=user_id, joined_at=datetime(2024, 1, 1, 12, 0, i % 60),
+            user=models.User(id=user_id, email=f"member{i}@splitmint.com", name=f"Member {i}"),
+        )
+        for i, user_id in enumerate(uuid.uuid4() for _ in range(n_members))
+    ]
+    return group
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1e6
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Time group detail serialization by member count")
+    parser.add_argument("--members", type=int, nargs="+", default=[2, 10, 50, 200, 1000])
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"median of {args.repeat}, microseconds per body")
+    print(f"{'members':>8} {'bytes':>8} {'validate':>9} {'json':>9} {'orjson':>9} {'render':>9} {'cached':>7}")
+    for n_members in args.members:
+        group = build_group(n_members)
+        cache = TTLCache()
+        body = render_group(group)
+        cache.set((group.id, group.members_version), body)
+        assert ORJSONResponse(jsonable_encoder(schemas.Group.model_validate(group))).body == body
+
+        validate = timed(lambda: schemas.Group.model_validate(group), args.repeat)
+        stdlib = timed(lambda: JSONResponse(jsonable_encoder(schemas.Group.model_validate(group))).body, args.repeat)
+        fast = timed(lambda: ORJSONResponse(jsonable_encoder(schemas.Group.model_validate(group))).body, args.repeat)
+        rendered = timed(lambda: render_group(group), args.repeat)
+        cached = timed(lambda: cache.get((group.id, group.members_version)), args.repeat)
+        print(f"{n_members:>8} {len(body):>8} {validate:>9.1f} {stdlib:>9.1f} {fast:>9.1f} {rendered:>9.1f} {cached:>7.2f}")
+
+
+if __name__ == "__main__":
+    run()
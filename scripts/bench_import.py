@@ -0,0 +1,113 @@
+"""
+Benchmark the streaming expense importer: rows/sec and peak RSS per file size.
+
+Writes synthetic CSV/JSONL files to a scratch directory and imports them into a
+temporary SQLite database (or DATABASE_URL if set). Sizes run in ascending
+order, so a flat peak-RSS column means memory does not grow with the file.
+
+    python scripts/bench_import.py
+    python scripts/bench_import.py --rows 10000 100000 --format jsonl --chunk-size 1000
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import uuid
+
+scratch = tempfile.mkdtemp()
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{scratch}/bench_import.db"
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from sqlalchemy import insert
+
+from app import models
+from app.database import SessionLocal, engine
+from app.services import importer
+
+
+def seed_group(n_members):
+    user_ids = [uuid.uuid4() for _ in range(n_members)]
+    group_id = uuid.uuid4()
+    db = SessionLocal()
+    try:
+        db.execute(insert(models.User), [
+            {"id": u, "email": f"import_{u}@splitmint.com", "password_hash": "!", "name": f"user{i}"}
+            for i, u in enumerate(user_ids)
+        ])
+        db.execute(insert(models.Group), [{"id": group_id, "name": "import bench", "created_by_user_id": user_ids[0]}])
+        db.execute(insert(models.GroupMember), [{"group_id": group_id, "user_id": u} for u in user_ids])
+        db.commit()
+    finally:
+        db.close()
+    return group_id, user_ids
+
+
+def write_file(path, fmt, n_rows, user_ids, bad_every):
+    rng = random.Random(n_rows)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f) if fmt == "csv" else None
+        if writer:
+            writer.writerow(importer.CSV_COLUMNS)
+        for i in range(n_rows):
+            share = rng.randint(100, 50000) / 100
+            amount = share * len(user_ids)
+            if bad_every and i % bad_every == 0:
+                amount += 10 # Splits no longer add up: exercises per-row error reporting
+            splits = [(str(u), f"{share:.2f}") for u in user_ids]
+            payer = str(rng.choice(user_ids))
+            if writer:
+                writer.writerow([f"{amount:.2f}", f"expense {i}", "EXACT", payer, "2024-01-01T12:00:00",
+                                 ";".join(f"{u}:{a}" for u, a in splits)])
+            else:
+                f.write(json.dumps({
+                    "amount": f"{amount:.2f}", "description": f"expense {i}", "split_type": "EXACT",
+                    "payer_id": payer, "date": "2024-01-01T12:00:00",
+                    "splits": [{"user_id": u, "amount_owed": a} for u, a in splits],
+                }) + "\n")
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark the streaming expense importer")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--chunk-size", type=int, default=importer.IMPORT_CHUNK_SIZE)
+    parser.add_argument("--members", type=int, default=6)
+    parser.add_argument("--bad-every", type=int, default=100, help="Make every Nth row invalid (0 to disable)")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    group_id, user_ids = seed_group(args.members)
+    print(f"database: {engine.url.render_as_string(hide_password=True)}, format={args.format}, chunk={args.chunk_size}")
+    print(f"{'rows':>9} {'imported':>9} {'failed':>7} {'seconds':>8} {'rows/sec':>9} {'peak RSS':>9}")
+
+    for n_rows in sorted(args.rows):
+        path = os.path.join(scratch, f"expenses_{n_rows}.{args.format}")
+        write_file(path, args.format, n_rows, user_ids, args.bad_every)
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            with open(path, encoding="utf-8", newline="") as stream:
+                report = importer.import_expenses(db, stream, args.format, group_id=group_id, chunk_size=args.chunk_size)
+            elapsed = time.perf_counter() - started
+        finally:
+            db.close()
+        os.remove(path)
+        print(f"{n_rows:>9} {report.imported:>9} {report.failed:>7} {elapsed:>8.2f} "
+              f"{report.imported / elapsed:>9.0f} {peak_rss_mb():>7.1f}MB")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,98 @@
+"""
+Benchmark member-name resolution (services/name_index.py) by group size.
+
+Builds a NameIndex over --members random "First Last" names and resolves queries of
+each kind against it:
+
+- exact:    the name as stored
+- casefold: lowercased, possessive ("priya sharma's")
+- prefix:   first name plus the surname's initial ("Priya S")
+- typo:     one character of the name replaced
+- unknown:  a name nobody in the group has
+
+For each kind it reports the median and p99 microseconds per lookup, how often the
+intended member came back, and how often a lookup was left unresolved or resolved to
+someone else. Leaving an ambiguous name unresolved is the intended outcome; "wrong" should
+stay at zero. The build column is the one-off cost paid per group until its membership changes.
+
+    python scripts/bench_name_index.py
+    python scripts/bench_name_index.py --members 50 500 2000 --queries 500
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from app.services.name_index import NameIndex
+
+FIRST = ["James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William", "Elizabeth",
+         "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Priya", "Rahul", "Aisha",
+         "Chen", "Wei", "Sofia", "Lucas", "Mateo", "Zoë", "Arjun", "Fatima", "Kenji", "Olga", "Tomás", "Ngozi"]
+LAST = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+        "Sharma", "Patel", "Kumar", "Singh", "Nguyen", "Kim", "Lee", "Müller", "Okafor", "Tanaka", "Ivanova",
+        "Rossi", "Dubois", "Haddad", "Cohen", "Silva", "Andersson", "Kowalski", "O'Brien", "Yilmaz"]
+
+
+def typo(rng, name):
+    i = rng.randrange(1, len(name))
+    while name[i] == " ":
+        i = rng.randrange(1, len(name))
+    return name[:i] + rng.choice([c for c in string.ascii_lowercase if c != name[i].lower()]) + name[i + 1:]
+
+
+QUERIES = {
+    "exact": lambda rng, name: name,
+    "casefold": lambda rng, name: name.lower() + "'s",
+    "prefix": lambda rng, name: f"{name.split()[0]} {name.split()[-1][0]}",
+    "typo": typo,
+    "unknown": lambda rng, name: "Quentin Zebedee",
+}
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Time member-name resolution by group size")
+    parser.add_argument("--members", type=int, nargs="+", default=[10, 100, 300, 800])
+    parser.add_argument("--queries", type=int, default=300, help="lookups per kind")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'members':>8} {'build':>8} {'query':>9} {'p50':>6} {'p99':>6} {'found':>7} {'unresolved':>10} {'wrong':>6}")
+    for n_members in args.members:
+        rng = random.Random(args.seed)
+        names = list(dict.fromkeys(f"{rng.choice(FIRST)} {rng.choice(LAST)}" for _ in range(n_members * 3)))[:n_members]
+        members = [(uuid.uuid4(), name) for name in names]
+        started = time.perf_counter()
+        index = NameIndex(members)
+        build = (time.perf_counter() - started) * 1000
+
+        for kind, make in QUERIES.items():
+            samples, found, unresolved, wrong = [], 0, 0, 0
+            for _ in range(args.queries):
+                user_id, name = rng.choice(members)
+                query = make(rng, name)
+                started = time.perf_counter()
+                result = index.resolve(query)
+                samples.append(time.perf_counter() - started)
+                if kind == "unknown":
+                    found += result is None
+                    wrong += result is not None
+                elif result == user_id:
+                    found += 1
+                elif result is None:
+                    unresolved += 1
+                else:
+                    wrong += 1
+            samples.sort()
+            print(f"{n_members:>8} {build:>6.2f}ms {kind:>9} {statistics.median(samples) * 1e6:>4.0f}us "
+                  f"{samples[int(len(samples) * 0.99)] * 1e6:>4.0f}us {found / args.queries:>7.1%} "
+                  f"{unresolved / args.queries:>10.1%} {wrong / args.queries:>6.1%}")
+
+
+if __name__ == "__main__":
+    run()
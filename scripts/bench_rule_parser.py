@@ -0,0 +1,230 @@
+"""
+Benchmark the rule-based expense parser (services/rule_parser.py) on a labeled corpus, offline.
+
+Each case is a text, a group roster, the current user and the expected answer, or none
+where the text needs the model (uneven shares, exclusions, unknown names, two amounts).
+Per phrasing it reports:
+
+- answered: share of cases the rules answered at the configured confidence threshold
+- correct:  share of those answers matching the label (amount, payer, participants,
+            split type and description); answering a case labeled for the model is wrong
+- p50/p95:  parse latency in microseconds
+
+followed by the coverage/accuracy trade-off for a range of thresholds. The built-in corpus
+is generated from templates over --groups rosters with --seed; --corpus reads JSON lines:
+{"text": ..., "members": [...], "current_user": ..., "expected": {...} | null, "template": ...}
+
+    python scripts/bench_rule_parser.py
+    python scripts/bench_rule_parser.py --cases 5000 --thresholds 0.5 0.7 0.8 0.9
+    python scripts/bench_rule_parser.py --corpus labeled.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from app.services.rule_parser import RULE_PARSER_MIN_CONFIDENCE, RuleParser
+
+NAMES = ["Aisha", "Ben", "Chen", "Dara", "Priya Sharma", "Rahul", "Sofia Garcia", "Tom", "Uma", "Vikram"]
+STRANGERS = ["Zed", "Quentin", "Yusuf"]
+DESCRIPTIONS = ["dinner", "groceries", "movie tickets", "cab", "hotel", "electricity bill", "pizza", "coffee", "petrol"]
+
+
+def money(rng):
+    """(text, value) in one of the formats people type."""
+    value = rng.choice([rng.randint(1, 99) * 100, rng.randint(5, 4999), round(rng.uniform(5, 500), 2)])
+    formats = ["{:g}", "{:,g}", "Rs {:g}", "₹{:g}", "${:g}", "{:g} rs", "{:g} bucks"]
+    if value >= 1000 and value % 100 == 0:
+        formats.append("k")
+    fmt = rng.choice(formats)
+    text = f"{value / 1000:g}k" if fmt == "k" else fmt.format(value)
+    return text, float(value)
+
+
+def label(amount, description, payer, involved, members):
+    return {
+        "amount": amount,
+        "description": description,
+        "payer_name": payer,
+        "involved_users": [m for m in members if m in involved],
+        "split_type": "EQUAL",
+    }
+
+
+def first(name):
+    return name.split()[0]
+
+
+# Each template: rng, roster, current user, others -> (text, expected or None)
+def with_two(rng, members, me, others):
+    amount, value = money(rng)
+    desc, (a, b) = rng.choice(DESCRIPTIONS), rng.sample(others, 2)
+    return f"I paid {amount} for {desc} split with {first(a)} and {first(b)}", label(value, desc, me, {me, a, b}, members)
+
+
+def named_payer_everyone(rng, members, me, others):
+    amount, value = money(rng)
+    desc, a = rng.choice(DESCRIPTIONS), rng.choice(others)
+    return f"{a} paid {amount} for {desc}, split with everyone", label(value, desc, a, set(members), members)
+
+
+def terse(rng, members, me, others):
+    amount, value = money(rng)
+    desc, a = rng.choice(DESCRIPTIONS), rng.choice(others)
+    return f"{desc} {amount} split with {first(a).lower()}", label(value, desc, me, {me, a}, members)
+
+
+def between(rng, members, me, others):
+    amount, value = money(rng)
+    desc, (a, b) = rng.choice(DESCRIPTIONS), rng.sample(others, 2)
+    return f"Paid {amount} for {desc} between {first(a)} and {first(b)}", label(value, desc, me, {a, b}, members)
+
+
+def covered_with_me(rng, members, me, others):
+    amount, value = money(rng)
+    desc, a = rng.choice(DESCRIPTIONS), rng.choice(others)
+    return f"{first(a)} covered the {desc} {amount} with me", label(value, desc, a, {a, me}, members)
+
+
+def paid_by_trailing(rng, members, me, others):
+    amount, value = money(rng)
+    desc, a = rng.choice(DESCRIPTIONS), rng.choice(others)
+    return f"{desc} for everyone, {amount}, paid by {first(a)}", label(value, desc, a, set(members), members)
+
+
+def spent_on_list(rng, members, me, others):
+    amount, value = money(rng)
+    desc, (a, b, c) = rng.choice(DESCRIPTIONS), rng.sample(others, 3)
+    return (f"I spent {amount} on {desc} with {first(a)}, {first(b)} and {first(c)}",
+            label(value, desc, me, {me, a, b, c}, members))
+
+
+def on_behalf(rng, members, me, others):
+    amount, value = money(rng)
+    desc, a = rng.choice(DESCRIPTIONS), rng.choice(others)
+    return f"I paid {amount} for {first(a)}'s {desc}", label(value, desc, me, {a}, members)
+
+
+def bare(rng, members, me, others):
+    # Right most of the time, but a guess: the rules should leave it to the model at the default threshold
+    amount, value = money(rng)
+    desc = rng.choice(DESCRIPTIONS)
+    return f"{desc} {amount}", label(value, desc, me, set(members), members)
+
+
+def percent(rng, members, me, others):
+    amount, _ = money(rng)
+    desc, (a, b) = rng.choice(DESCRIPTIONS), rng.sample(others, 2)
+    return f"{a} paid {amount} for {desc}, {first(b)} owes {rng.choice([40, 60, 70])}%", None
+
+
+def exclusion(rng, members, me, others):
+    amount, _ = money(rng)
+    desc, (a, b) = rng.choice(DESCRIPTIONS), rng.sample(others, 2)
+    return f"{desc} {amount} paid by {first(a)} for everyone except {first(b)}", None
+
+
+def stranger(rng, members, me, others):
+    amount, _ = money(rng)
+    return f"I paid {amount} for {rng.choice(DESCRIPTIONS)} with {rng.choice(STRANGERS)}", None
+
+
+def two_amounts(rng, members, me, others):
+    (amount, _), (tip, _) = money(rng), money(rng)
+    return f"{rng.choice(DESCRIPTIONS)} {amount} and tip {tip} split with {first(rng.choice(others))}", None
+
+
+TEMPLATES = [with_two, named_payer_everyone, terse, between, covered_with_me, paid_by_trailing, spent_on_list,
+             on_behalf, bare, percent, exclusion, stranger, two_amounts]
+
+
+def generate(n_cases, seed, n_groups):
+    rng = random.Random(seed)
+    # A fixed set of groups, as in production: a roster's name regex is compiled once, then reused
+    groups = [rng.sample(NAMES, rng.randint(4, 7)) for _ in range(n_groups)]
+    cases = []
+    for i in range(n_cases):
+        template = TEMPLATES[i % len(TEMPLATES)]
+        members = rng.choice(groups)
+        me, others = members[0], members[1:]
+        text, expected = template(rng, members, me, others)
+        cases.append({"template": template.__name__, "text": text, "members": members, "current_user": me,
+                      "expected": expected})
+    return cases
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+    for case in cases:
+        case.setdefault("template", "corpus")
+    return cases
+
+
+def matches(parsed, expected):
+    return (
+        expected is not None
+        and abs(parsed["amount"] - expected["amount"]) < 0.005
+        and parsed["payer_name"] == expected["payer_name"]
+        and sorted(parsed["involved_users"]) == sorted(expected["involved_users"])
+        and parsed["split_type"] == expected["split_type"]
+        and parsed["description"].casefold() == expected["description"].casefold()
+    )
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Accuracy and latency of the rule-based expense parser")
+    parser.add_argument("--cases", type=int, default=2600)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--groups", type=int, default=20, help="distinct rosters in the generated corpus")
+    parser.add_argument("--corpus", help="JSON lines of labeled cases instead of the generated corpus")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.6, 0.7, 0.8, 0.9, 1.0])
+    parser.add_argument("--show-errors", type=int, default=5, help="wrong answers to print")
+    args = parser.parse_args()
+
+    cases = load(args.corpus) if args.corpus else generate(args.cases, args.seed, args.groups)
+    if not cases:
+        parser.error("no cases to run")
+    rules = RuleParser(min_confidence=0) # Keep every answer; thresholds are applied below
+    results = []
+    for case in cases:
+        started = time.perf_counter()
+        parsed, confidence = rules.parse(case["text"], case["members"], case["current_user"])
+        elapsed = time.perf_counter() - started
+        results.append((case, parsed, confidence, elapsed))
+
+    threshold = RULE_PARSER_MIN_CONFIDENCE
+    print(f"{len(cases)} cases, threshold {threshold:g}")
+    print(f"{'phrasing':>22} {'cases':>6} {'answered':>9} {'correct':>8} {'p50':>7} {'p95':>7}")
+    by_template = {}
+    for result in results:
+        by_template.setdefault(result[0]["template"], []).append(result)
+    for name, group in list(by_template.items()) + [("all", results)]:
+        answered = [(case, parsed) for case, parsed, confidence, _ in group if parsed is not None and confidence >= threshold]
+        correct = sum(matches(parsed, case["expected"]) for case, parsed in answered)
+        latencies = sorted(elapsed for *_, elapsed in group)
+        p95 = latencies[int(len(latencies) * 0.95)]
+        print(f"{name:>22} {len(group):>6} {len(answered) / len(group):>8.1%} "
+              f"{correct / len(answered) if answered else 0:>8.1%} "
+              f"{statistics.median(latencies) * 1e6:>5.0f}us {p95 * 1e6:>5.0f}us")
+
+    print(f"\n{'threshold':>9} {'answered':>9} {'correct':>8} {'to model':>9}")
+    for t in args.thresholds:
+        answered = [(case, parsed) for case, parsed, confidence, _ in results if parsed is not None and confidence >= t]
+        correct = sum(matches(parsed, case["expected"]) for case, parsed in answered)
+        print(f"{t:>9g} {len(answered) / len(results):>8.1%} {correct / len(answered) if answered else 0:>8.1%} "
+              f"{1 - len(answered) / len(results):>8.1%}")
+
+    wrong = [(case, parsed) for case, parsed, confidence, _ in results
+             if parsed is not None and confidence >= threshold and not matches(parsed, case["expected"])]
+    for case, parsed in wrong[:args.show_errors]:
+        print(f"\nwrong: {case['text']!r}\n  got      {parsed}\n  expected {case['expected']}")
+
+
+if __name__ == "__main__":
+    run()
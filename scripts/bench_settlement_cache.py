@@ -0,0 +1,137 @@
+"""
+Benchmark the balances endpoint: settlement cache miss vs hit vs 304 revalidation.
+
+Seeds one group with --members members and --expenses expenses in a temporary
+SQLite database (or DATABASE_URL if set) and times GET /expenses/group/{id}/balances
+through the API in each state, per settlement mode. The statements of each request
+are captured too: a hit must not touch expenses or expense_splits (nor, with the
+ledger, group_balances), and a 304 sends no body:
+
+    python scripts/bench_settlement_cache.py
+    python scripts/bench_settlement_cache.py --members 16 --expenses 20000
+    SETTLEMENT_CACHE_BACKEND=redis SETTLEMENT_CACHE_URL=fakeredis:// python scripts/bench_settlement_cache.py
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_settlement_cache.db"
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert
+
+from app import crud, models
+from app.database import SessionLocal, engine
+from app.main import app
+from app.routers.expenses import settlement_cache, SETTLEMENT_CACHE_BACKEND
+
+TABLE = re.compile(r"\b(?:FROM|JOIN|UPDATE)\s+(\w+)", re.IGNORECASE)
+
+
+def seed(client, n_members, n_expenses):
+    client.post("/auth/register", json={"email": "settle@splitmint.com", "password": "password123", "name": "Settle"})
+    token = client.post("/auth/token", data={"username": "settle@splitmint.com", "password": "password123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    group = client.post("/groups/", json={"name": "settle"}, headers=headers).json()
+    group_id = uuid.UUID(group["id"])
+    member_ids = [uuid.UUID(group["created_by_user_id"])] + [uuid.uuid4() for _ in range(n_members - 1)]
+
+    rng = random.Random(n_expenses)
+    start = datetime(2020, 1, 1)
+    db = SessionLocal()
+    try:
+        db.execute(insert(models.User), [
+            {"id": u, "email": f"settle_{u}@splitmint.com", "password_hash": "!", "name": "member"} for u in member_ids[1:]
+        ])
+        db.execute(insert(models.GroupMember), [{"group_id": group_id, "user_id": u} for u in member_ids[1:]])
+        for offset in range(0, n_expenses, 10000):
+            rows, splits = [], []
+            for i in range(offset, min(offset + 10000, n_expenses)):
+                expense_id = uuid.uuid4()
+                circle = rng.sample(member_ids, rng.randint(2, 4))
+                share = rng.randint(100, 5000)
+                rows.append({"id": expense_id, "group_id": group_id, "payer_id": circle[0], "amount": share * len(circle) / 100,
+                             "description": f"expense {i}", "split_type": "EXACT",
+                             "date": start + timedelta(minutes=rng.randint(0, 365 * 24 * 60))})
+                splits.extend({"expense_id": expense_id, "user_id": u, "amount_owed": share / 100} for u in circle)
+            db.execute(insert(models.Expense), rows)
+            db.execute(insert(models.ExpenseSplit), splits)
+        db.commit()
+        crud.rebuild_group_balances(db, group_id) # Seeded behind the ledger's back
+    finally:
+        db.close()
+    return headers, group_id
+
+
+def timed(fn, repeat, before=None):
+    samples = []
+    for _ in range(repeat):
+        if before:
+            before()
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def tables_touched(fn):
+    tables = set()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        tables.update(TABLE.findall(statement))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return ",".join(sorted(tables)) or "-"
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Compare balances latency on a settlement cache miss, hit and 304")
+    parser.add_argument("--members", type=int, default=12)
+    parser.add_argument("--expenses", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    headers, group_id = seed(client, args.members, args.expenses)
+    url = f"/expenses/group/{group_id}/balances"
+    etag = {}
+
+    print(f"{args.members} members, {args.expenses} expenses, {SETTLEMENT_CACHE_BACKEND} cache, median of {args.repeat}")
+    print(f"{'mode':>8} {'state':>6} {'latency':>9} {'bytes':>6}  tables read")
+    for mode in ("greedy", "optimal"):
+        def miss():
+            response = client.get(url, params={"mode": mode}, headers=headers)
+            assert response.status_code == 200, response.text
+            etag[mode] = response.headers["ETag"]
+            return len(response.content)
+
+        def not_modified():
+            response = client.get(url, params={"mode": mode}, headers={**headers, "If-None-Match": etag[mode]})
+            assert response.status_code == 304, response.status_code
+            return len(response.content)
+
+        size = {"miss": miss(), "hit": miss(), "304": not_modified()}
+        states = (("miss", miss, settlement_cache.clear), ("hit", miss, None), ("304", not_modified, None))
+        for state, fn, before in states:
+            if before:
+                before()
+            touched = tables_touched(fn)
+            print(f"{mode:>8} {state:>6} {timed(fn, args.repeat, before):>7.2f}ms {size[state]:>6}  {touched}")
+
+
+if __name__ == "__main__":
+    run()
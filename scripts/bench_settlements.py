@@ -0,0 +1,74 @@
+"""
+Benchmark the settlement engine: transfer count and runtime by group size, greedy vs optimal.
+
+Balances are generated from random expenses inside small circles of friends within
+the group (2-4 people sharing costs). That is the case where the two modes differ:
+greedy settles across circles, optimal finds the circles. Optimal falls back to
+greedy past OPTIMAL_MAX_ACCOUNTS or its time budget; the "ran" column shows when:
+
+    python scripts/bench_settlements.py
+    python scripts/bench_settlements.py --sizes 8 12 16 --budget-ms 2000 --trials 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from app.services.balance_engine import BalanceEngine, OPTIMAL_TIME_BUDGET
+
+
+def circles_balances(n_members, rng):
+    members = [f"user{i:04d}" for i in range(n_members)]
+    rng.shuffle(members)
+    cents = dict.fromkeys(members, 0)
+    start = 0
+    while start < n_members:
+        size = min(rng.randint(2, 4), n_members - start)
+        if n_members - start - size == 1:
+            size += 1 # Nobody is left in a circle of one
+        circle = members[start:start + size]
+        for _ in range(rng.randint(1, 5)):
+            payer = rng.choice(circle)
+            share = rng.randint(100, 10000)
+            cents[payer] += share * len(circle)
+            for member in circle:
+                cents[member] -= share
+        start += size
+    return {user: Decimal(amount) / 100 for user, amount in cents.items()}
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Compare greedy and optimal settlement by group size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4, 8, 12, 16, 18, 50, 200, 1000])
+    parser.add_argument("--trials", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=OPTIMAL_TIME_BUDGET * 1000)
+    args = parser.parse_args()
+
+    print(f"{args.trials} trials per size, optimal budget {args.budget_ms:g}ms; medians")
+    print(f"{'members':>8} {'greedy tx':>10} {'greedy ms':>10} {'optimal tx':>11} {'optimal ms':>11} {'ran':>12}")
+    for n_members in args.sizes:
+        rng = random.Random(n_members)
+        results = {"greedy": ([], []), "optimal": ([], [])}
+        ran = {"optimal": 0, "greedy": 0}
+        for _ in range(args.trials):
+            balances = circles_balances(n_members, rng)
+            for mode, (counts, timings) in results.items():
+                started = time.perf_counter()
+                transfers, used = BalanceEngine.settle(balances, mode, time_budget=args.budget_ms / 1000, strict=True)
+                timings.append((time.perf_counter() - started) * 1000)
+                counts.append(len(transfers))
+                if mode == "optimal":
+                    ran[used] += 1
+        (greedy_tx, greedy_ms), (optimal_tx, optimal_ms) = results["greedy"], results["optimal"]
+        print(f"{n_members:>8} {statistics.median(greedy_tx):>10g} {statistics.median(greedy_ms):>10.2f} "
+              f"{statistics.median(optimal_tx):>11g} {statistics.median(optimal_ms):>11.2f} "
+              f"{ran['optimal']:>3} opt/{ran['greedy']:>2} gr")
+
+
+if __name__ == "__main__":
+    run()
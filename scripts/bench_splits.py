@@ -0,0 +1,68 @@
+"""
+Benchmark server-side split computation: cost per expense by member count and split type.
+
+Times SplitCalculator alone and the full ExpenseCreate validation it runs inside,
+which is what every expense write pays. Also checks on every sample that the shares
+add up to the amount exactly:
+
+    python scripts/bench_splits.py
+    python scripts/bench_splits.py --members 2 10 100 1000 --expenses 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from app import schemas
+from app.services.split_calculator import SplitCalculator
+
+
+def payloads(n_members, n_expenses, split_type, rng):
+    group_id, user_ids = str(uuid.uuid4()), [str(uuid.uuid4()) for _ in range(n_members)]
+    for _ in range(n_expenses):
+        amount = Decimal(rng.randint(1, 10 ** 6)) / 100
+        if split_type == "PERCENT":
+            cuts = sorted(rng.randint(0, 10000) for _ in range(n_members - 1))
+            splits = [{"user_id": u, "percent": str(Decimal(b - a) / 100)} for u, a, b in zip(user_ids, [0] + cuts, cuts + [10000])]
+        else:
+            splits = [{"user_id": u} for u in user_ids]
+        yield {"amount": str(amount), "split_type": split_type, "group_id": group_id, "payer_id": user_ids[0], "splits": splits}
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Time split computation per expense")
+    parser.add_argument("--members", type=int, nargs="+", default=[2, 5, 20, 100])
+    parser.add_argument("--expenses", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{args.expenses} expenses per row; microseconds per expense")
+    print(f"{'members':>8} {'type':>8} {'calculator':>11} {'ExpenseCreate':>14}")
+    for n_members in args.members:
+        for split_type in ("EQUAL", "PERCENT"):
+            bodies = list(payloads(n_members, args.expenses, split_type, random.Random(n_members)))
+            inputs = [
+                (Decimal(b["amount"]), [(s["user_id"], None, Decimal(s["percent"]) if "percent" in s else None) for s in b["splits"]])
+                for b in bodies
+            ]
+
+            started = time.perf_counter()
+            for amount, splits in inputs:
+                SplitCalculator.compute(amount, split_type, splits)
+            calculator = (time.perf_counter() - started) / len(inputs) * 1e6
+
+            started = time.perf_counter()
+            created = [schemas.ExpenseCreate.model_validate(body) for body in bodies]
+            validated = (time.perf_counter() - started) / len(bodies) * 1e6
+
+            for expense in created:
+                assert sum(s.amount_owed for s in expense.splits) == expense.amount.quantize(Decimal("0.01"))
+            print(f"{n_members:>8} {split_type:>8} {calculator:>9.1f}us {validated:>12.1f}us")
+
+
+if __name__ == "__main__":
+    run()
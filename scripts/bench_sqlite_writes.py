@@ -0,0 +1,149 @@
+"""
+Benchmark concurrent writes against SQLite with and without the pragma profile in app/database.py.
+
+Each profile runs in its own subprocess (pragmas are applied when connections open)
+against a fresh scratch database. Writer threads add expenses while reader threads
+read balances, all through the app's pooled engine:
+
+    python scripts/bench_sqlite_writes.py
+    python scripts/bench_sqlite_writes.py --writers 8 --readers 8 --seconds 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def drive(n_writers, n_readers, seconds):
+    from sqlalchemy import insert
+    from sqlalchemy.exc import OperationalError
+
+    from app import crud, models, schemas
+    from app.database import SessionLocal, acquire, engine, pool_stats
+
+    models.Base.metadata.create_all(bind=engine)
+    member_ids = [uuid.uuid4() for _ in range(4)]
+    group_id = uuid.uuid4()
+    db = SessionLocal()
+    try:
+        db.execute(insert(models.User), [
+            {"id": u, "email": f"writes_{u}@splitmint.com", "password_hash": "!", "name": f"user{i}"}
+            for i, u in enumerate(member_ids)
+        ])
+        db.execute(insert(models.Group), [{"id": group_id, "name": "write bench", "created_by_user_id": member_ids[0]}])
+        db.execute(insert(models.GroupMember), [{"group_id": group_id, "user_id": u} for u in member_ids])
+        crud.apply_balance_deltas(db, group_id, {u: 0 for u in member_ids})
+        db.commit()
+    finally:
+        db.close()
+
+    deadline = time.perf_counter() + seconds
+    write_latencies, read_latencies = [], []
+    errors = {"locked": 0}
+
+    def writer(n):
+        expense = schemas.ExpenseCreate(
+            amount=Decimal(len(member_ids)), description=f"writer {n}", split_type="EXACT",
+            group_id=group_id, payer_id=member_ids[n % len(member_ids)],
+            splits=[{"user_id": m, "amount_owed": Decimal(1)} for m in member_ids],
+        )
+        while time.perf_counter() < deadline:
+            db = SessionLocal()
+            started = time.perf_counter()
+            try:
+                acquire(db) # Times the pool wait, as the API's Database does
+                crud.create_expense(db, expense)
+                write_latencies.append(time.perf_counter() - started)
+            except OperationalError:
+                db.rollback()
+                errors["locked"] += 1
+            finally:
+                db.close()
+
+    def reader():
+        while time.perf_counter() < deadline:
+            db = SessionLocal()
+            started = time.perf_counter()
+            try:
+                acquire(db)
+                crud.get_group_balances(db, group_id)
+                read_latencies.append(time.perf_counter() - started)
+            except OperationalError:
+                errors["locked"] += 1
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(n_writers)]
+    threads += [threading.Thread(target=reader) for _ in range(n_readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db = SessionLocal()
+    try:
+        drift = crud.verify_group_balances(db, group_id)
+    finally:
+        db.close()
+
+    write_latencies.sort()
+    read_latencies.sort()
+    return {
+        "writes_per_sec": len(write_latencies) / seconds,
+        "reads_per_sec": len(read_latencies) / seconds,
+        "write_p99_ms": percentile(write_latencies, 99) * 1000,
+        "read_p99_ms": percentile(read_latencies, 99) * 1000,
+        "errors": errors["locked"],
+        "ledger_ok": not drift,
+        "pool_wait_max_ms": pool_stats()["sync"]["wait_seconds_max"] * 1000,
+    }
+
+
+def run_child(args):
+    sys.path.insert(0, BACKEND)
+    print(json.dumps(drive(args.writers, args.readers, args.seconds)))
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Compare SQLite write throughput with and without SQLITE_TUNING")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args)
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:g}s per profile")
+    print(f"{'profile':<8} {'writes/s':>9} {'reads/s':>9} {'write p99':>10} {'read p99':>10} {'errors':>7} {'pool wait':>10} {'ledger':>7}")
+    for tuning in ("off", "on"):
+        env = dict(os.environ, SQLITE_TUNING=tuning, DATABASE_URL=f"sqlite:///{tempfile.mkdtemp()}/bench_writes.db")
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", "--writers", str(args.writers),
+             "--readers", str(args.readers), "--seconds", str(args.seconds)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{tuning:<8} {result['writes_per_sec']:>9.0f} {result['reads_per_sec']:>9.0f} "
+              f"{result['write_p99_ms']:>8.1f}ms {result['read_p99_ms']:>8.1f}ms {result['errors']:>7} "
+              f"{result['pool_wait_max_ms']:>8.1f}ms {'ok' if result['ledger_ok'] else 'DRIFT':>7}")
+
+
+if __name__ == "__main__":
+    run()
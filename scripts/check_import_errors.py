@@ -0,0 +1,79 @@
+"""
+Upload malformed import files and fail unless every bad row is reported rather than fatal.
+
+Each case posts a CSV or JSONL file with good rows around a bad one (JSON that is not an
+object, bytes that are not UTF-8, a CSV field over the csv module's size limit) to
+POST /expenses/group/{id}/import, and checks for a 200 with the good rows imported and the
+bad one reported at the right row. Runs in-process against a scratch SQLite database:
+
+    python scripts/check_import_errors.py   # exits 1 if a case fails
+"""
+import csv
+import json
+import os
+import sys
+import tempfile
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/import_errors.db"
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.importer import CSV_COLUMNS
+
+
+def setup(client):
+    client.post("/auth/register", json={"email": "import@splitmint.com", "password": "password123", "name": "Import"})
+    token = client.post("/auth/token", data={"username": "import@splitmint.com", "password": "password123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    group = client.post("/groups/", json={"name": "import errors"}, headers=headers).json()
+    return headers, group["id"], group["created_by_user_id"]
+
+
+def cases(user_id):
+    row = {"amount": "10", "description": "ok", "split_type": "EQUAL", "payer_id": user_id, "splits": [{"user_id": user_id}]}
+    line = json.dumps(row).encode() + b"\n"
+    csv_row = f"10,ok,EQUAL,{user_id},,{user_id}\n".encode()
+    header = (",".join(CSV_COLUMNS) + "\n").encode()
+    too_big = b"10," + b"x" * (csv.field_size_limit() + 1) + f",EQUAL,{user_id},,{user_id}\n".encode()
+    # name, file name, body, rows imported, {row: error substring}
+    return [
+        ("JSON array line", "rows.jsonl", line + b"[1, 2]\n" + line, 2, {2: "row must be an object"}),
+        ("JSON string line", "rows.jsonl", line + b'"x"\n' + line, 2, {2: "row must be an object"}),
+        ("JSONL not UTF-8", "rows.jsonl", line + b'{"description": "\xff\xfe"}\n', 0, {1: "not valid UTF-8"}),
+        ("CSV not UTF-8", "rows.csv", header + csv_row + b"10,\xff,EQUAL\n", 0, {2: "not valid UTF-8"}),
+        ("CSV field over limit", "rows.csv", header + csv_row + too_big + csv_row, 2, {3: "field larger than field limit"}),
+    ]
+
+
+def run():
+    client = TestClient(app, raise_server_exceptions=False)
+    headers, group_id, user_id = setup(client)
+    failures = 0
+    print(f"{'case':<24} {'status':>6} {'imported':>8}  result")
+    for name, filename, body, imported, errors in cases(user_id):
+        response = client.post(f"/expenses/group/{group_id}/import", files={"file": (filename, body)}, headers=headers)
+        report = response.json() if response.status_code == 200 else {}
+        reported = {e["row"]: e["error"] for e in report.get("errors", [])}
+        problems = []
+        if response.status_code != 200:
+            problems.append(f"HTTP {response.status_code}")
+        elif report["imported"] != imported:
+            problems.append(f"imported {report['imported']}, expected {imported}")
+        for row, expected in errors.items():
+            if expected not in reported.get(row, ""):
+                problems.append(f"row {row}: expected {expected!r}, got {reported.get(row)!r}")
+        failures += bool(problems)
+        print(f"{name:<24} {response.status_code:>6} {report.get('imported', '-'):>8}  {'; '.join(problems) or 'ok'}")
+
+    if failures:
+        print(f"{failures} case(s) failed")
+        return 1
+    print("Every malformed row is reported")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,179 @@
+"""
+Count the SQL statements each API endpoint issues and fail on N+1 regressions.
+
+Every endpoint is called against a small and a large fixture (more groups,
+members, expenses and splits). A constant-query endpoint issues the same
+number of statements for both; if the large fixture needs more, some
+relationship is being lazy-loaded per row. Every endpoint here reads the
+database, so a count of zero means statements went uncounted and also fails.
+Runs in-process against a scratch SQLite database, in either DB_MODE:
+
+    python scripts/check_query_counts.py            # exits 1 on regression
+    python scripts/check_query_counts.py --verbose  # also print the SQL
+    DB_MODE=async python scripts/check_query_counts.py
+"""
+import argparse
+import os
+import sys
+import tempfile
+import uuid
+from contextlib import contextmanager
+from decimal import Decimal
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/query_counts.db"
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app import crud, database, models
+from app.database import SessionLocal, engine
+from app.main import app
+
+# Upper bound per endpoint, on top of the small == large check
+QUERY_BUDGETS = {
+    "GET /groups/": 4, # Cold group body cache; warm, it is the principal and version lookups
+    "GET /groups/{id}": 3,
+    "POST /groups/{id}/members": 8,
+    "POST /expenses/": 7, # Plus a few every BALANCE_CHECKPOINT_INTERVAL expenses, to take a checkpoint
+    "GET /expenses/group/{id}": 2,
+    "GET /expenses/group/{id}/balances": 2, # Settlement cache miss; a hit is the version lookup alone
+    "GET /expenses/me/balances": 3,
+    "GET /expenses/group/{id}/balances/at": 2,
+    "GET /expenses/group/{id}/balances/series": 3,
+}
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # Requests run on the async engine in DB_MODE=async; its statements go through its sync core
+    engines = [engine] + ([database.async_engine.sync_engine] if database.async_engine is not None else [])
+    for target in engines:
+        event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", before_cursor_execute)
+
+
+def seed(client, label, n_groups, n_members, n_expenses):
+    email = f"{label}@splitmint.com"
+    client.post("/auth/register", json={"email": email, "password": "password123", "name": label})
+    token = client.post("/auth/token", data={"username": email, "password": "password123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    db = SessionLocal()
+    try:
+        owner = crud.get_user_by_email(db, email)
+        group_ids = []
+        for g in range(n_groups):
+            group = models.Group(name=f"{label} group {g}", created_by_user_id=owner.id)
+            db.add(group)
+            db.flush()
+            member_ids = [owner.id]
+            for m in range(n_members - 1):
+                user = models.User(email=f"{label}_{g}_{m}@splitmint.com", password_hash="!", name=f"{label} {m}")
+                db.add(user)
+                db.flush()
+                member_ids.append(user.id)
+            for user_id in member_ids:
+                db.add(models.GroupMember(group_id=group.id, user_id=user_id))
+            deltas = {}
+            for e in range(n_expenses):
+                expense = models.Expense(
+                    group_id=group.id, payer_id=member_ids[e % n_members],
+                    amount=Decimal(n_members), description=f"expense {e}", split_type="EQUAL",
+                )
+                db.add(expense)
+                db.flush()
+                for user_id in member_ids:
+                    db.add(models.ExpenseSplit(expense_id=expense.id, user_id=user_id, amount_owed=Decimal(1)))
+                splits = [(user_id, Decimal(1)) for user_id in member_ids]
+                for user_id, delta in crud.expense_balance_deltas(expense.payer_id, expense.amount, splits).items():
+                    deltas[user_id] = deltas.get(user_id, Decimal(0)) + delta
+            crud.apply_balance_deltas(db, group.id, deltas)
+            group_ids.append((str(group.id), [str(m) for m in member_ids]))
+        db.commit()
+    finally:
+        db.close()
+    return headers, group_ids
+
+
+def measure(client, headers, group_id, member_ids):
+    """Issue one request per endpoint, returning {endpoint: [statements]}."""
+    calls = {
+        "GET /groups/": lambda: client.get("/groups/", headers=headers),
+        "GET /groups/{id}": lambda: client.get(f"/groups/{group_id}", headers=headers),
+        "POST /groups/{id}/members": lambda: client.post(
+            f"/groups/{group_id}/members", json={"name": f"ghost {uuid.uuid4()}"}, headers=headers
+        ),
+        "POST /expenses/": lambda: client.post("/expenses/", headers=headers, json={
+            "amount": str(len(member_ids)), "description": "probe", "split_type": "EQUAL",
+            "group_id": group_id, "payer_id": member_ids[0],
+            "splits": [{"user_id": m, "amount_owed": "1"} for m in member_ids],
+        }),
+        "GET /expenses/group/{id}": lambda: client.get(f"/expenses/group/{group_id}", headers=headers),
+        "GET /expenses/group/{id}/balances": lambda: client.get(f"/expenses/group/{group_id}/balances", headers=headers),
+        "GET /expenses/me/balances": lambda: client.get("/expenses/me/balances", params={"settle": "true"}, headers=headers),
+        "GET /expenses/group/{id}/balances/at": lambda: client.get(
+            f"/expenses/group/{group_id}/balances/at", params={"at": "2100-01-01T00:00:00"}, headers=headers
+        ),
+        "GET /expenses/group/{id}/balances/series": lambda: client.get(
+            f"/expenses/group/{group_id}/balances/series", params={"start": "2000-01-01", "bucket": "month"}, headers=headers
+        ),
+    }
+    results = {}
+    for name, call in calls.items():
+        with count_queries() as statements:
+            response = call()
+        if response.status_code >= 400:
+            raise SystemExit(f"{name} failed with {response.status_code}: {response.text}")
+        results[name] = list(statements)
+    return results
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Fail if an endpoint's query count grows with data size")
+    parser.add_argument("--verbose", action="store_true", help="Print the statements issued by each endpoint")
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    small_headers, small_groups = seed(client, "small", n_groups=1, n_members=2, n_expenses=2)
+    large_headers, large_groups = seed(client, "large", n_groups=4, n_members=12, n_expenses=30)
+
+    small = measure(client, small_headers, *small_groups[0])
+    large = measure(client, large_headers, *large_groups[0])
+
+    failures = 0
+    print(f"{'endpoint':<36} {'small':>6} {'large':>6} {'budget':>7}")
+    for name, budget in QUERY_BUDGETS.items():
+        n_small, n_large = len(small[name]), len(large[name])
+        status = ""
+        if not n_small or not n_large:
+            status = "  no queries counted"
+        elif n_large > n_small:
+            status = "  N+1: grows with data"
+        elif n_large > budget:
+            status = "  over budget"
+        failures += bool(status)
+        print(f"{name:<36} {n_small:>6} {n_large:>6} {budget:>7}{status}")
+        if args.verbose or status:
+            for statement in large[name]:
+                print("      " + " ".join(statement.split())[:160])
+
+    if failures:
+        print(f"{failures} endpoint(s) regressed")
+        return 1
+    print("All endpoints issue a bounded number of queries")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,183 @@
+"""
+EXPLAIN every statement the API issues and fail if any of them scans a whole table.
+
+The schema is built with `alembic upgrade head`, so this checks the migrations
+(not just models.py). A small group is driven through the routers, every SELECT,
+UPDATE and DELETE they send is captured with its parameters, and its plan is
+inspected:
+
+- SQLite: EXPLAIN QUERY PLAN; any "SCAN <table>" step fails.
+- Postgres: EXPLAIN (FORMAT JSON) with enable_seqscan off, so the planner only
+  falls back to a "Seq Scan" when no index can serve the query; any fails.
+
+Balance checkpoints are taken every two expenses here, so their statements (background
+retakes included) are covered too, and expenses dated with UTC offsets are posted after
+them (these once failed comparing aware with naive datetimes).
+
+Runs against a scratch SQLite database, or DATABASE_URL (an empty database) if set:
+
+    python scripts/check_query_plans.py            # exits 1 if a query scans a table
+    python scripts/check_query_plans.py --verbose  # also print every plan
+    DATABASE_URL=postgresql://localhost/splitmint_plans python scripts/check_query_plans.py
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+from contextlib import contextmanager
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/query_plans.db"
+os.environ["DB_MODE"] = "sync" # Statements are captured on the sync engine
+os.environ["BALANCE_CHECKPOINT_INTERVAL"] = "2" # Take and retake checkpoints within a few writes
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, BACKEND)
+
+from alembic import command
+from alembic.config import Config
+
+command.upgrade(Config(os.path.join(BACKEND, "alembic.ini")), "head")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app import crud, models
+from app.database import engine
+from app.main import app
+
+TABLES = set(models.Base.metadata.tables)
+SQLITE_SCAN = re.compile(r"^SCAN (\w+)")
+
+
+@contextmanager
+def capture_statements():
+    statements = {}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.setdefault(statement, parameters[0] if executemany else parameters)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def exercise(client):
+    """Drive every router the way the frontend does."""
+    def ok(response):
+        if response.status_code >= 400:
+            raise SystemExit(f"{response.request.method} {response.request.url.path} failed with "
+                             f"{response.status_code}: {response.text}")
+        return response.json()
+
+    ok(client.post("/auth/register", json={"email": "plans@splitmint.com", "password": "password123", "name": "Plans"}))
+    ok(client.post("/auth/register", json={"email": "plans2@splitmint.com", "password": "password123", "name": "Other"}))
+    token = ok(client.post("/auth/token", data={"username": "plans@splitmint.com", "password": "password123"}))["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    created = ok(client.post("/groups/", json={"name": "plans"}, headers=headers))
+    group_id = created["id"]
+    ok(client.post(f"/groups/{group_id}/members", json={"email": "plans2@splitmint.com"}, headers=headers))
+    group = ok(client.post(f"/groups/{group_id}/members", json={"name": "Ghost"}, headers=headers))
+    member_ids = [m["user"]["id"] for m in group["members"]]
+
+    expense = {
+        "amount": "30", "description": "plan probe", "split_type": "EXACT", "group_id": group_id,
+        "payer_id": created["created_by_user_id"], "splits": [{"user_id": m, "amount_owed": "10"} for m in member_ids],
+    }
+    ok(client.post("/expenses/", json=expense, headers=headers))
+    ok(client.post("/expenses/bulk", json=[expense, expense], headers=headers))
+    ok(client.get("/groups/", headers=headers))
+    ok(client.get(f"/groups/{group_id}", headers=headers))
+    ok(client.post("/expenses/bulk", json=[expense] * 3, headers=headers))
+    page = client.get(f"/expenses/group/{group_id}", params={"limit": 2}, headers=headers)
+    ok(page)
+    ok(client.get(f"/expenses/group/{group_id}", headers=headers, params={
+        "limit": 2, "cursor": page.headers["X-Next-Cursor"], "payer_id": created["created_by_user_id"],
+        "start": "2000-01-01T00:00:00", "end": "2100-01-01T00:00:00",
+    }))
+    ok(client.get(f"/expenses/group/{group_id}/balances", headers=headers))
+    ok(client.post("/expenses/", json=dict(expense, date="2001-01-01T00:00:00"), headers=headers)) # Backdated
+    crud.wait_for_checkpoint_retakes() # Its checkpoints are retaken in the background
+    # UTC offsets once checkpoints exist, alone and mixed with naive dates: compared with stored (naive UTC) dates
+    ok(client.post("/expenses/", json=dict(expense, date="2001-06-01T09:00:00+05:30"), headers=headers))
+    ok(client.post("/expenses/bulk", json=[dict(expense, date="2001-07-01T00:00:00Z"), dict(expense, date="2001-08-01T00:00:00")],
+                   headers=headers))
+    # Filters with offsets select by the instant: 03:00Z-04:00Z holds the 09:00+05:30 (03:30Z) expense
+    window = ok(client.get(f"/expenses/group/{group_id}", headers=headers, params={
+        "start": "2001-06-01T08:00:00+05:00", "end": "2001-06-01T04:00:00+00:00",
+    }))
+    if len(window) != 1:
+        raise SystemExit(f"GET /expenses/group/{{id}} with offset start/end returned {len(window)} expenses, expected 1")
+    ok(client.get(f"/expenses/group/{group_id}/balances/at", params={"at": "2050-01-01T00:00:00"}, headers=headers))
+    ok(client.get(f"/expenses/group/{group_id}/balances/series", headers=headers, params={
+        "start": "2000-06-01T00:00:00", "end": "2002-01-01T00:00:00", "bucket": "month",
+    }))
+    ok(client.get("/expenses/me/balances", params={"settle": "true"}, headers=headers))
+    export = client.get(f"/expenses/group/{group_id}/export", headers=headers)
+    if export.status_code != 200:
+        raise SystemExit(f"GET /expenses/group/{{id}}/export failed with {export.status_code}: {export.text}")
+
+
+def sqlite_scans(cursor, statement, parameters):
+    cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+    plan = [row[-1] for row in cursor.fetchall()]
+    scans = [m.group(1) for m in map(SQLITE_SCAN.match, plan) if m and m.group(1) in TABLES]
+    return scans, plan
+
+
+def postgres_scans(cursor, statement, parameters):
+    cursor.execute("SET LOCAL enable_seqscan = off")
+    cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+    raw = cursor.fetchone()[0]
+    root = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+    scans, plan, stack = [], [], [root]
+    while stack:
+        node = stack.pop()
+        plan.append(f"{node['Node Type']} {node.get('Relation Name', '')}".strip())
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in TABLES:
+            scans.append(node["Relation Name"])
+        stack.extend(node.get("Plans", []))
+    return scans, plan
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Fail if any API query does a full table scan")
+    parser.add_argument("--verbose", action="store_true", help="Print the plan of every statement")
+    args = parser.parse_args()
+
+    with capture_statements() as statements:
+        exercise(TestClient(app))
+
+    explain = sqlite_scans if engine.dialect.name == "sqlite" else postgres_scans
+    failures = 0
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for statement, parameters in statements.items():
+            scans, plan = explain(cursor, statement, parameters)
+            raw.rollback()
+            failures += bool(scans)
+            if scans or args.verbose:
+                print(("FULL SCAN of " + ", ".join(scans)) if scans else "ok")
+                print("    " + " ".join(statement.split())[:200])
+                for step in plan:
+                    print("      " + step)
+    finally:
+        raw.close()
+
+    print(f"{len(statements)} distinct statements explained on {engine.dialect.name}")
+    if failures:
+        print(f"{failures} statement(s) scan a whole table")
+        return 1
+    print("Every statement is served by an index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
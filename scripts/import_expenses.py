@@ -0,0 +1,61 @@
+"""
+Import historical expenses from a CSV or JSONL file straight into the database.
+
+Rows are validated against schemas.ExpenseCreate and written in chunks; bad rows
+are reported and skipped. Run from the backend directory so DATABASE_URL/.env
+resolve as for the app:
+
+    python ../scripts/import_expenses.py expenses.csv --group GROUP_ID
+    python ../scripts/import_expenses.py expenses.jsonl --group GROUP_ID --chunk-size 1000
+
+CSV columns: amount,description,split_type,payer_id,date,splits
+with splits written as "user_id:amount;user_id:amount". JSONL rows use the
+POST /expenses/ body. Exits with status 1 if any row failed.
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from app import models
+from app.database import SessionLocal
+from app.services import importer
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Import expenses from CSV/JSONL")
+    parser.add_argument("path")
+    parser.add_argument("--group", type=uuid.UUID, required=True, help="Group the expenses belong to")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=importer.IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if db.get(models.Group, args.group) is None:
+            print(f"Group {args.group} not found")
+            return 1
+        started = time.perf_counter()
+        with open(args.path, encoding="utf-8", newline="") as stream:
+            report = importer.import_expenses(
+                db, stream, args.format or importer.detect_format(args.path),
+                group_id=args.group, chunk_size=args.chunk_size,
+            )
+        elapsed = time.perf_counter() - started
+    finally:
+        db.close()
+
+    for error in report.errors:
+        print(f"row {error.row}: {error.error}")
+    if report.failed > len(report.errors):
+        print(f"... and {report.failed - len(report.errors)} more")
+    rate = report.imported / elapsed if elapsed else 0
+    print(f"{report.imported} imported, {report.failed} failed in {elapsed:.1f}s ({rate:.0f} rows/sec)")
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,68 @@
+"""
+Verify or rebuild the materialized group_balances ledger from Expense/ExpenseSplit history,
+or retake the balance checkpoints that historical balances start from.
+
+Usage (from the backend directory, so DATABASE_URL/.env resolve as for the app):
+    python ../scripts/ledger.py verify [--group GROUP_ID]
+    python ../scripts/ledger.py rebuild [--group GROUP_ID]
+    python ../scripts/ledger.py verify --backend numpy   # overrides BALANCE_BACKEND
+    python ../scripts/ledger.py checkpoints [--group GROUP_ID]  # e.g. after upgrading existing data
+
+verify exits with status 1 if any group has drifted.
+"""
+import argparse
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from app import crud, models
+from app.database import SessionLocal
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Verify or rebuild the group balance ledger")
+    parser.add_argument("command", choices=["verify", "rebuild", "checkpoints"])
+    parser.add_argument("--group", type=uuid.UUID, help="Only check this group id")
+    parser.add_argument("--backend", choices=list(crud.BALANCE_BACKENDS), help="How to recompute (default: BALANCE_BACKEND)")
+    args = parser.parse_args()
+    if args.backend:
+        crud.BALANCE_BACKEND = args.backend
+
+    db = SessionLocal()
+    try:
+        if args.group:
+            group_ids = [args.group]
+        else:
+            group_ids = [group_id for (group_id,) in db.query(models.Group.id)]
+
+        if args.command == "checkpoints":
+            taken = 0
+            for group_id in group_ids:
+                taken += crud.rebuild_balance_checkpoints(db, group_id)
+                db.commit()
+            print(f"{len(group_ids)} group(s) checkpointed, {taken} checkpoint(s) every {crud.BALANCE_CHECKPOINT_INTERVAL} expenses")
+            return 0
+
+        drifted = 0
+        for group_id in group_ids:
+            if args.command == "verify":
+                drift = crud.verify_group_balances(db, group_id)
+            else:
+                drift = crud.rebuild_group_balances(db, group_id)
+            if drift:
+                drifted += 1
+                print(f"Group {group_id}: {len(drift)} drifted balance(s)")
+                for entry in drift:
+                    print(f"  user {entry['user_id']}: stored={entry['stored']} expected={entry['expected']}")
+
+        action = "rebuilt" if args.command == "rebuild" else "checked"
+        print(f"{len(group_ids)} group(s) {action}, {drifted} with drift")
+        return 1 if args.command == "verify" and drifted else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(run())
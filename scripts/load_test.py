@@ -0,0 +1,230 @@
+"""
+End-to-end load test: concurrent virtual users against the app, in-process.
+
+Seeds a synthetic dataset (seed_data.py) into a scratch SQLite database, or
+DATABASE_URL if set, then runs --vus virtual users through httpx's ASGI transport for
+--duration seconds. Each user logs in as a seeded account before the clock starts, then
+loops over a weighted mix of requests on its own groups: group list and detail, expense
+pages, group and cross-group balances, and new expenses, with an occasional re-login.
+Like a browser, users revalidate with If-None-Match, so unchanged reads can come back 304.
+
+Reports throughput and p50/p95/p99 per endpoint. --save writes the results as JSON;
+--baseline compares a run against a saved one. With the same --seed and flags, two
+runs do the same work, so the numbers make a baseline for any performance change:
+
+    python scripts/load_test.py
+    python scripts/load_test.py --vus 50 --duration 30 --save before.json
+    python scripts/load_test.py --vus 50 --duration 30 --baseline before.json
+    python scripts/load_test.py --mix create_expense=0 login=0      # read-only traffic
+    DB_MODE=async python scripts/load_test.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/load_test.db"
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import httpx
+
+from seed_data import seed
+from app.database import dispose_engines
+from app.main import app
+
+# action -> (endpoint label, default weight)
+ACTIONS = {
+    "login": ("POST /auth/token", 2),
+    "list_groups": ("GET /groups/", 25),
+    "group_detail": ("GET /groups/{id}", 15),
+    "expense_page": ("GET /expenses/group/{id}", 15),
+    "group_balances": ("GET /expenses/group/{id}/balances", 20),
+    "my_balances": ("GET /expenses/me/balances", 8),
+    "create_expense": ("POST /expenses/", 15),
+}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class VirtualUser:
+    def __init__(self, client, account, data, rng, results, think):
+        self.client = client
+        self.account = account
+        self.groups = data.groups_by_user[account["id"]]
+        self.members = data.groups
+        self.password = data.password
+        self.rng = rng
+        self.results = results
+        self.think = think
+        self.headers = {}
+        self.etags = {}
+
+    async def request(self, label, method, url, revalidate=False, **kwargs):
+        headers = dict(self.headers)
+        if revalidate and url in self.etags:
+            headers["If-None-Match"] = self.etags[url]
+        started = time.perf_counter()
+        response = await self.client.request(method, url, headers=headers, timeout=None, **kwargs)
+        elapsed = time.perf_counter() - started
+        self.results.setdefault(label, []).append((elapsed, response.status_code))
+        if revalidate and "etag" in response.headers:
+            self.etags[url] = response.headers["etag"]
+        return response
+
+    async def login(self):
+        response = await self.request("POST /auth/token", "POST", "/auth/token",
+                                      data={"username": self.account["email"], "password": self.password})
+        if response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def act(self, action):
+        group_id = self.rng.choice(self.groups)
+        if action == "login":
+            await self.login()
+        elif action == "list_groups":
+            await self.request(ACTIONS[action][0], "GET", "/groups/", revalidate=True)
+        elif action == "group_detail":
+            await self.request(ACTIONS[action][0], "GET", f"/groups/{group_id}", revalidate=True)
+        elif action == "expense_page":
+            await self.request(ACTIONS[action][0], "GET", f"/expenses/group/{group_id}", params={"limit": 20})
+        elif action == "group_balances":
+            await self.request(ACTIONS[action][0], "GET", f"/expenses/group/{group_id}/balances", revalidate=True)
+        elif action == "my_balances":
+            await self.request(ACTIONS[action][0], "GET", "/expenses/me/balances")
+        elif action == "create_expense":
+            members = self.members[group_id]
+            involved = self.rng.sample(members, self.rng.randint(min(2, len(members)), len(members)))
+            await self.request(ACTIONS[action][0], "POST", "/expenses/", json={
+                "amount": f"{self.rng.lognormvariate(6.0, 1.0):.2f}", "description": "load test",
+                "split_type": "EQUAL", "group_id": str(group_id), "payer_id": str(self.account["id"]),
+                "splits": [{"user_id": str(u)} for u in set(involved) | {self.account["id"]}],
+            })
+
+    async def run(self, actions, weights, deadline):
+        while time.perf_counter() < deadline:
+            await self.act(self.rng.choices(actions, weights)[0])
+            if self.think:
+                await asyncio.sleep(self.rng.expovariate(1 / self.think))
+
+
+async def drive(data, n_vus, duration, weights, seed, think):
+    accounts = [user for user in data.users if user["id"] in data.groups_by_user]
+    rng = random.Random(seed)
+    results = {}
+    actions = [a for a in ACTIONS if weights[a] > 0]
+    # An unhandled exception in the app is a 500 for that request, not the end of the run
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://load") as client:
+            users = [VirtualUser(client, rng.choice(accounts), data, random.Random(seed * 1000 + i), results, think)
+                     for i in range(n_vus)]
+            # Everyone logs in before the clock starts: a burst of password checks is not the steady state
+            started = time.perf_counter()
+            await asyncio.gather(*(u.login() for u in users))
+            print(f"warm-up: {n_vus} logins in {time.perf_counter() - started:.1f}s")
+            results.clear()
+            started = time.perf_counter()
+            await asyncio.gather(*(u.run(actions, [weights[a] for a in actions], started + duration) for u in users))
+            elapsed = time.perf_counter() - started
+    finally:
+        # The ASGI transport never runs the app's lifespan, which would otherwise close the
+        # async engine's connections; their threads would keep the process from exiting
+        await dispose_engines()
+    return results, elapsed
+
+
+def summarize(results, elapsed):
+    summary = {}
+    for label, samples in sorted(results.items()):
+        latencies = sorted(s for s, _ in samples)
+        statuses = {}
+        for _, status in samples:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        summary[label] = {
+            "requests": len(samples),
+            "errors": sum(1 for _, status in samples if status >= 400),
+            "rps": len(samples) / elapsed,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "statuses": statuses,
+        }
+    everything = sorted(s for samples in results.values() for s, _ in samples)
+    summary["all"] = {
+        "requests": len(everything),
+        "errors": sum(v["errors"] for v in summary.values()),
+        "rps": len(everything) / elapsed,
+        "p50_ms": percentile(everything, 50) * 1000,
+        "p95_ms": percentile(everything, 95) * 1000,
+        "p99_ms": percentile(everything, 99) * 1000,
+    }
+    return summary
+
+
+def report(summary, baseline=None):
+    def delta(label, field):
+        if not baseline or label not in baseline or not baseline[label][field]:
+            return ""
+        change = summary[label][field] / baseline[label][field] - 1
+        return f" {change:+6.0%}"
+
+    width = 7 if baseline else 0
+    print(f"{'endpoint':>34} {'requests':>8} {'errors':>6} {'req/s':>8}{'':>{width}} {'p50':>8}{'':>{width}} "
+          f"{'p95':>8}{'':>{width}} {'p99':>8}{'':>{width}}")
+    for label, row in summary.items():
+        print(f"{label:>34} {row['requests']:>8} {row['errors']:>6} {row['rps']:>8.1f}{delta(label, 'rps'):>{width}} "
+              f"{row['p50_ms']:>6.1f}ms{delta(label, 'p50_ms'):>{width}} {row['p95_ms']:>6.1f}ms{delta(label, 'p95_ms'):>{width}} "
+              f"{row['p99_ms']:>6.1f}ms{delta(label, 'p99_ms'):>{width}}")
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Load-test the app in-process with concurrent virtual users")
+    parser.add_argument("--vus", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load")
+    parser.add_argument("--think-ms", type=float, default=0, help="mean pause between a user's requests")
+    parser.add_argument("--users", type=int, default=500, help="seeded accounts")
+    parser.add_argument("--groups", type=int, default=200, help="seeded groups")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mix", nargs="*", default=[], metavar="ACTION=WEIGHT",
+                        help=f"override weights; actions: {', '.join(ACTIONS)}")
+    parser.add_argument("--save", help="write the results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier --save to compare against")
+    args = parser.parse_args()
+
+    weights = {action: weight for action, (_, weight) in ACTIONS.items()}
+    for item in args.mix:
+        action, _, weight = item.partition("=")
+        if action not in ACTIONS or not weight:
+            parser.error(f"--mix {item!r}: expected ACTION=WEIGHT with ACTION one of {', '.join(ACTIONS)}")
+        weights[action] = float(weight)
+
+    data = seed(args.users, args.groups, args.seed, log=print)
+    print(f"{args.vus} virtual users for {args.duration:g}s, DB_MODE={os.getenv('DB_MODE', 'sync')}, "
+          f"mix {', '.join(f'{a}={w:g}' for a, w in weights.items())}")
+    results, elapsed = asyncio.run(drive(data, args.vus, args.duration, weights, args.seed, args.think_ms / 1000))
+    summary = summarize(results, elapsed)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    report(summary, baseline)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "weights": weights, "results": summary}, f, indent=2)
+        print(f"saved to {args.save}")
+
+
+if __name__ == "__main__":
+    run()
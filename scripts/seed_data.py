@@ -0,0 +1,194 @@
+"""
+Seed a database with synthetic users, groups and expense histories, reproducibly.
+
+Sizes follow long-tailed distributions like real usage: most groups have 2-6 members and
+a few dozen expenses, a few have many members or thousands of expenses. Amounts are
+log-normal, most expenses are split equally among everyone, and the rest are split
+equally among a subset, by exact amounts or by percentages. A fifth of members are ghosts
+(no login). Everything is written through bulk inserts and crud.create_expenses, so the
+balance ledger and group versions are exactly what the API would have produced.
+
+Every registered user logs in with --password. The same --seed always yields the
+same dataset:
+
+    python scripts/seed_data.py                                  # temporary SQLite database
+    DATABASE_URL=sqlite:///./load.db python scripts/seed_data.py --users 2000 --groups 800 --seed 7
+
+load_test.py imports seed() to build its fixture.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List
+
+if __name__ == "__main__" and "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/seed_data.db"
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from sqlalchemy import insert
+
+from app import auth_utils, crud, models, schemas
+from app.database import SessionLocal, engine
+
+EMAIL_DOMAIN = "load.splitmint.com"
+FIRST = ["Aisha", "Ben", "Chen", "Dara", "Elif", "Farah", "Gabe", "Hana", "Ivan", "Jia", "Kofi", "Lena", "Mateo",
+         "Nia", "Omar", "Priya", "Quinn", "Rahul", "Sofia", "Tomas", "Uma", "Vikram", "Wen", "Yara", "Zane"]
+LAST = ["Sharma", "Garcia", "Nguyen", "Okafor", "Smith", "Kim", "Rossi", "Haddad", "Silva", "Tanaka", "Patel", "Cohen"]
+DESCRIPTIONS = ["Dinner", "Groceries", "Cab", "Rent", "Electricity", "Movie tickets", "Coffee", "Hotel", "Petrol",
+                "Pizza", "Flights", "Wifi", "Drinks", "Brunch", "Snacks", "Gift", "Museum", "Train"]
+EXPENSE_BATCH = 2000 # Expenses per create_expenses call
+
+
+class Dataset:
+    def __init__(self):
+        self.users: List[Dict] = [] # {"id", "email", "name"} for users who can log in
+        self.groups: Dict[uuid.UUID, List[uuid.UUID]] = {} # group id -> member ids, creator first
+        self.groups_by_user: Dict[uuid.UUID, List[uuid.UUID]] = {}
+        self.expenses = 0
+        self.password = ""
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def _person(rng):
+    return f"{rng.choice(FIRST)} {rng.choice(LAST)}"
+
+
+def _ghost(rng) -> Dict:
+    ghost_id = uuid.UUID(int=rng.getrandbits(128), version=4)
+    return {"id": ghost_id, "email": f"ghost_{ghost_id}@splitmint.com", "password_hash": auth_utils.UNUSABLE_PASSWORD,
+            "name": _person(rng)}
+
+
+def _expense(rng, group_id, members, when) -> schemas.ExpenseCreate:
+    amount = Decimal(str(round(_clamp(rng.lognormvariate(6.0, 1.1), 1, 200000), 2)))
+    roll = rng.random()
+    if roll < 0.6 or len(members) == 2:
+        split_type, involved = "EQUAL", members
+    elif roll < 0.85:
+        split_type, involved = "EQUAL", rng.sample(members, rng.randint(2, len(members)))
+    elif roll < 0.95:
+        split_type, involved = "EXACT", rng.sample(members, rng.randint(2, len(members)))
+    else:
+        split_type, involved = "PERCENT", rng.sample(members, rng.randint(2, min(len(members), 5)))
+
+    if split_type == "EXACT":
+        cents = int(amount * 100)
+        cuts = sorted(rng.sample(range(1, cents), len(involved) - 1)) if cents > len(involved) else []
+        if len(cuts) != len(involved) - 1:
+            split_type, splits = "EQUAL", [{"user_id": u} for u in involved]
+        else:
+            shares = [b - a for a, b in zip([0] + cuts, cuts + [cents])]
+            splits = [{"user_id": u, "amount_owed": Decimal(s) / 100} for u, s in zip(involved, shares)]
+    elif split_type == "PERCENT":
+        cuts = sorted(rng.sample(range(1, 100), len(involved) - 1))
+        splits = [{"user_id": u, "percent": Decimal(b - a)} for u, a, b in zip(involved, [0] + cuts, cuts + [100])]
+    else:
+        splits = [{"user_id": u} for u in involved]
+    return schemas.ExpenseCreate(
+        amount=amount, description=rng.choice(DESCRIPTIONS), split_type=split_type, group_id=group_id,
+        payer_id=rng.choice(involved), splits=splits, date=when,
+    )
+
+
+def seed(n_users=500, n_groups=200, seed=1, max_members=60, max_expenses=5000, days=365,
+         password="password123", log=None) -> Dataset:
+    """Create the dataset in the configured database and describe it; see the module docstring."""
+    rng = random.Random(seed)
+    data = Dataset()
+    data.password = password
+    models.Base.metadata.create_all(bind=engine)
+    password_hash = auth_utils.get_password_hash(password) # One hash for everyone: seeding, not a hashing benchmark
+    tag = f"s{seed}"
+
+    users = [
+        {"id": uuid.UUID(int=rng.getrandbits(128), version=4), "email": f"{tag}.user{i}@{EMAIL_DOMAIN}",
+         "password_hash": password_hash, "name": _person(rng)}
+        for i in range(n_users)
+    ]
+    data.users = [{"id": u["id"], "email": u["email"], "name": u["name"]} for u in users]
+    user_rows, member_rows = list(users), []
+    group_rows, histories = [], []
+    # A few popular users sit in many groups, most in one or two
+    weights = [1 / (i + 1) ** 0.8 for i in range(n_users)]
+    now = datetime(2026, 1, 1)
+
+    for g in range(n_groups):
+        group_id = uuid.UUID(int=rng.getrandbits(128), version=4)
+        size = _clamp(round(rng.lognormvariate(1.3, 0.6)), 2, max_members)
+        n_ghosts = sum(rng.random() < 0.2 for _ in range(size - 1))
+        registered = {rng.choices(users, weights)[0]["id"] for _ in range(size - n_ghosts)}
+        ghosts = [_ghost(rng) for _ in range(max(n_ghosts, 2 - len(registered)))] # Popular picks can repeat
+        user_rows += ghosts
+        members = list(registered) + [ghost["id"] for ghost in ghosts]
+        created = now - timedelta(days=rng.uniform(0, days))
+        group_rows.append({"id": group_id, "name": f"{rng.choice(DESCRIPTIONS)} crew {g}", "created_by_user_id": members[0]})
+        member_rows += [{"group_id": group_id, "user_id": u, "joined_at": created} for u in members]
+        data.groups[group_id] = members
+        for u in registered:
+            data.groups_by_user.setdefault(u, []).append(group_id)
+        n_expenses = _clamp(int(rng.lognormvariate(3.0, 1.2)), 1, max_expenses)
+        span = (now - created).total_seconds()
+        histories.append((group_id, members, sorted(created + timedelta(seconds=rng.uniform(0, span))
+                                                    for _ in range(n_expenses))))
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        db.execute(insert(models.User), user_rows)
+        db.execute(insert(models.Group), group_rows)
+        db.execute(insert(models.GroupMember), member_rows)
+        for group_id, members in data.groups.items():
+            # Every member gets a ledger row, as add_user_to_group would have made
+            crud.apply_balance_deltas(db, group_id, {u: Decimal(0) for u in members})
+        db.commit()
+
+        batch = []
+        for group_id, members, dates in histories:
+            batch += [_expense(rng, group_id, members, when) for when in dates]
+            if len(batch) >= EXPENSE_BATCH:
+                data.expenses += len(crud.create_expenses(db, batch))
+                batch = []
+        if batch:
+            data.expenses += len(crud.create_expenses(db, batch))
+    finally:
+        db.close()
+
+    if log:
+        sizes = sorted(len(m) for m in data.groups.values())
+        per_group = sorted(len(dates) for _, _, dates in histories)
+        log(f"seeded {len(data.users)} users ({len(user_rows) - len(users)} ghosts), {len(data.groups)} groups, "
+            f"{data.expenses} expenses in {time.perf_counter() - started:.1f}s (seed {seed})")
+        log(f"  members per group:  median {statistics.median(sizes):g}, p90 {sizes[int(len(sizes) * 0.9)]}, max {sizes[-1]}")
+        log(f"  expenses per group: median {statistics.median(per_group):g}, p90 {per_group[int(len(per_group) * 0.9)]}, "
+            f"max {per_group[-1]}")
+    return data
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Seed synthetic users, groups and expenses")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--groups", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-members", type=int, default=60)
+    parser.add_argument("--max-expenses", type=int, default=5000, help="cap on one group's history")
+    parser.add_argument("--days", type=int, default=365, help="how far back histories go")
+    parser.add_argument("--password", default="password123")
+    args = parser.parse_args()
+
+    seed(args.users, args.groups, args.seed, args.max_members, args.max_expenses, args.days, args.password, log=print)
+    print(f"database: {os.environ['DATABASE_URL']}; log in as s{args.seed}.user0@{EMAIL_DOMAIN} / {args.password}")
+
+
+if __name__ == "__main__":
+    run()